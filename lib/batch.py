@@ -0,0 +1,205 @@
+# lib/batch.py
+"""Non-interactive command mode of cli.py, for scripts and integration jobs.
+
+    python3 cli.py patients import < patients.jsonl
+    python3 cli.py appointments update --format csv < changes.csv
+    python3 cli.py doctors delete < ids.jsonl
+    python3 cli.py records export --since 2024-01-01 > records.jsonl
+
+Resources are patients, doctors, appointments and records (medical_records
+also works). import, update and delete read one row per JSONL line, or per
+CSV line below a header row, from stdin:
+
+    import   the create() fields of each new row, and optionally its id
+    update   id plus the fields to change
+    delete   id
+
+Empty CSV cells count as missing, and numeric columns are converted to
+integers. Rows are applied in batches of --batch-size, each batch in one
+transaction, and the affected rows are written to stdout as JSONL as each
+batch commits, so memory stays flat however long the input is. The first
+invalid row rolls back its batch and stops the command with exit status 1
+and an error naming the input line; earlier batches stay committed and
+their output tells a caller where to resume.
+
+export writes every row of the resource as JSONL, optionally limited to a
+patient, a doctor or a date range.
+
+For bulk loads and extracts, import --input FILE and export --output FILE
+go through models.transfer instead: CSV or JSONL chosen by the file name,
+gzip for .gz names, resumable with --resume, and a JSON summary with the
+rows per second on stderr in place of the per-row output.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+from models import CONN, in_chunks, operation, transaction, update_fields
+from models.transfer import (
+    DEFAULT_CHUNK_SIZE, InputError, batches, creation_fields, export_table, import_table, read_rows, select_rows, tables,
+)
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Command line resource names and the tables they stand for
+RESOURCES = {"patients": "patients", "doctors": "doctors", "appointments": "appointments", "records": "medical_records"}
+
+
+def write_rows(rows, output):
+    """Write row dicts to output as JSONL and flush, so the consumer sees each batch as it commits"""
+    output.write("".join(json.dumps(row) + "\n" for row in rows))
+    output.flush()
+
+
+def _load(model, table, ids):
+    """Return {id: instance} for the existing rows among ids"""
+    found = {}
+    for placeholders, chunk in in_chunks(ids):
+        sql = f"SELECT {model.COLUMNS} FROM {table} WHERE id IN ({placeholders})"
+        for row in CONN.execute(sql, chunk).fetchall():
+            found[row[0]] = model.instance_from_db(row)
+    return found
+
+
+def _id(number, row):
+    id = row.get("id")
+    if not isinstance(id, int) or isinstance(id, bool):
+        raise InputError(number, "id must be an integer")
+    return id
+
+
+def import_rows(model, row_type, table, batch):
+    """Create the rows of one batch and return them as stored"""
+    try:
+        ids = model.create_many(creation_fields(model, batch))
+    except InputError:
+        raise
+    except (ValueError, TypeError, sqlite3.IntegrityError) as error:
+        raise InputError(batch[0][0], f"batch starting here was rejected: {error}") from None
+    # Rows that gave their id keep it, so the new ids need not be one range
+    stored = {}
+    for placeholders, chunk in in_chunks(ids):
+        sql = f"SELECT {model.COLUMNS} FROM {table} WHERE id IN ({placeholders})"
+        for row in CONN.execute(sql, chunk).fetchall():
+            stored[row[0]] = row_type._make(row).to_dict()
+    return [stored[id] for id in ids]
+
+
+def update_rows(model, row_type, table, batch):
+    """Apply the changes of one batch in a transaction and return the updated rows"""
+    found = _load(model, table, [_id(number, row) for number, row in batch])
+    updated = []
+    with transaction():
+        for number, row in batch:
+            instance = found.get(row["id"])
+            if instance is None:
+                raise InputError(number, f"{model.__name__} {row['id']} not found")
+            changes = {field: value for field, value in row.items() if field != "id"}
+            try:
+                for field in changes:
+                    if field not in model.FIELDS:
+                        raise ValueError(f"unknown field {field}")
+                # The found instances only take the new values once the batch commits
+                updated.append(update_fields(instance, changes).to_dict())
+            except (ValueError, TypeError) as error:
+                raise InputError(number, str(error)) from None
+    return updated
+
+
+def delete_rows(model, row_type, table, batch):
+    """Delete the rows of one batch in a transaction; ids that do not exist are reported, not fatal"""
+    found = _load(model, table, [_id(number, row) for number, row in batch])
+    with transaction():
+        for instance in found.values():
+            instance.delete()
+    return [{"id": row["id"], "deleted": row["id"] in found} for _, row in batch]
+
+
+ACTIONS = {"import": import_rows, "update": update_rows, "delete": delete_rows}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Batch commands for the hospital database")
+    resource_parsers = parser.add_subparsers(dest="resource", required=True)
+    for name, table in RESOURCES.items():
+        aliases = [table] if table != name else []
+        resource = resource_parsers.add_parser(name, aliases=aliases, help=f"{name} commands")
+        resource.set_defaults(resource=name)
+        actions = resource.add_subparsers(dest="action", required=True)
+        for action in ACTIONS:
+            command = actions.add_parser(action, help=f"{action} {name} read from stdin")
+            command.add_argument("--format", choices=("jsonl", "csv"), help="input format (default jsonl, or from --input)")
+            command.add_argument("--batch-size", type=int, help=f"rows per transaction (default {DEFAULT_BATCH_SIZE}, "
+                                                                f"{DEFAULT_CHUNK_SIZE} with --input)")
+            if action == "import":
+                command.add_argument("--input", help="load this CSV or JSONL file (.gz for gzip) instead of stdin")
+                command.add_argument("--resume", action="store_true", help="skip the rows an interrupted --input load committed")
+        export = actions.add_parser("export", help=f"write {name} to stdout as JSONL")
+        export.add_argument("--batch-size", type=int, help="rows fetched at a time")
+        export.add_argument("--output", help="write this CSV or JSONL file (.gz for gzip) instead of stdout")
+        export.add_argument("--format", choices=("jsonl", "csv"), help="--output format (default from its name)")
+        export.add_argument("--gzip", action="store_true", default=None, help="compress --output whatever its name")
+        export.add_argument("--resume", action="store_true", help="continue an interrupted --output export")
+        if table in ("appointments", "medical_records"):
+            export.add_argument("--since", help="only rows dated on or after this date")
+            export.add_argument("--until", help="only rows dated before this date")
+            export.add_argument("--patient-id", type=int)
+            export.add_argument("--doctor-id", type=int)
+    return parser
+
+
+def main(argv=None, stdin=None, stdout=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    if args.batch_size is not None and args.batch_size < 1:
+        parser.error("--batch-size must be positive")
+    table = RESOURCES[args.resource]
+    model, row_type, dated = tables()[table]
+    filters = {
+        key: getattr(args, key) for key in ("since", "until", "patient_id", "doctor_id")
+        if getattr(args, key, None) is not None
+    }
+    for bound in ("since", "until"):
+        if bound in filters:
+            try:
+                dated[1](filters[bound])
+            except ValueError as error:
+                parser.error(f"--{bound}: {error}")
+    try:
+        with operation(f"cli {args.resource} {args.action}"):
+            if getattr(args, "output", None) or getattr(args, "input", None):
+                transfer(args, table, filters)
+            elif args.action == "export":
+                for rows in select_rows(table, chunk_size=args.batch_size or DEFAULT_BATCH_SIZE, **filters):
+                    write_rows([row.to_dict() for row in rows], stdout)
+            else:
+                apply = ACTIONS[args.action]
+                for batch in batches(read_rows(stdin, args.format or "jsonl"), args.batch_size or DEFAULT_BATCH_SIZE):
+                    write_rows(apply(model, row_type, table, batch), stdout)
+    except InputError as error:
+        print(json.dumps({"error": str(error), "line": error.line}), file=sys.stderr)
+        sys.exit(1)
+    except BrokenPipeError:
+        # The consumer stopped reading, e.g. `export | head`; silence the
+        # flush of stdout at exit, which would raise again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), stdout.fileno())
+        sys.exit(1)
+
+
+def transfer(args, table, filters):
+    """Run an --input import or --output export and print its summary to stderr"""
+    chunk_size = args.batch_size or DEFAULT_CHUNK_SIZE
+    try:
+        if args.action == "export":
+            stats = export_table(table, args.output, args.format, args.gzip, chunk_size, args.resume, **filters)
+        else:
+            stats = import_table(table, args.input, args.format, chunk_size, args.resume)
+    except InputError:
+        raise
+    except (ValueError, OSError) as error:
+        sys.exit(f"cli.py: error: {error}")
+    print(json.dumps(stats.to_dict()), file=sys.stderr)
@@ -0,0 +1,131 @@
+# lib/benchmarks/analytics.py
+"""Benchmark for reporting over medical records: full objects vs column buffers.
+
+Run from lib/:
+
+    python -m benchmarks.analytics --records 1000000
+
+A scratch database is seeded with --records medical records spread over a
+year, then the same report (record counts per doctor, per diagnosis and
+per day) is built two ways:
+
+    objects   MedicalRecord.get_all() and a Counter over the attributes
+    columnar  models.analytics.load_medical_records() and its group-by helpers
+
+Each is timed on its own (best of --repeat), then run once more under
+tracemalloc for its peak memory. The columnar run uses NumPy when it is
+installed. Results are printed as a table, or as JSON with --json.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import date, timedelta
+
+DIAGNOSES = [
+    "Hypertension", "Type 2 diabetes", "Acute bronchitis", "Migraine", "Fractured radius", "Seasonal allergies",
+    "Major depressive disorder", "Osteoarthritis of the knee", "Urinary tract infection", "Asthma",
+]
+
+
+def seed(records, doctors, seed=0):
+    """Point the models at a scratch database holding records medical records"""
+    from models import configure_database
+    from models.medical_record import MedicalRecord
+
+    database = os.path.join(tempfile.mkdtemp(prefix="hospital-analytics-"), "analytics.db")
+    configure_database(database, profile="throughput")
+    pick = random.Random(seed)
+    first_day = date(2024, 1, 1)
+    days = [(first_day + timedelta(days=offset)).isoformat() for offset in range(366)]
+    batch = 100000
+    for start in range(0, records, batch):
+        MedicalRecord.create_many(
+            (pick.randint(1, records // 10 or 1), pick.randint(1, doctors), pick.choice(days), pick.choice(DIAGNOSES), "Follow-up")
+            for _ in range(min(batch, records - start))
+        )
+    return database
+
+
+def objects_report():
+    from models.medical_record import MedicalRecord
+
+    records = MedicalRecord.get_all()
+    report = (
+        Counter(record.doctor_id for record in records),
+        Counter(record.diagnosis for record in records),
+        Counter(record.record_date for record in records),
+    )
+    MedicalRecord.all.clear()
+    return report
+
+
+def columnar_report():
+    from models.analytics import load_medical_records
+
+    records = load_medical_records(("doctor_id", "day", "diagnosis"))
+    return records.counts_per_doctor(), records.counts_per_diagnosis(), records.counts_per_day()
+
+
+def measure(report, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = report()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    del result
+    gc.collect()
+    tracemalloc.start()
+    report()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def run(records, doctors, repeat):
+    from models import analytics
+
+    seed(records, doctors)
+    # Both reports must agree before their costs are compared
+    objects, columnar = objects_report(), columnar_report()
+    if [dict(sorted(counts.items())) for counts in objects] != list(columnar):
+        raise AssertionError("The columnar report differs from the object report")
+    results = {"records": records, "doctors": doctors, "numpy": analytics.numpy is not None, "modes": {}}
+    for mode, report in (("objects", objects_report), ("columnar", columnar_report)):
+        seconds, peak = measure(report, repeat)
+        results["modes"][mode] = {"seconds": round(seconds, 3), "peak_mb": round(peak / 2**20, 1)}
+    modes = results["modes"]
+    results["speedup"] = round(modes["objects"]["seconds"] / modes["columnar"]["seconds"], 1)
+    results["memory_ratio"] = round(modes["columnar"]["peak_mb"] / modes["objects"]["peak_mb"], 3)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark object vs columnar reporting over medical records")
+    parser.add_argument("--records", type=int, default=500000, help="medical records seeded")
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per mode; the fastest is kept")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.records, args.doctors, args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{results['records']} records, numpy {'on' if results['numpy'] else 'off'}")
+        print(f"{'mode':<10}{'seconds':>10}{'peak MB':>10}")
+        for mode, timing in results["modes"].items():
+            print(f"{mode:<10}{timing['seconds']:>10}{timing['peak_mb']:>10}")
+        print(f"columnar is {results['speedup']}x faster using {results['memory_ratio']:.1%} of the memory")
+
+
+if __name__ == "__main__":
+    main()
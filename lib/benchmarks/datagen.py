@@ -0,0 +1,197 @@
+# lib/benchmarks/datagen.py
+"""Synthetic hospital data for the benchmarks.
+
+Run from lib/ to fill a database file:
+
+    python -m benchmarks.datagen --database bench.db --patients 100000 --doctors 500
+
+Names, notes and dates come from faker, seeded so the same arguments always
+produce the same rows. The fan-out follows a real practice: most patients
+have a few appointments and records while some have many (counts are
+drawn from a geometric distribution with roughly the given means), and a few
+doctors see most of them. Appointments are laid out on each doctor's
+working-hours calendar so no doctor or patient is double-booked.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from faker import Faker
+
+SPECIALIZATIONS = [
+    "General Practice", "Cardiology", "Dermatology", "Endocrinology", "Gastroenterology",
+    "Neurology", "Obstetrics", "Oncology", "Orthopedics", "Pediatrics", "Psychiatry", "Radiology",
+]
+
+# Diagnosis -> treatments it is paired with
+DIAGNOSES = {
+    "Hypertension": ["Lifestyle changes", "ACE inhibitors", "Calcium channel blockers"],
+    "Type 2 diabetes": ["Metformin", "Dietary counselling", "Insulin therapy"],
+    "Acute bronchitis": ["Rest and fluids", "Bronchodilator inhaler"],
+    "Migraine": ["Triptans", "Preventive beta blockers"],
+    "Fractured radius": ["Cast immobilization", "Open reduction and internal fixation"],
+    "Seasonal allergies": ["Antihistamines", "Nasal corticosteroids"],
+    "Major depressive disorder": ["SSRIs", "Cognitive behavioural therapy"],
+    "Osteoarthritis of the knee": ["Physiotherapy", "NSAIDs", "Corticosteroid injection"],
+    "Urinary tract infection": ["Nitrofurantoin", "Increased fluid intake"],
+    "Atopic dermatitis": ["Topical corticosteroids", "Emollients"],
+    "Gastroesophageal reflux": ["Proton pump inhibitors", "Dietary changes"],
+    "Asthma": ["Inhaled corticosteroids", "Short-acting beta agonists"],
+}
+
+APPOINTMENT_DURATIONS = [15, 30, 30, 30, 45, 60]
+SLOT = 15
+
+# Share of appointments and records that go to the busiest tenth of doctors
+BUSY_DOCTOR_SHARE = 0.5
+
+
+class HospitalDataGenerator:
+    """Deterministic generator of patient, doctor, appointment and medical record rows.
+
+    Each method returns a list of tuples in the argument order of the
+    model's create(), ready for create_many(). Appointment and medical
+    record rows refer to ids 1..patients and 1..doctors, so generate into
+    empty tables.
+    """
+
+    def __init__(self, patients, doctors, appointments_per_patient=3.0, records_per_patient=2.0,
+                 start=date(2020, 1, 1), days=5 * 365, seed=0):
+        if patients < 1 or doctors < 1:
+            raise ValueError("At least one patient and one doctor are required")
+        self.patients = patients
+        self.doctors = doctors
+        self.appointments_per_patient = appointments_per_patient
+        self.records_per_patient = records_per_patient
+        self.start = start
+        self.days = days
+        self.random = random.Random(seed)
+        self.faker = Faker()
+        self.faker.seed_instance(seed)
+
+    def patient_rows(self):
+        rows = []
+        for _ in range(self.patients):
+            gender = self.random.choices(["Female", "Male", "Other"], [49, 49, 2])[0]
+            if gender == "Female":
+                first_name = self.faker.first_name_female()
+            elif gender == "Male":
+                first_name = self.faker.first_name_male()
+            else:
+                first_name = self.faker.first_name_nonbinary()
+            age = min(100, max(1, int(self.random.gauss(45, 20))))
+            rows.append((first_name, self.faker.last_name(), age, gender))
+        return rows
+
+    def doctor_rows(self):
+        return [
+            (f"Dr. {self.faker.first_name()} {self.faker.last_name()}", self.random.choice(SPECIALIZATIONS))
+            for _ in range(self.doctors)
+        ]
+
+    def _count(self, mean):
+        """Draw a per-patient row count from a geometric distribution with roughly the given mean"""
+        if mean <= 0:
+            return 0
+        return int(self.random.expovariate(1 / mean))
+
+    def _doctor_id(self):
+        busy = max(1, self.doctors // 10)
+        if self.random.random() < BUSY_DOCTOR_SHARE:
+            return self.random.randint(1, busy)
+        return self.random.randint(1, self.doctors)
+
+    def appointment_rows(self):
+        """Return appointment rows; each doctor's calendar is filled forward so nothing overlaps"""
+        from models.scheduling import DAY_END, DAY_START
+
+        working_day = datetime.combine(self.start, DAY_END) - datetime.combine(self.start, DAY_START)
+        slots_per_day = int(working_day.total_seconds() // 60 // SLOT)
+        next_slot = {}
+        booked = {}
+        rows = []
+        for patient_id in range(1, self.patients + 1):
+            for _ in range(self._count(self.appointments_per_patient)):
+                doctor_id = self._doctor_id()
+                duration = self.random.choice(APPOINTMENT_DURATIONS)
+                length = duration // SLOT
+                slot = next_slot.get(doctor_id, self.random.randrange(slots_per_day)) + self.random.randrange(3)
+                patient_slots = booked.setdefault(patient_id, set())
+                while True:
+                    day, offset = divmod(slot, slots_per_day)
+                    if offset + length > slots_per_day:
+                        slot = (day + 1) * slots_per_day
+                        continue
+                    needed = range(slot, slot + length)
+                    if patient_slots.isdisjoint(needed):
+                        break
+                    slot += 1
+                patient_slots.update(needed)
+                next_slot[doctor_id] = slot + length
+                moment = datetime.combine(self.start + timedelta(days=day), DAY_START) + timedelta(minutes=offset * SLOT)
+                notes = self.faker.sentence(nb_words=8) if self.random.random() < 0.3 else None
+                rows.append((moment, patient_id, doctor_id, notes, duration))
+        return rows
+
+    def medical_record_rows(self):
+        rows = []
+        diagnoses = list(DIAGNOSES)
+        for patient_id in range(1, self.patients + 1):
+            for _ in range(self._count(self.records_per_patient)):
+                diagnosis = self.random.choice(diagnoses)
+                record_date = self.start + timedelta(days=self.random.randrange(self.days))
+                treatment = self.random.choice(DIAGNOSES[diagnosis])
+                if self.random.random() < 0.2:
+                    treatment = f"{treatment}; {self.faker.sentence(nb_words=6)}"
+                rows.append((patient_id, self._doctor_id(), record_date, diagnosis, treatment))
+        return rows
+
+
+def populate(generator, batch_size=10000):
+    """Insert the generator's rows through the models' create_many; returns the row count per table"""
+    from models.patient import Patient
+    from models.doctor import Doctor
+    from models.appointment import Appointment
+    from models.medical_record import MedicalRecord
+
+    counts = {}
+    for model, rows in (
+        (Patient, generator.patient_rows()),
+        (Doctor, generator.doctor_rows()),
+        (Appointment, generator.appointment_rows()),
+        (MedicalRecord, generator.medical_record_rows()),
+    ):
+        for start in range(0, len(rows), batch_size):
+            model.create_many(rows[start:start + batch_size])
+        counts[model.__name__] = len(rows)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill a database with synthetic hospital data")
+    parser.add_argument("--database", required=True, help="database file to create (must not exist)")
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--doctors", type=int, default=100)
+    parser.add_argument("--appointments-per-patient", type=float, default=3.0, help="mean appointments per patient")
+    parser.add_argument("--records-per-patient", type=float, default=2.0, help="mean medical records per patient")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.database):
+        parser.error(f"{args.database} already exists")
+    from models import configure_database
+
+    configure_database(args.database, profile="throughput")
+    generator = HospitalDataGenerator(
+        args.patients, args.doctors, args.appointments_per_patient, args.records_per_patient, seed=args.seed,
+    )
+    started = time.perf_counter()
+    counts = populate(generator)
+    elapsed = time.perf_counter() - started
+    print(", ".join(f"{count} {name}" for name, count in counts.items()) + f" in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
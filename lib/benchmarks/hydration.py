@@ -0,0 +1,126 @@
+# lib/benchmarks/hydration.py
+"""Benchmark for turning fetched rows into model objects.
+
+Run from lib/:
+
+    python -m benchmarks.hydration --rows 200000
+
+A scratch database is seeded with --rows rows per table. The rows are fetched
+once, then hydrated three ways, each timed after the identity map is cleared:
+
+    validated    the pre-trusted path: every column through the property setters
+    trusted      instance_from_db, which assigns stored values directly
+    lightweight  the finders' lightweight=True tuples
+
+Only hydration is timed; the fetch is reported separately. The best of
+--repeat runs is kept. Results are printed as a table, or as JSON with --json.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def seed(rows):
+    """Point the models at a scratch database and fill each table with rows rows"""
+    from models import configure_database
+    from models.patient import Patient
+    from models.doctor import Doctor
+    from models.appointment import Appointment
+    from models.medical_record import MedicalRecord
+
+    database = os.path.join(tempfile.mkdtemp(prefix="hospital-hydration-"), "hydration.db")
+    configure_database(database, profile="throughput")
+    Patient.create_many((f"First{i}", f"Last{i}", 20 + i % 60, "Female" if i % 2 else "Male") for i in range(rows))
+    Doctor.create_many((f"Doctor {i}", "General Practice") for i in range(rows))
+    # Back-to-back half-hour slots, so no two appointments overlap
+    start = datetime(2024, 1, 1, 9)
+    Appointment.create_many((start + timedelta(minutes=30 * i), 1 + i % rows, 1 + i % rows, None) for i in range(rows))
+    MedicalRecord.create_many(
+        (1 + i % rows, 1 + i % rows, f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", "Hypertension", "Lifestyle changes")
+        for i in range(rows)
+    )
+    return database
+
+
+def validated(model, row):
+    """Hydrate row the way instance_from_db did before the trusted path"""
+    fields = row[1:len(model.FIELDS) + 1]
+    instance = model.all.get(row[0])
+    if instance:
+        for field, value in zip(model.FIELDS, fields):
+            setattr(instance, field, value)
+    else:
+        instance = model(*fields, id=row[0])
+        model.all[row[0]] = instance
+    return instance
+
+
+def best_time(function, rows, repeat, before=None):
+    best = None
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        function(rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(rows, repeat):
+    from models import CURSOR
+    from models.patient import Patient, PatientRow
+    from models.doctor import Doctor, DoctorRow
+    from models.appointment import Appointment, AppointmentRow
+    from models.medical_record import MedicalRecord, MedicalRecordRow
+
+    seed(rows)
+    results = {"rows": rows, "repeat": repeat, "models": {}}
+    for model, row_type, table in (
+        (Patient, PatientRow, "patients"),
+        (Doctor, DoctorRow, "doctors"),
+        (Appointment, AppointmentRow, "appointments"),
+        (MedicalRecord, MedicalRecordRow, "medical_records"),
+    ):
+        start = time.perf_counter()
+        fetched = CURSOR.execute(f"SELECT {model.COLUMNS} FROM {table}").fetchall()
+        fetch = time.perf_counter() - start
+        timings = {
+            "validated": best_time(lambda rows: [validated(model, row) for row in rows], fetched, repeat, model.all.clear),
+            "trusted": best_time(lambda rows: [model.instance_from_db(row) for row in rows], fetched, repeat, model.all.clear),
+            "lightweight": best_time(lambda rows: list(map(row_type._make, rows)), fetched, repeat),
+        }
+        model.all.clear()
+        results["models"][model.__name__] = {
+            "fetch_s": round(fetch, 4),
+            **{f"{mode}_s": round(seconds, 4) for mode, seconds in timings.items()},
+            **{f"{mode}_us_per_row": round(seconds / len(fetched) * 1e6, 3) for mode, seconds in timings.items()},
+            "trusted_speedup": round(timings["validated"] / timings["trusted"], 2),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark model hydration from fetched rows")
+    parser.add_argument("--rows", type=int, default=100000, help="rows seeded per table")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per mode; the fastest is kept")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.rows, args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'model':<15}{'fetch':>10}{'validated':>12}{'trusted':>10}{'lightweight':>13}  (us/row; fetch in s)")
+        for name, timing in results["models"].items():
+            print(f"{name:<15}{timing['fetch_s']:>10}{timing['validated_us_per_row']:>12}"
+                  f"{timing['trusted_us_per_row']:>10}{timing['lightweight_us_per_row']:>13}"
+                  f"  trusted {timing['trusted_speedup']}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# lib/benchmarks/loadtest.py
+"""Load test for the HTTP service in server.py.
+
+Run from lib/:
+
+    python -m benchmarks.loadtest --clients 16 --duration 10
+
+Without --url a server is started in this process on a free port, backed
+by a freshly seeded scratch database (the load clients then share the
+interpreter with the server, so use --url against `python cli.py serve`
+for numbers that isolate the service). Each client keeps one HTTP/1.1
+connection open and issues a weighted mix of reads and writes; the run
+reports throughput and p50/p99 latency, as JSON with --json.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+# (weight, method, path template); {patient}/{doctor} become random ids
+REQUEST_MIX = [
+    (40, "GET", "/patients/{patient}"),
+    (20, "GET", "/doctors/{doctor}"),
+    (20, "GET", "/appointments?doctor_id={doctor}"),
+    (10, "GET", "/patients?after_id={patient}&limit=20"),
+    (10, "POST", "/appointments"),
+]
+
+
+def seed(patients, doctors, appointments_per_doctor):
+    """Point the models at a scratch database and fill it with synthetic rows"""
+    from models import configure_database
+    from models.patient import Patient
+    from models.doctor import Doctor
+    from models.appointment import Appointment
+
+    database = os.path.join(tempfile.mkdtemp(prefix="hospital-loadtest-"), "loadtest.db")
+    configure_database(database, profile="throughput")
+    Patient.create_many((f"First{i}", f"Last{i}", 20 + i % 60, "Female" if i % 2 else "Male") for i in range(patients))
+    Doctor.create_many((f"Doctor {i}", "General Practice") for i in range(doctors))
+    Appointment.create_many(
+        (f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} {8 + i % 9:02d}:00", 1 + i % patients, 1 + i % doctors, None)
+        for i in range(doctors * appointments_per_doctor)
+    )
+    return database
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_client(host, port, deadline, patients, doctors, latencies, errors, seed_value):
+    rng = random.Random(seed_value)
+    weights = [weight for weight, _, _ in REQUEST_MIX]
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        while time.perf_counter() < deadline:
+            _, method, template = rng.choices(REQUEST_MIX, weights)[0]
+            path = template.format(patient=rng.randint(1, patients), doctor=rng.randint(1, doctors))
+            body, headers = None, {}
+            if method == "POST":
+                body = json.dumps({
+                    "appointment_date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(8, 16):02d}:00",
+                    "patient_id": rng.randint(1, patients),
+                    "doctor_id": rng.randint(1, doctors),
+                })
+                headers["Content-Type"] = "application/json"
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                response.read()
+                # Random bookings that collide with an existing appointment
+                # are rejected with 409; that is the service working.
+                if response.status >= 400 and response.status != 409:
+                    errors.append(response.status)
+            except (OSError, http.client.HTTPException) as error:
+                errors.append(repr(error))
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=30)
+                continue
+            latencies.append(time.perf_counter() - started)
+    finally:
+        connection.close()
+
+
+def run(url, clients, duration, patients, doctors):
+    parts = urlsplit(url)
+    deadline = time.perf_counter() + duration
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(parts.hostname, parts.port, deadline, patients, doctors, latencies, errors, number),
+        )
+        for number in range(clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "url": url,
+        "clients": clients,
+        "duration_s": round(elapsed, 3),
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "mean": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the hospital HTTP service")
+    parser.add_argument("--url", help="base URL of a running server (default: start a local one)")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent client connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--workers", type=int, default=8, help="server workers when starting a local server")
+    parser.add_argument("--patients", type=int, default=5000, help="patient ids to draw from (and to seed)")
+    parser.add_argument("--doctors", type=int, default=100, help="doctor ids to draw from (and to seed)")
+    parser.add_argument("--appointments-per-doctor", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if url is None:
+        from server import make_server
+
+        seed(args.patients, args.doctors, args.appointments_per_doctor)
+        server = make_server(port=0, workers=args.workers, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        results = run(url, args.clients, args.duration, args.patients, args.doctors)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    results["server_workers"] = args.workers if server is not None else None
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        latency = results["latency_ms"]
+        print(f"{results['requests']} requests in {results['duration_s']}s from {results['clients']} clients "
+              f"({results['errors']} errors)")
+        print(f"throughput: {results['throughput_rps']} req/s")
+        print(f"latency: p50 {latency['p50']} ms, p99 {latency['p99']} ms, max {latency['max']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# lib/benchmarks/startup.py
+"""Benchmark for process start-up cost.
+
+Run from lib/:
+
+    python -m benchmarks.startup --patients 50000 --runs 20
+
+A scratch database is seeded with --patients patients (and as many medical
+records), then each scenario below runs --runs times in a fresh interpreter
+pointed at it through HOSPITAL_DB. The wall time of the whole process is
+measured, so interpreter start-up is included; the "interpreter" row is that
+floor.
+
+    interpreter   python -c pass
+    cli           import cli, i.e. until the menu can be shown
+    models        import the four model modules
+    first query   import the models and run one find_by_id
+    eager schema  import the models and run every schema step, then commit:
+                  what each process did at import before the schema version
+                  was recorded
+
+Results are printed as a table, or as JSON with --json.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+LIB = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_MODELS = "import models.patient, models.doctor, models.appointment, models.medical_record"
+
+SCENARIOS = {
+    "interpreter": "pass",
+    "cli": "import cli",
+    "models": IMPORT_MODELS,
+    "first query": f"{IMPORT_MODELS}; models.patient.Patient.find_by_id(1)",
+    "eager schema": (
+        f"{IMPORT_MODELS}; from models import CONN, SCHEMA_STEPS\n"
+        "for step in SCHEMA_STEPS: step()\n"
+        "CONN.commit()"
+    ),
+}
+
+
+def seed(patients):
+    """Create a scratch database with patients patients and medical records; returns its path"""
+    from models import configure_database, initialize_database
+    from models.patient import Patient
+    from models.doctor import Doctor
+    from models.medical_record import MedicalRecord
+
+    database = os.path.join(tempfile.mkdtemp(prefix="hospital-startup-"), "startup.db")
+    configure_database(database, profile="throughput")
+    Patient.create_many((f"First{i}", f"Last{i}", 20 + i % 60, "Female" if i % 2 else "Male") for i in range(patients))
+    Doctor.create_many((f"Doctor {i}", "General Practice") for i in range(max(1, patients // 100)))
+    MedicalRecord.create_many(
+        (1 + i, 1 + i % max(1, patients // 100), f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", "Hypertension", "Lifestyle changes")
+        for i in range(patients)
+    )
+    initialize_database()
+    return database
+
+
+def time_process(code, database):
+    """Run code in a new interpreter from lib/ and return its wall time in seconds"""
+    environment = dict(os.environ, HOSPITAL_DB=database)
+    environment.pop("HOSPITAL_SQL_STATS", None)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=LIB, env=environment, check=True)
+    return time.perf_counter() - start
+
+
+def run(patients, runs):
+    database = seed(patients)
+    results = {"patients": patients, "runs": runs, "scenarios": {}}
+    for name, code in SCENARIOS.items():
+        # One untimed run warms the OS file cache
+        time_process(code, database)
+        timings = [time_process(code, database) for _ in range(runs)]
+        results["scenarios"][name] = {
+            "min_ms": round(min(timings) * 1000, 2),
+            "median_ms": round(statistics.median(timings) * 1000, 2),
+        }
+    scenarios = results["scenarios"]
+    results["first_query_speedup"] = round(scenarios["eager schema"]["median_ms"] / scenarios["first query"]["median_ms"], 2)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark process start-up time")
+    parser.add_argument("--patients", type=int, default=20000, help="patients (and medical records) seeded")
+    parser.add_argument("--runs", type=int, default=10, help="timed processes per scenario")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.patients, args.runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'scenario':<15}{'min ms':>10}{'median ms':>12}")
+        for name, timing in results["scenarios"].items():
+            print(f"{name:<15}{timing['min_ms']:>10}{timing['median_ms']:>12}")
+        print(f"first query starts {results['first_query_speedup']}x faster than the eager schema set-up")
+
+
+if __name__ == "__main__":
+    main()
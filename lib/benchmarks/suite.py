@@ -0,0 +1,216 @@
+# lib/benchmarks/suite.py
+"""Benchmark suite for the core model operations.
+
+Run from lib/:
+
+    python -m benchmarks.suite --patients 20000 --doctors 200 --output results.json
+
+A scratch database is filled by benchmarks.datagen (or --database points at
+one it produced), then each model's create, find_by_id, find_by_*_id,
+get_all, update and delete are timed call by call. Results are printed as a
+table, or as JSON with --json. --output also writes them to a file.
+
+Pass the JSON of an earlier run as --baseline to compare: any operation
+whose median got slower by more than --tolerance (a fraction) is listed,
+and the exit status is 1, so the suite can gate a CI job.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+DEFAULT_SAMPLES = 500
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25
+
+
+def summarize(durations):
+    """Return count, total and latency percentiles (in microseconds) for a list of call durations"""
+    ordered = sorted(durations)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * 1e6
+
+    total = sum(ordered)
+    return {
+        "n": len(ordered),
+        "total_s": round(total, 6),
+        "mean_us": round(total / len(ordered) * 1e6, 2),
+        "p50_us": round(percentile(0.50), 2),
+        "p95_us": round(percentile(0.95), 2),
+        "p99_us": round(percentile(0.99), 2),
+        "ops_per_s": round(len(ordered) / total, 1) if total else None,
+    }
+
+
+def timed(function, arguments):
+    """Call function once per item of arguments and return the duration of each call"""
+    durations = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def run(samples, repeat, seed):
+    from models import CURSOR
+    from models.patient import Patient
+    from models.doctor import Doctor
+    from models.appointment import Appointment
+    from models.medical_record import MedicalRecord
+    from benchmarks.datagen import HospitalDataGenerator
+
+    pick = random.Random(seed)
+    counts = {
+        model.__name__: CURSOR.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+        for model, table in ((Patient, "patients"), (Doctor, "doctors"), (Appointment, "appointments"), (MedicalRecord, "medical_records"))
+    }
+    if not counts["Patient"] or not counts["Doctor"]:
+        raise ValueError("The database has no patients or doctors to benchmark against")
+
+    def ids(table):
+        return [row[0] for row in CURSOR.execute(f"SELECT id FROM {table}")]
+
+    def sample(values):
+        return [pick.choice(values) for _ in range(samples)] if values else []
+
+    # New rows for create(); appointments are booked in the far future so
+    # they cannot collide with the dataset's calendars.
+    fresh = HospitalDataGenerator(
+        samples, counts["Doctor"], appointments_per_patient=3.0, records_per_patient=3.0,
+        start=date(2100, 1, 1), seed=seed + 1,
+    )
+    new_rows = {
+        Patient: fresh.patient_rows(),
+        Doctor: HospitalDataGenerator(1, samples, seed=seed + 1).doctor_rows(),
+        Appointment: fresh.appointment_rows()[:samples],
+        MedicalRecord: fresh.medical_record_rows()[:samples],
+    }
+    patient_ids, doctor_ids = ids("patients"), ids("doctors")
+
+    def change(instance):
+        # One validated field per model, so update() writes a real change
+        if isinstance(instance, Patient):
+            instance.age = instance.age % 100 + 1
+        elif isinstance(instance, Doctor):
+            instance.specialization = instance.specialization[::-1]
+        elif isinstance(instance, Appointment):
+            instance.notes = f"Rescheduled note {time.perf_counter_ns()}"
+        else:
+            instance.treatment = f"{instance.treatment.split(' #')[0]} #{pick.randrange(1000)}"
+        instance.update()
+
+    results = {}
+    for model, table in ((Patient, "patients"), (Doctor, "doctors"), (Appointment, "appointments"), (MedicalRecord, "medical_records")):
+        name = model.__name__
+        existing = ids(table)
+        created = []
+        results[f"{name}.create"] = summarize(timed(lambda row: created.append(model.create(*row)), new_rows[model]))
+        results[f"{name}.find_by_id"] = summarize(timed(model.find_by_id, sample(existing)))
+        if hasattr(model, "find_by_patient_id"):
+            results[f"{name}.find_by_patient_id"] = summarize(timed(model.find_by_patient_id, sample(patient_ids)))
+            results[f"{name}.find_by_doctor_id"] = summarize(timed(model.find_by_doctor_id, sample(doctor_ids)))
+        results[f"{name}.get_all"] = summarize(timed(lambda _: model.get_all(), range(repeat)))
+        results[f"{name}.get_all_lightweight"] = summarize(timed(lambda _: model.get_all(lightweight=True), range(repeat)))
+        targets = [model.find_by_id(id) for id in sample(existing)]
+        results[f"{name}.update"] = summarize(timed(change, [target for target in targets if target is not None]))
+        results[f"{name}.delete"] = summarize(timed(lambda instance: instance.delete(), created))
+    return counts, results
+
+
+def compare(results, baseline, tolerance):
+    """Return (operation, baseline p50, current p50, ratio) for operations slower than baseline by more than tolerance"""
+    regressions = []
+    for operation, stats in results.items():
+        before = baseline.get("results", {}).get(operation)
+        if not before or not before.get("p50_us"):
+            continue
+        ratio = stats["p50_us"] / before["p50_us"]
+        if ratio > 1 + tolerance:
+            regressions.append((operation, before["p50_us"], stats["p50_us"], round(ratio, 2)))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the core model operations")
+    parser.add_argument("--database", help="database produced by benchmarks.datagen (default: generate a scratch one)")
+    parser.add_argument("--patients", type=int, default=10000, help="patients to generate")
+    parser.add_argument("--doctors", type=int, default=100, help="doctors to generate")
+    parser.add_argument("--appointments-per-patient", type=float, default=3.0)
+    parser.add_argument("--records-per-patient", type=float, default=2.0)
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help="calls timed per operation")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="get_all calls timed per model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown of an operation's median before it counts as a regression")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    from models import configure_database, configure_query_cache
+
+    # Time the database, not the result cache
+    configure_query_cache(enabled=False)
+    generated = None
+    if args.database:
+        configure_database(args.database, profile="throughput")
+    else:
+        from benchmarks.datagen import HospitalDataGenerator, populate
+
+        database = os.path.join(tempfile.mkdtemp(prefix="hospital-suite-"), "suite.db")
+        configure_database(database, profile="throughput")
+        generator = HospitalDataGenerator(
+            args.patients, args.doctors, args.appointments_per_patient, args.records_per_patient, seed=args.seed,
+        )
+        started = time.perf_counter()
+        populate(generator)
+        generated = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    counts, results = run(args.samples, args.repeat, args.seed)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "samples": args.samples,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "generate_s": generated,
+            "run_s": round(time.perf_counter() - started, 3),
+        },
+        "dataset": counts,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(", ".join(f"{count} {name}" for name, count in counts.items()))
+        print(f"{'operation':<38}{'n':>6}{'p50 us':>12}{'p95 us':>12}{'ops/s':>12}")
+        for operation, stats in results.items():
+            print(f"{operation:<38}{stats['n']:>6}{stats['p50_us']:>12}{stats['p95_us']:>12}{stats['ops_per_s']:>12}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for operation, before, after, ratio in regressions:
+            print(f"REGRESSION {operation}: p50 {before} -> {after} us ({ratio}x)", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# lib/check_indexes.py
+"""Confirm that every model finder is answered through an index.
+
+Each finder is called with a sample argument while the SQL it issues is
+captured; every captured statement is then run through EXPLAIN QUERY PLAN
+and flagged if SQLite would scan a table instead of searching an index.
+Scans of a virtual table (the full-text index) are lookups in that index,
+and scans of a subquery read rows it already found by index; neither is
+flagged.
+"""
+import sys
+
+from models import CONN, explain_query_plan
+from models.patient import Patient
+from models.doctor import Doctor
+from models.appointment import Appointment
+from models.medical_record import MedicalRecord
+from models.scheduling import find_conflicts
+
+FINDERS = [
+    (Patient.find_by_id, (1,)),
+    (Patient.find_by_name, ("John", "Doe")),
+    (Doctor.find_by_id, (1,)),
+    (Doctor.find_by_name, ("Dr. House",)),
+    (Appointment.find_by_id, (1,)),
+    (Appointment.find_by_patient_id, (1,)),
+    (Appointment.find_by_doctor_id, (1,)),
+    (Appointment.find_by_patient_ids, ([1, 2, 3],)),
+    (Appointment.find_by_doctor_ids, ([1, 2, 3],)),
+    (MedicalRecord.find_by_id, (1,)),
+    (MedicalRecord.find_by_patient_id, (1,)),
+    (MedicalRecord.find_by_doctor_id, (1,)),
+    (MedicalRecord.find_by_patient_ids, ([1, 2, 3],)),
+    (MedicalRecord.find_by_doctor_ids, ([1, 2, 3],)),
+    (Patient.page, (1, 20, "name")),
+    (Doctor.page, (1, 20, "name")),
+    (Appointment.page, (1, 20, "appointment_date")),
+    (MedicalRecord.page, (1, 20, "record_date")),
+    (Appointment.find_between, ("2024-01-01", "2024-02-01")),
+    (Appointment.find_between, ("2024-01-01", "2024-02-01", 1)),
+    (MedicalRecord.find_between, ("2024-01-01", "2024-02-01")),
+    (MedicalRecord.find_between, ("2024-01-01", "2024-02-01", 1)),
+    (Patient.search_by_name, ("john smith",)),
+    (Doctor.search_by_name, ("greg house",)),
+    (MedicalRecord.search, ("bronchitis",)),
+    (MedicalRecord.search, ("bronchitis", 20, 1)),
+    (find_conflicts, ("2024-01-01 09:00", 30, 1, 1)),
+    (Appointment.free_slots, (1, "2024-01-01 09:00", "2024-01-08 17:00")),
+]
+
+
+def captured_statements(finder, args):
+    """Return the SQL statements (with bound values inlined) issued by a finder call"""
+    statements = []
+    # Statements SQLite runs internally (FTS5 reports them as "-- ..." comments) are skipped
+    CONN.set_trace_callback(lambda sql: sql.startswith("--") or statements.append(sql))
+    try:
+        finder(*args)
+    finally:
+        CONN.set_trace_callback(None)
+    return statements
+
+
+def is_table_scan(step):
+    """Return True for a plan step that reads a whole table (not a subquery or the full-text index)"""
+    return step.startswith("SCAN") and not step.startswith("SCAN (") and "VIRTUAL TABLE" not in step
+
+
+def check_finders():
+    """Return a list of (finder name, statement, plan) for every unindexed statement"""
+    failures = []
+    for finder, args in FINDERS:
+        for sql in captured_statements(finder, args):
+            plan = explain_query_plan(sql)
+            if any(is_table_scan(step) for step in plan):
+                failures.append((finder.__qualname__, sql.strip(), plan))
+    return failures
+
+
+def main():
+    failures = check_finders()
+    for name, sql, plan in failures:
+        print(f"{name} does not use an index: {sql}")
+        for step in plan:
+            print(f"    {step}")
+    if failures:
+        sys.exit(1)
+    print(f"All {len(FINDERS)} finders use an index.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,5 @@
 # lib/cli.py
 import sys
-from models.patient import manage_patients
-from models.doctor import manage_doctors
-from models.appointment import manage_appointments
-from models.medical_record import manage_medical_records
 
 from helpers import (
     exit_program,
@@ -12,18 +8,24 @@ from helpers import (
 
 
 def main():
+    # The models are imported by the first menu choice that needs them, so
+    # the menu appears without waiting on them or on the database.
     while True:
         menu()
         choice = input("Enter your choice: ")
         if choice == "0":
             exit_program()
         elif choice == "1":
+            from models.patient import manage_patients
             manage_patients()
         elif choice == "2":
+            from models.doctor import manage_doctors
             manage_doctors()
         elif choice == "3":
+            from models.appointment import manage_appointments
             manage_appointments()
         elif choice == "4":
+            from models.medical_record import manage_medical_records
             manage_medical_records()
         elif choice == "5":
             exit_program()
@@ -46,4 +48,12 @@ def menu():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if sys.argv[1:2] == ["serve"]:
+        from server import serve
+        serve(sys.argv[2:])
+    elif len(sys.argv) > 1:
+        # Batch commands such as `patients import` (see batch.py)
+        import batch
+        batch.main(sys.argv[1:])
+    else:
+        main()
\ No newline at end of file
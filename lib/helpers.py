@@ -1,10 +1,41 @@
 # lib/helpers.py
-from models.patient import Patient
 
 def helper_1():
     print("Performing useful function#1.")
 
 
+def browse_pages(fetch_page, page_size=10):
+    """Print results page by page with next/previous navigation.
+
+    fetch_page is a model's page() method (or a wrapper around it); pages
+    are requested by keyset, passing the id of the last or first row shown.
+    """
+    page = fetch_page(limit=page_size)
+    if not page:
+        print("No results found.")
+        return
+    while True:
+        for item in page:
+            print(item)
+        choice = input("n = next page, p = previous page, q = back: ").lower()
+        if choice == "n":
+            next_page = fetch_page(after_id=page[-1].id, limit=page_size)
+            if next_page:
+                page = next_page
+            else:
+                print("Already at the last page.")
+        elif choice == "p":
+            previous_page = fetch_page(before_id=page[0].id, limit=page_size)
+            if previous_page:
+                page = previous_page
+            else:
+                print("Already at the first page.")
+        elif choice == "q":
+            break
+        else:
+            print("Invalid choice. Please try again.")
+
+
 def exit_program():
     print("Goodbye!")
-    exit()
\ No newline at end of file
+    exit()
@@ -0,0 +1,711 @@
+import atexit
+import copy
+import functools
+import os
+import warnings
+from contextlib import contextmanager
+
+from models.dates import DATE_FORMAT, DATETIME_FORMAT, format_date, format_datetime, parse_datetime
+from models.instrumentation import QUERY_STATS, InstrumentedConnection
+from models.names import doctor_keys, patient_keys
+from models.pool import ConnectionPool
+from models.query_cache import QueryCache
+
+# Every thread gets its own connection and cursor from the pool. CONN and
+# CURSOR forward to the calling thread's pair, so model code can keep using
+# them as if they were a single module-level connection. The connections
+# report every statement to QUERY_STATS (see models.instrumentation).
+# Nothing is opened at import: the first query opens the thread's
+# connection, and bootstrap_schema() below brings its database up to date.
+POOL = ConnectionPool(factory=InstrumentedConnection)
+
+
+class _ThreadConnection:
+    """Proxy for the calling thread's pooled sqlite3 connection"""
+
+    def __getattr__(self, name):
+        return getattr(POOL.connection(), name)
+
+    def __repr__(self):
+        return f"<connection proxy for {POOL!r}>"
+
+
+class _ThreadCursor:
+    """Proxy for the calling thread's pooled sqlite3 cursor"""
+
+    def __getattr__(self, name):
+        return getattr(POOL.cursor(), name)
+
+    def __repr__(self):
+        return f"<cursor proxy for {POOL!r}>"
+
+
+CONN = _ThreadConnection()
+CURSOR = _ThreadCursor()
+
+create_doctors_table_sql = """
+    CREATE TABLE IF NOT EXISTS doctors (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        specialization TEXT NOT NULL,
+        name_norm TEXT,
+        surname_norm TEXT,
+        surname_soundex TEXT
+    )
+"""
+
+create_appointments_table_sql = """
+    CREATE TABLE IF NOT EXISTS appointments (
+        id INTEGER PRIMARY KEY,
+        appointment_date TEXT NOT NULL,
+        patient_id INTEGER NOT NULL,
+        doctor_id INTEGER NOT NULL,
+        notes TEXT,
+        duration INTEGER NOT NULL DEFAULT 30,
+        FOREIGN KEY(patient_id) REFERENCES patients(id),
+        FOREIGN KEY(doctor_id) REFERENCES doctors(id)
+    )
+"""
+
+create_medical_records_table_sql = """
+    CREATE TABLE IF NOT EXISTS medical_records (
+        id INTEGER PRIMARY KEY,
+        patient_id INTEGER NOT NULL,
+        doctor_id INTEGER NOT NULL,
+        record_date TEXT NOT NULL,
+        diagnosis TEXT NOT NULL,
+        treatment TEXT NOT NULL,
+        FOREIGN KEY(patient_id) REFERENCES patients(id),
+        FOREIGN KEY(doctor_id) REFERENCES doctors(id)
+    )
+"""
+
+create_patients_table_sql = """
+    CREATE TABLE IF NOT EXISTS patients (
+        id INTEGER PRIMARY KEY,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        age INTEGER NOT NULL,
+        gender TEXT NOT NULL,
+        first_name_norm TEXT,
+        last_name_norm TEXT,
+        first_name_soundex TEXT,
+        last_name_soundex TEXT
+    )
+"""
+
+# Lookup indexes for the finders, by table. A composite index also serves
+# lookups on its leading column, so (doctor_id, appointment_date) covers
+# find_by_doctor_id and (patient_id, record_date) covers
+# MedicalRecord.find_by_patient_id. The two appointment indexes also keep
+# each doctor's and patient's calendar sorted by start time for the overlap
+# checks in models.scheduling, and the date indexes answer the find_between
+# range scans. The *_norm and *_soundex indexes serve search_by_name (see
+# models.names).
+create_indexes_sql = {
+    "patients": [
+        "CREATE INDEX IF NOT EXISTS idx_patients_name ON patients (last_name, first_name)",
+        "CREATE INDEX IF NOT EXISTS idx_patients_last_name_norm ON patients (last_name_norm, first_name_norm)",
+        "CREATE INDEX IF NOT EXISTS idx_patients_first_name_norm ON patients (first_name_norm, last_name_norm)",
+        "CREATE INDEX IF NOT EXISTS idx_patients_last_name_soundex ON patients (last_name_soundex)",
+        "CREATE INDEX IF NOT EXISTS idx_patients_first_name_soundex ON patients (first_name_soundex)",
+    ],
+    "doctors": [
+        "CREATE INDEX IF NOT EXISTS idx_doctors_name ON doctors (name)",
+        "CREATE INDEX IF NOT EXISTS idx_doctors_name_norm ON doctors (name_norm)",
+        "CREATE INDEX IF NOT EXISTS idx_doctors_surname_norm ON doctors (surname_norm)",
+        "CREATE INDEX IF NOT EXISTS idx_doctors_surname_soundex ON doctors (surname_soundex)",
+    ],
+    "appointments": [
+        "CREATE INDEX IF NOT EXISTS idx_appointments_patient_id_date ON appointments (patient_id, appointment_date)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_doctor_id_date ON appointments (doctor_id, appointment_date)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments (appointment_date)",
+    ],
+    "medical_records": [
+        "CREATE INDEX IF NOT EXISTS idx_medical_records_patient_id_date ON medical_records (patient_id, record_date)",
+        "CREATE INDEX IF NOT EXISTS idx_medical_records_doctor_id_date ON medical_records (doctor_id, record_date)",
+        "CREATE INDEX IF NOT EXISTS idx_medical_records_date ON medical_records (record_date)",
+    ],
+}
+
+# Full-text index over medical record diagnoses and treatments. It is an
+# external-content FTS5 table: it stores only the token index and reads the
+# text from medical_records, and the triggers keep it in step with every
+# INSERT, UPDATE and DELETE on that table.
+create_search_index_sql = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS medical_records_fts USING fts5(
+        diagnosis, treatment,
+        content='medical_records', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS medical_records_fts_insert AFTER INSERT ON medical_records BEGIN
+        INSERT INTO medical_records_fts (rowid, diagnosis, treatment)
+        VALUES (new.id, new.diagnosis, new.treatment);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS medical_records_fts_delete AFTER DELETE ON medical_records BEGIN
+        INSERT INTO medical_records_fts (medical_records_fts, rowid, diagnosis, treatment)
+        VALUES ('delete', old.id, old.diagnosis, old.treatment);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS medical_records_fts_update AFTER UPDATE OF diagnosis, treatment ON medical_records BEGIN
+        INSERT INTO medical_records_fts (medical_records_fts, rowid, diagnosis, treatment)
+        VALUES ('delete', old.id, old.diagnosis, old.treatment);
+        INSERT INTO medical_records_fts (rowid, diagnosis, treatment)
+        VALUES (new.id, new.diagnosis, new.treatment);
+    END
+    """,
+]
+
+def create_search_index():
+    """Create the medical record full-text index, filling it from existing rows when it is new"""
+    exists = CURSOR.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'medical_records_fts'"
+    ).fetchone()
+    if exists:
+        return
+    for sql in create_search_index_sql:
+        CURSOR.execute(sql)
+    CURSOR.execute("INSERT INTO medical_records_fts (medical_records_fts) VALUES ('rebuild')")
+
+def fts_query(text):
+    """Turn free text into an FTS5 MATCH expression that finds rows containing every word.
+
+    Each word is quoted, so FTS5 operators and punctuation in the input are
+    matched literally instead of being parsed as query syntax; a trailing *
+    on a word is kept as a prefix search. Returns None when there are no words.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"%s"%s' % (word.replace('"', '""'), "*" if prefix else ""))
+    return " ".join(terms) or None
+
+# Columns added after the first release: (table, column, definition).
+# Databases created before then get them with ALTER TABLE on startup.
+added_columns = [
+    ("appointments", "duration", "INTEGER NOT NULL DEFAULT 30"),
+    ("patients", "first_name_norm", "TEXT"),
+    ("patients", "last_name_norm", "TEXT"),
+    ("patients", "first_name_soundex", "TEXT"),
+    ("patients", "last_name_soundex", "TEXT"),
+    ("doctors", "name_norm", "TEXT"),
+    ("doctors", "surname_norm", "TEXT"),
+    ("doctors", "surname_soundex", "TEXT"),
+]
+
+def add_missing_columns():
+    for table, column, definition in added_columns:
+        existing = [row[1] for row in CURSOR.execute(f"PRAGMA table_info({table})").fetchall()]
+        if column not in existing:
+            CURSOR.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _legacy_date(value):
+    try:
+        return format_date(value)
+    except ValueError:
+        return format_date(parse_datetime(value))
+
+# Date columns kept in canonical ISO-8601 text: (table, column, strftime
+# format of the canonical form, function rewriting a value written before validation).
+normalized_columns = [
+    ("appointments", "appointment_date", DATETIME_FORMAT, format_datetime),
+    ("medical_records", "record_date", DATE_FORMAT, _legacy_date),
+]
+
+def normalize_dates():
+    """Rewrite date values stored before the setters validated them.
+
+    SQLite parses every value and formats it again from its day number
+    ('+0 days' carries overflowing days into the next month), so only real
+    dates in canonical form compare equal. Everything else, including text
+    that merely looks canonical such as 2024-02-30 or 2024-13-45, is parsed
+    again in Python. Values that cannot be parsed are left unchanged and
+    reported with a warning.
+    """
+    for table, column, format, normalize in normalized_columns:
+        sql = f"SELECT id, {column} FROM {table} WHERE {column} IS NOT strftime(?, {column}, '+0 days')"
+        updates, invalid = [], []
+        for id, value in CURSOR.execute(sql, (format,)).fetchall():
+            try:
+                updates.append((normalize(value), id))
+            except ValueError:
+                invalid.append(id)
+        CURSOR.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", updates)
+        if invalid:
+            warnings.warn(f"{table}.{column} has unparseable values in rows {invalid[:10]} ({len(invalid)} total)")
+
+# Columns derived from others by the models on write: (table, source
+# columns, derived columns, function of the sources returning the derived
+# values). Rows written before a derived column existed are filled on startup.
+derived_columns = [
+    ("patients", ("first_name", "last_name"),
+     ("first_name_norm", "last_name_norm", "first_name_soundex", "last_name_soundex"), patient_keys),
+    ("doctors", ("name",), ("name_norm", "surname_norm", "surname_soundex"), doctor_keys),
+]
+
+def fill_derived_columns():
+    for table, sources, targets, derive in derived_columns:
+        sql = f"SELECT id, {', '.join(sources)} FROM {table} WHERE {targets[-1]} IS NULL"
+        updates = [(*derive(*row[1:]), row[0]) for row in CURSOR.execute(sql).fetchall()]
+        assignments = ", ".join(f"{target} = ?" for target in targets)
+        CURSOR.executemany(f"UPDATE {table} SET {assignments} WHERE id = ?", updates)
+
+def create_tables():
+    CURSOR.execute(create_doctors_table_sql)
+    CURSOR.execute(create_appointments_table_sql)
+    CURSOR.execute(create_medical_records_table_sql)
+    CURSOR.execute(create_patients_table_sql)
+
+# Progress of resumable imports (see models.transfer): input rows committed per job
+create_transfer_checkpoints_sql = """
+    CREATE TABLE IF NOT EXISTS transfer_checkpoints (
+        job TEXT PRIMARY KEY,
+        rows INTEGER NOT NULL,
+        updated TEXT NOT NULL
+    )
+"""
+
+def create_transfer_checkpoints():
+    CURSOR.execute(create_transfer_checkpoints_sql)
+
+def create_indexes():
+    for statements in create_indexes_sql.values():
+        for sql in statements:
+            CURSOR.execute(sql)
+
+# Steps bringing a database up to the current schema, in order. PRAGMA
+# user_version records how many of them a database has had, so opening an
+# up-to-date database costs one PRAGMA read instead of DDL and table scans.
+# Databases created before the version was recorded start at 0 with some of
+# the steps' effects already present, so every step must be idempotent.
+# Schema changes are appended as new steps; steps that may already have run
+# are never edited, reordered or removed.
+SCHEMA_STEPS = [
+    create_tables,
+    add_missing_columns,
+    normalize_dates,
+    create_indexes,
+    fill_derived_columns,
+    create_search_index,
+    create_transfer_checkpoints,
+]
+SCHEMA_VERSION = len(SCHEMA_STEPS)
+
+def schema_version(connection):
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+def bootstrap_schema(connection):
+    """Run the schema steps the connection's database has not had yet.
+
+    Called by the pool for every connection it opens, so nothing touches the
+    database until the first query. Read-only profiles are left alone.
+    """
+    if POOL.profile.get("query_only") or schema_version(connection) >= SCHEMA_VERSION:
+        return
+    # Re-read the version under the write lock, so processes starting
+    # together on an old database run each step once.
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        for step in SCHEMA_STEPS[schema_version(connection):]:
+            step()
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    except BaseException:
+        connection.rollback()
+        raise
+    connection.commit()
+
+POOL.on_open = bootstrap_schema
+
+def initialize_database():
+    """Bring the configured database up to the current schema now rather than on first use"""
+    bootstrap_schema(POOL.connection())
+
+
+def configure_database(database=None, profile=None):
+    """Switch every thread to another database file and/or PRAGMA profile.
+
+    profile is a name from models.pool.PROFILES ("durable", "throughput",
+    "readonly-analytics") or a dict of PRAGMA settings. The schema is
+    created in the new database, if it is missing, when it is first used.
+    """
+    POOL.configure(database, profile=profile)
+    QUERY_CACHE.clear()
+
+
+def active_settings():
+    """Return the database path, profile name and PRAGMA values in effect for this thread"""
+    return POOL.active_settings()
+
+
+def explain_query_plan(sql, params=()):
+    """Return the detail column of EXPLAIN QUERY PLAN for the given statement"""
+    rows = CONN.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [row[3] for row in rows]
+
+
+# Rows fetched per round trip by the streaming iter_* finders
+DEFAULT_ARRAYSIZE = 500
+
+def iter_chunks(sql, params=(), arraysize=None):
+    """Run a query on its own cursor and yield its rows in lists of up to arraysize"""
+    cursor = CONN.cursor()
+    cursor.arraysize = arraysize or DEFAULT_ARRAYSIZE
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+def keyset_page(table, order_columns, after_id=None, before_id=None, limit=20):
+    """Return up to limit rows of table ordered by order_columns, using keyset pagination.
+
+    order_columns must end with "id" so every row has a unique position.
+    The next page starts after the row with id after_id; the previous page
+    ends before the row with id before_id. Either way the query seeks the
+    index on order_columns instead of skipping rows with OFFSET, so every
+    page costs the same.
+    """
+    if after_id is not None and before_id is not None:
+        raise ValueError("Pass either after_id or before_id, not both")
+    backwards = before_id is not None
+    anchor = before_id if backwards else after_id
+    direction = " DESC" if backwards else ""
+    columns = ", ".join(order_columns)
+    where, params = "", []
+    if anchor is not None:
+        comparison = "<" if backwards else ">"
+        if tuple(order_columns) == ("id",):
+            where = f"WHERE id {comparison} ?"
+        else:
+            where = f"WHERE ({columns}) {comparison} (SELECT {columns} FROM {table} WHERE id = ?)"
+        params.append(anchor)
+    order = ", ".join(f"{column}{direction}" for column in order_columns)
+    sql = f"SELECT * FROM {table} {where} ORDER BY {order} LIMIT ?"
+    rows = CONN.execute(sql, (*params, limit)).fetchall()
+    return rows[::-1] if backwards else rows
+
+
+# SQLite limits the number of bound parameters in one statement, so batched
+# "WHERE x IN (...)" lookups are issued in chunks of this size.
+MAX_IN_PARAMS = 500
+
+def in_chunks(ids):
+    """Yield (placeholders, chunk) pairs for batched IN (...) queries over ids"""
+    ids = list(ids)
+    for start in range(0, len(ids), MAX_IN_PARAMS):
+        chunk = ids[start:start + MAX_IN_PARAMS]
+        yield ", ".join("?" * len(chunk)), chunk
+
+class Row:
+    """Base of the read-only rows returned by the finders with lightweight=True.
+
+    Each model's row class adds a namedtuple of its columns. A row is a
+    plain tuple: no validation, identity map or relations, and a fraction
+    of the memory and hydration time of a model instance.
+    """
+    __slots__ = ()
+
+    def to_dict(self):
+        return self._asdict()
+
+
+def instance_from_row(model, row):
+    """Return the model instance holding the values of a table row.
+
+    The instance already in model.all for the row's id is reused and
+    refreshed, so every finder hands out the same object for a row. Rows
+    come from the database, so _load() assigns them without the property
+    setters; values from any other source go through __init__ and the setters.
+    """
+    instance = model.all.get(row[0])
+    if instance:
+        instance._load(row)
+    else:
+        instance = model.__new__(model)
+        instance._load(row)
+        model.all[row[0]] = instance
+    return instance
+
+
+def still_mapped(model, instances):
+    """Return instances if model.all still holds every one of them, else None.
+
+    Relation lists are only kept on their owner while this holds: a list
+    whose loading made the identity map evict some of its own instances
+    would otherwise keep them alive past the map's capacity.
+    """
+    return instances if all(instance.id in model.all for instance in instances) else None
+
+
+def find_grouped(table, column, ids, hydrate):
+    """Return a dict mapping each value of column to the hydrate(row) results for its rows.
+
+    Only rows whose column is in ids are fetched, with batched IN (...)
+    queries; when ids is None every row of table is loaded in a single query.
+    """
+    if ids is None:
+        rows = CURSOR.execute(f"SELECT * FROM {table}").fetchall()
+    else:
+        rows = []
+        for placeholders, chunk in in_chunks(set(ids)):
+            sql = f"SELECT * FROM {table} WHERE {column} IN ({placeholders})"
+            rows.extend(CURSOR.execute(sql, chunk).fetchall())
+    grouped = {}
+    for instance in map(hydrate, rows):
+        grouped.setdefault(getattr(instance, column), []).append(instance)
+    return grouped
+
+
+# Each thread tracks the nesting level of its open transaction() blocks in
+# POOL.local; while it is non-zero the models' commit() calls are deferred
+# to the outermost block.
+def _transaction_depth():
+    return getattr(POOL.local, "transaction_depth", 0)
+
+def on_commit(func, *args):
+    """Call func(*args) once the outermost open transaction() block commits.
+
+    Outside a transaction() block nothing is queued: the caller's changes
+    are already committed. Callbacks queued inside a nested block that rolls
+    back to its savepoint are dropped with it.
+    """
+    if _transaction_depth() > 0:
+        if not hasattr(POOL.local, "after_commit"):
+            POOL.local.after_commit = []
+        POOL.local.after_commit.append((func, args))
+
+def _run_after_commit():
+    callbacks = getattr(POOL.local, "after_commit", [])
+    POOL.local.after_commit = []
+    for func, args in callbacks:
+        func(*args)
+
+def commit():
+    """Commit pending changes unless they belong to an open transaction() block"""
+    if _transaction_depth() == 0:
+        CONN.commit()
+
+
+class Transaction:
+    """Unit of work yielded by transaction().
+
+    Instances passed to add() are inserted (when new) or updated, and those
+    passed to delete() are deleted, in one flush when the block exits.
+    """
+
+    def __init__(self):
+        self.new = []
+        self.dirty = []
+        self.deleted = []
+        self._inserted = []
+
+    def add(self, instance):
+        pending = self.new if instance.id is None else self.dirty
+        if not any(queued is instance for queued in pending):
+            pending.append(instance)
+
+    def delete(self, instance):
+        if any(queued is instance for queued in self.new):
+            self.new = [queued for queued in self.new if queued is not instance]
+        elif not any(queued is instance for queued in self.deleted):
+            self.deleted.append(instance)
+
+    def flush(self):
+        """Write every queued instance inside the current transaction"""
+        for instance in self.new:
+            instance.save()
+            self._inserted.append(instance)
+        for instance in self.dirty:
+            instance.update()
+        for instance in self.deleted:
+            instance.delete()
+        self.new, self.dirty, self.deleted = [], [], []
+
+    def discard(self):
+        """Forget queued work and the ids handed out by a rolled back flush"""
+        for instance in self._inserted:
+            instance.id = None
+        self.new, self.dirty, self.deleted, self._inserted = [], [], [], []
+
+
+@contextmanager
+def transaction(immediate=False):
+    """Run the enclosed model operations as one atomic unit.
+
+    The outermost block commits once on success and rolls back on any
+    exception; nested blocks become savepoints that can fail on their own
+    without discarding the enclosing work. With immediate=True the
+    outermost block takes the write lock up front, so a check-then-write
+    sequence cannot race another connection's write.
+    """
+    depth = _transaction_depth()
+    savepoint = f"sp_{depth}"
+    # on_commit() callbacks queued inside a savepoint are dropped with it
+    queued = len(getattr(POOL.local, "after_commit", ()))
+    if depth == 0:
+        CURSOR.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    else:
+        CURSOR.execute(f"SAVEPOINT {savepoint}")
+    POOL.local.transaction_depth = depth + 1
+    unit = Transaction()
+    try:
+        yield unit
+        unit.flush()
+    except BaseException:
+        POOL.local.transaction_depth = depth
+        if depth == 0:
+            CONN.rollback()
+            POOL.local.after_commit = []
+        else:
+            CURSOR.execute(f"ROLLBACK TO {savepoint}")
+            CURSOR.execute(f"RELEASE {savepoint}")
+            del getattr(POOL.local, "after_commit", [])[queued:]
+        unit.discard()
+        raise
+    POOL.local.transaction_depth = depth
+    if depth == 0:
+        CONN.commit()
+        _run_after_commit()
+    else:
+        CURSOR.execute(f"RELEASE {savepoint}")
+
+
+def update_fields(instance, changes):
+    """Assign changes ({field: value}) through instance's setters, write them with update() and return the copy written.
+
+    instance is shared with every caller that looked it up, through the
+    identity map and the finder result cache, so the values are validated
+    and written on a copy. instance takes them only once update() has
+    succeeded or, inside a transaction() block, once the outermost block
+    commits; a rejected change is never seen by anyone else.
+    """
+    changed = copy.copy(instance)
+    for field, value in changes.items():
+        setattr(changed, field, value)
+    changed.update()
+    if _transaction_depth() > 0:
+        on_commit(vars(instance).update, vars(changed))
+    else:
+        vars(instance).update(vars(changed))
+    return changed
+
+
+def insert_many(sql, params):
+    """Run an INSERT for every parameter tuple in one transaction and return the new ids in order.
+
+    Each row's id is read back from lastrowid rather than derived from the
+    largest id, since ids need not be consecutive: rows may carry their own
+    id. A row skipped by a conflict clause such as OR IGNORE gets None.
+    """
+    ids = []
+    with transaction():
+        cursor = POOL.cursor()
+        for row in params:
+            cursor.execute(sql, row)
+            ids.append(cursor.lastrowid if cursor.rowcount > 0 else None)
+    return ids
+
+
+# Opt-in cache of finder results, shared by all threads. Setting
+# HOSPITAL_QUERY_CACHE_TTL (seconds) enables it at startup.
+QUERY_CACHE = QueryCache(
+    ttl=float(os.environ.get("HOSPITAL_QUERY_CACHE_TTL", QueryCache.DEFAULT_TTL)),
+    enabled="HOSPITAL_QUERY_CACHE_TTL" in os.environ,
+)
+
+def configure_query_cache(enabled=True, ttl=None, capacity=None):
+    """Turn the finder result cache on or off and/or change its TTL (seconds) and size"""
+    QUERY_CACHE.configure(enabled, ttl, capacity)
+
+def query_cache_stats():
+    """Return the finder result cache's size, settings and hit-rate counters"""
+    return QUERY_CACHE.stats()
+
+
+# Statement timing is off unless HOSPITAL_SQL_STATS is set; a non-empty
+# value names a file the snapshot is written to as JSON at exit.
+# HOSPITAL_SQL_SLOW_MS sets the slow-query threshold.
+QUERY_STATS.configure(
+    enabled="HOSPITAL_SQL_STATS" in os.environ,
+    slow_ms=float(os.environ.get("HOSPITAL_SQL_SLOW_MS", QUERY_STATS.DEFAULT_SLOW_MS)),
+)
+if os.environ.get("HOSPITAL_SQL_STATS"):
+    atexit.register(QUERY_STATS.export, os.path.abspath(os.environ["HOSPITAL_SQL_STATS"]))
+
+def configure_instrumentation(enabled=True, slow_ms=None, reset=False):
+    """Turn statement timing on or off, change the slow-query threshold (ms) and/or clear the statistics"""
+    QUERY_STATS.configure(enabled, slow_ms)
+    if reset:
+        QUERY_STATS.reset()
+
+def instrumentation_snapshot():
+    """Return per-statement latency, per-operation counts and the slow-query log as a dict"""
+    return QUERY_STATS.snapshot()
+
+def operation(name):
+    """Count the statements run inside a with block (or decorated function) as logical operation name"""
+    return QUERY_STATS.operation(name)
+
+
+def cached(table, column):
+    """Cache a finder classmethod's results while QUERY_CACHE is enabled.
+
+    Results are keyed by finder and arguments and tagged with
+    (table, column, first argument) plus (table, "id", id) for every
+    returned row, so invalidate() calls for the looked-up value or for any
+    returned row evict them. Inside a transaction() block the cache is
+    bypassed, as results there can include writes that may still roll back.
+    Callers get a copy of cached lists, but the instances in them are
+    shared: change them through update_fields().
+    """
+    def decorate(finder):
+        name = finder.__qualname__
+
+        @functools.wraps(finder)
+        def wrapper(cls, value, *args, **kwargs):
+            if not QUERY_CACHE.enabled or _transaction_depth() > 0:
+                return finder(cls, value, *args, **kwargs)
+            key = (name, value, args, tuple(sorted(kwargs.items())))
+            found, result = QUERY_CACHE.get(key)
+            if not found:
+                version = QUERY_CACHE.version
+                result = finder(cls, value, *args, **kwargs)
+                rows = result if isinstance(result, list) else [result] if result is not None else []
+                tags = {(table, column, value)} | {(table, "id", row.id) for row in rows}
+                QUERY_CACHE.set(key, result, tags, version)
+            return list(result) if isinstance(result, list) else result
+        return wrapper
+    return decorate
+
+
+def invalidate(table, **columns):
+    """Evict cached results built from rows of table with the given column values.
+
+    Called by the models after every write with the row's id and foreign
+    keys; a column may be given a list or set of values, and None values
+    are skipped. Inside a transaction() block the eviction is repeated
+    after the commit, so a result cached by another thread from the not
+    yet committed state does not survive it.
+    """
+    tags = [
+        (table, column, value)
+        for column, values in columns.items()
+        for value in (values if isinstance(values, (list, tuple, set, range)) else [values])
+        if value is not None
+    ]
+    QUERY_CACHE.invalidate(tags)
+    on_commit(QUERY_CACHE.invalidate, tags)
+
@@ -0,0 +1,142 @@
+# lib/models/aio.py
+import functools
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker threads that run blocking model calls. Each worker gets its own
+# pooled connection, so slow queries only tie up the worker running them.
+DEFAULT_WORKERS = 8
+
+# Items handed from a worker thread to the event loop at a time by aiterate()
+DEFAULT_CHUNK_SIZE = 100
+
+# asyncio is imported by the coroutines themselves: it costs more than the
+# rest of the models together, and synchronous callers never need it.
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the shared worker pool, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DEFAULT_WORKERS, thread_name_prefix="hospital-db")
+        return _executor
+
+
+def set_workers(workers):
+    """Replace the shared worker pool with one of the given size"""
+    global _executor
+    if not isinstance(workers, int) or workers < 1:
+        raise ValueError("Workers must be a positive integer")
+    with _executor_lock:
+        previous, _executor = _executor, ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hospital-db")
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+async def run(func, *args, **kwargs):
+    """Run a blocking model call on a worker thread and await its result.
+
+    Exceptions, including the ValueErrors raised by the property setters,
+    propagate to the awaiting coroutine unchanged.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+_DONE = object()
+
+
+async def aiterate(generator_function, *args, chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+    """Drive a blocking generator on one worker thread and yield its items asynchronously.
+
+    The whole generator runs on a single worker so its cursor stays on the
+    thread that owns the connection. Items cross to the event loop in lists
+    of chunk_size through a bounded queue, so a slow consumer applies back
+    pressure instead of buffering the whole result set.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=4)
+    stop = threading.Event()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce():
+        try:
+            chunk = []
+            for item in generator_function(*args, **kwargs):
+                chunk.append(item)
+                if len(chunk) >= chunk_size:
+                    put(chunk)
+                    chunk = []
+                if stop.is_set():
+                    return
+            if chunk:
+                put(chunk)
+        except BaseException as error:
+            put(error)
+        finally:
+            put(_DONE)
+
+    producer = loop.run_in_executor(get_executor(), produce)
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is _DONE:
+                break
+            if isinstance(chunk, BaseException):
+                raise chunk
+            for item in chunk:
+                yield item
+    finally:
+        # Unblock the producer if the consumer stopped early, then wait for
+        # it so the generator and its cursor are closed on the worker.
+        stop.set()
+        while not producer.done():
+            while not queue.empty():
+                queue.get_nowait()
+            await asyncio.wait([producer], timeout=0.01)
+        await producer
+
+
+def _awaitable(name):
+    if name.startswith("iter_"):
+        def method(target, *args, **kwargs):
+            return aiterate(getattr(target, name), *args, **kwargs)
+    else:
+        async def method(target, *args, **kwargs):
+            # Iterators are drained here so the worker never advances a
+            # generator that belongs to the caller's thread
+            args = [list(arg) if isinstance(arg, Iterator) else arg for arg in args]
+            return await run(getattr(target, name), *args, **kwargs)
+    method.__name__ = f"a{name}"
+    method.__doc__ = f"Awaitable {name}(): runs it on a worker thread (see models.aio)"
+    return method
+
+
+def async_methods(*names):
+    """Class decorator adding an awaitable a<name> for each named method.
+
+    The blocking method runs on a worker thread through run(), so
+    validation and errors are identical; iter_* generators become async
+    iterators through aiterate(). Classmethods stay classmethods. The
+    method is looked up on each call, so subclass overrides are honoured.
+    """
+    def decorate(cls):
+        for name in names:
+            method = _awaitable(name)
+            method.__qualname__ = f"{cls.__qualname__}.{method.__name__}"
+            if isinstance(cls.__dict__[name], classmethod):
+                method = classmethod(method)
+            setattr(cls, f"a{name}", method)
+        return cls
+    return decorate
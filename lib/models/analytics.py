@@ -0,0 +1,285 @@
+# lib/models/analytics.py
+"""Column buffers and group-by counts for reporting over medical records and appointments.
+
+load_medical_records() and load_appointments() read only the requested
+columns, chunk by chunk from the cursor, into typed array.array buffers (4
+bytes per id or day instead of a Python object per value). Text columns
+such as diagnosis are dictionary-encoded: each distinct value is stored
+once and rows hold its integer code. Dates arrive as day numbers computed
+by SQLite (date.toordinal() values), so no datetime is built per row.
+
+ColumnTable.count_by() and sum_by() group on one or more columns. With
+NumPy installed the buffers are viewed as arrays without copying and
+grouped with numpy.unique and numpy.bincount; without it the same results
+come from collections.Counter over the buffers. Group keys are returned
+decoded: ids as ints, dictionary columns as their text, "day" as
+YYYY-MM-DD and the derived "month" column as YYYY-MM.
+"""
+import math
+from array import array
+from collections import Counter, defaultdict
+from datetime import date
+
+from models import iter_chunks
+from models.dates import format_date, format_datetime
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# julianday() of 0001-01-01 minus one, so julianday(x) - offset is date.toordinal()
+_ORDINAL_OFFSET = 1721424.5
+
+# Loadable columns per table: name -> (SQL expression, array typecode), where
+# a typecode of None means dictionary-encoded text
+MEDICAL_RECORD_COLUMNS = {
+    "id": ("id", "q"),
+    "patient_id": ("patient_id", "i"),
+    "doctor_id": ("doctor_id", "i"),
+    "day": (f"CAST(julianday(record_date) - {_ORDINAL_OFFSET} AS INTEGER)", "i"),
+    "diagnosis": ("diagnosis", None),
+    "treatment": ("treatment", None),
+}
+
+APPOINTMENT_COLUMNS = {
+    "id": ("id", "q"),
+    "patient_id": ("patient_id", "i"),
+    "doctor_id": ("doctor_id", "i"),
+    "day": (f"CAST(julianday(appointment_date) - {_ORDINAL_OFFSET} AS INTEGER)", "i"),
+    "minute": ("CAST(substr(appointment_date, 12, 2) AS INTEGER) * 60 + CAST(substr(appointment_date, 15, 2) AS INTEGER)", "h"),
+    "duration": ("duration", "h"),
+}
+
+# Columns computed from loaded ones rather than read: name -> source column
+DERIVED_COLUMNS = {"month": "day"}
+
+
+class _Dictionary(dict):
+    """Maps each value to a code, handing out the next code to unseen values"""
+
+    def __missing__(self, value):
+        code = self[value] = len(self)
+        return code
+
+
+def _day_label(day):
+    return date.fromordinal(day).isoformat()
+
+
+def _month_label(day):
+    return date.fromordinal(day).isoformat()[:7]
+
+
+class ColumnTable:
+    """Column buffers of one query's rows, with group-by helpers.
+
+    columns maps names to array.array buffers of equal length; dictionaries
+    maps the names of dictionary-encoded columns to their values, indexed
+    by code.
+    """
+
+    def __init__(self, table, columns, dictionaries):
+        self.table = table
+        self.columns = columns
+        self.dictionaries = dictionaries
+
+    def __repr__(self):
+        return f"ColumnTable({self.table!r}, rows={len(self)}, columns={list(self.columns)}, nbytes={self.nbytes})"
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), ()))
+
+    @property
+    def nbytes(self):
+        """Bytes held by the column buffers (dictionary values not included)"""
+        return sum(len(column) * column.itemsize for column in self.columns.values())
+
+    def column(self, name):
+        """Return a column as a NumPy array sharing the buffer, or the array.array without NumPy"""
+        buffer = self.columns[name]
+        return numpy.frombuffer(buffer, dtype=buffer.typecode) if numpy is not None else buffer
+
+    def decode(self, name, value):
+        """Return the group label of a stored value of column name"""
+        if name in self.dictionaries:
+            return self.dictionaries[name][value]
+        if name == "day":
+            return _day_label(value)
+        if name == "month":
+            return _month_label(value)
+        return int(value)
+
+    def count_by(self, *names):
+        """Return {key: row count} grouped on the named columns, sorted by key.
+
+        A key is a single decoded value for one column, a tuple for several.
+        """
+        return {key: count for key, (count, _) in self._group(names, None).items()}
+
+    def sum_by(self, total, *names):
+        """Return {key: (row count, sum of column total)} grouped on the named columns, sorted by key"""
+        if total not in self.columns or total in self.dictionaries:
+            raise ValueError(f"Cannot sum {total!r}; expected a numeric loaded column")
+        return self._group(names, total)
+
+    def counts_per_doctor(self):
+        return self.count_by("doctor_id")
+
+    def counts_per_diagnosis(self):
+        return self.count_by("diagnosis")
+
+    def counts_per_day(self):
+        return self.count_by("day")
+
+    def counts_per_month(self):
+        return self.count_by("month")
+
+    def _source(self, name):
+        source = DERIVED_COLUMNS.get(name, name)
+        if source not in self.columns:
+            raise ValueError(f"Column {name!r} was not loaded; loaded columns are {', '.join(self.columns)}")
+        return source
+
+    def _group(self, names, total):
+        if not names:
+            raise ValueError("Group on at least one column")
+        sources = [self._source(name) for name in names]
+        if numpy is not None:
+            groups = self._group_numpy(names, sources, total)
+        else:
+            groups = self._group_counter(names, sources, total)
+        return dict(sorted(groups.items()))
+
+    def _group_numpy(self, names, sources, total):
+        # Give every key column dense codes, combine them into one integer
+        # per row, and count (and sum) per distinct combination.
+        combined = numpy.zeros(len(self), dtype=numpy.int64)
+        labels = []
+        for name, source in zip(names, sources):
+            values, inverse = numpy.unique(self.column(source), return_inverse=True)
+            column_labels = [self.decode(name, value) for value in values.tolist()]
+            if name in DERIVED_COLUMNS:
+                # Several days share a month: merge their codes
+                merged = sorted(set(column_labels))
+                position = {label: index for index, label in enumerate(merged)}
+                inverse = numpy.array([position[label] for label in column_labels], dtype=numpy.int64)[inverse]
+                column_labels = merged
+            combined = combined * len(column_labels) + inverse
+            labels.append(column_labels)
+        weights = self.column(total) if total else None
+        size = math.prod(len(column_labels) for column_labels in labels)
+        if size <= max(len(self), 1 << 20):
+            # Few enough combinations for one counter slot each
+            counts = numpy.bincount(combined, minlength=size)
+            keys = numpy.flatnonzero(counts)
+            counts = counts[keys]
+            sums = numpy.bincount(combined, weights=weights, minlength=size)[keys].tolist() if total else None
+        else:
+            keys, inverse, counts = numpy.unique(combined, return_inverse=True, return_counts=True)
+            sums = numpy.bincount(inverse, weights=weights).tolist() if total else None
+        groups = {}
+        for index, (key, count) in enumerate(zip(keys.tolist(), counts.tolist())):
+            parts = []
+            for column_labels in reversed(labels):
+                key, code = divmod(key, len(column_labels))
+                parts.append(column_labels[code])
+            parts.reverse()
+            group = parts[0] if len(parts) == 1 else tuple(parts)
+            groups[group] = (count, int(sums[index])) if total else (count, None)
+        return groups
+
+    def _group_counter(self, names, sources, total):
+        columns = []
+        for name, source in zip(names, sources):
+            column = self.columns[source]
+            if name in DERIVED_COLUMNS:
+                # Map each distinct day to its month once, then per row through the dict
+                months = {day: _month_label(day) for day in set(column)}
+                column = map(months.__getitem__, column)
+            columns.append(column)
+        keys = zip(*columns) if len(columns) > 1 else columns[0]
+        if total is None:
+            counted = {key: (count, None) for key, count in Counter(keys).items()}
+        else:
+            counts, sums = Counter(), defaultdict(int)
+            for key, value in zip(keys, self.columns[total]):
+                counts[key] += 1
+                sums[key] += value
+            counted = {key: (count, sums[key]) for key, count in counts.items()}
+
+        def label(name, value):
+            return value if name in DERIVED_COLUMNS else self.decode(name, value)
+
+        if len(names) == 1:
+            return {label(names[0], key): value for key, value in counted.items()}
+        return {tuple(map(label, names, key)): value for key, value in counted.items()}
+
+
+def load_columns(table, specs, date_column, format_bound, columns, start=None, end=None, doctor_id=None,
+                 patient_id=None, arraysize=None):
+    """Read the named columns of table's rows into a ColumnTable.
+
+    start and end bound date_column (from start up to, not including, end)
+    after normalizing with format_bound, so the range uses the date index.
+    When day (or month) is loaded, rows whose date SQLite cannot parse are
+    left out.
+    """
+    unknown = [name for name in columns if name not in specs and name not in DERIVED_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown {table} columns: {', '.join(unknown)}; expected {', '.join(specs)}")
+    # A derived column is loaded as its source
+    loaded = list(dict.fromkeys(DERIVED_COLUMNS.get(name, name) for name in columns))
+    conditions, params = [], []
+    if start is not None:
+        conditions.append(f"{date_column} >= ?")
+        params.append(format_bound(start))
+    if end is not None:
+        conditions.append(f"{date_column} < ?")
+        params.append(format_bound(end))
+    if doctor_id is not None:
+        conditions.append("doctor_id = ?")
+        params.append(doctor_id)
+    if patient_id is not None:
+        conditions.append("patient_id = ?")
+        params.append(patient_id)
+    if "day" in loaded:
+        # Dates normalize_dates() could not parse have no day number
+        conditions.append(f"julianday({date_column}) IS NOT NULL")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"SELECT {', '.join(specs[name][0] for name in loaded)} FROM {table}{where}"
+
+    buffers = {name: array(specs[name][1] or "i") for name in loaded}
+    lookups = {name: _Dictionary() for name in loaded if specs[name][1] is None}
+    targets = [(buffers[name], lookups.get(name)) for name in loaded]
+    for rows in iter_chunks(sql, params, arraysize):
+        for (buffer, lookup), values in zip(targets, zip(*rows)):
+            buffer.extend(map(lookup.__getitem__, values) if lookup is not None else values)
+    return ColumnTable(table, buffers, {name: list(lookup) for name, lookup in lookups.items()})
+
+
+def load_medical_records(columns=("doctor_id", "patient_id", "day", "diagnosis"), start=None, end=None,
+                         doctor_id=None, patient_id=None, arraysize=None):
+    """Load medical record columns (see MEDICAL_RECORD_COLUMNS, plus "month") dated in [start, end)"""
+    return load_columns(
+        "medical_records", MEDICAL_RECORD_COLUMNS, "record_date", format_date, columns,
+        start, end, doctor_id, patient_id, arraysize,
+    )
+
+
+def load_appointments(columns=("doctor_id", "patient_id", "day", "duration"), start=None, end=None,
+                      doctor_id=None, patient_id=None, arraysize=None):
+    """Load appointment columns (see APPOINTMENT_COLUMNS, plus "month") starting in [start, end)"""
+    return load_columns(
+        "appointments", APPOINTMENT_COLUMNS, "appointment_date", format_datetime, columns,
+        start, end, doctor_id, patient_id, arraysize,
+    )
+
+
+def monthly_utilization(start=None, end=None, doctor_id=None):
+    """Return {(doctor_id, "YYYY-MM"): {"appointments": n, "booked_minutes": m}} for appointments in [start, end)"""
+    appointments = load_appointments(("doctor_id", "month", "duration"), start, end, doctor_id)
+    return {
+        key: {"appointments": count, "booked_minutes": minutes}
+        for key, (count, minutes) in appointments.sum_by("duration", "doctor_id", "month").items()
+    }
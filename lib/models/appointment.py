@@ -1,30 +1,66 @@
 # lib/models/appointment.py
-from models.__init__ import CONN, CURSOR
+from collections import namedtuple
 
+from models import CURSOR, iter_chunks, insert_many, keyset_page, commit, cached, invalidate, transaction, operation, create_indexes_sql, find_grouped, Row, instance_from_row
+from models.dates import format_datetime
+from models.scheduling import DEFAULT_DURATION, MAX_DURATION, check_availability, check_batch, next_free_slots
+from models.identity_map import IdentityMap
+from models.aio import async_methods
+
+class AppointmentRow(Row, namedtuple("AppointmentRow", ["id", "appointment_date", "patient_id", "doctor_id", "notes", "duration"])):
+    """Read-only Appointment row returned by the finders with lightweight=True (see models.Row)"""
+    __slots__ = ()
+
+# Awaitable a<name> versions of the blocking methods (see models.aio)
+@async_methods(
+    "find_by_id", "find_by_patient_id", "find_by_doctor_id", "free_slots", "find_between",
+    "page", "create", "create_many", "save", "update", "delete", "iter_all",
+    "iter_by_patient_id", "iter_by_doctor_id",
+)
 class Appointment:
     
-    all = {}
+    all = IdentityMap()
+    
+    # Indexes backing the find_by_* lookups, created alongside the table (see create_indexes_sql)
+    INDEXES = create_indexes_sql["appointments"]
+    
+    # Persisted attributes, in the argument order of create()
+    FIELDS = ("appointment_date", "patient_id", "doctor_id", "notes", "duration")
     
-    def __init__(self, appointment_date, patient_id, doctor_id, notes=None, id=None):
+    # Columns read by the finders, in AppointmentRow order
+    COLUMNS = ", ".join(AppointmentRow._fields)
+    
+    # Sort orders accepted by page(); each ends with id and is backed by an index
+    PAGE_ORDERS = {
+        "id": ("id",),
+        "appointment_date": ("appointment_date", "id"),
+    }
+    
+    def __init__(self, appointment_date, patient_id, doctor_id, notes=None, duration=DEFAULT_DURATION, id=None):
         self.id = id
         self.appointment_date = appointment_date
         self.patient_id = patient_id
         self.doctor_id = doctor_id
         self.notes = notes
+        self.duration = duration
 
     def __repr__(self):
         return (
-            f"Appointment(id={self.id}, appointment_date={self.appointment_date}, patient_id={self.patient_id}, doctor_id={self.doctor_id}, notes={self.notes})"
+            f"Appointment(id={self.id}, appointment_date={self.appointment_date}, patient_id={self.patient_id}, doctor_id={self.doctor_id}, notes={self.notes}, duration={self.duration})"
         )
     
+    def to_dict(self):
+        """Return the persisted attributes (and id) as a JSON-serializable dict"""
+        return {"id": self.id, **{field: getattr(self, field) for field in self.FIELDS}}
+    
     @property
     def appointment_date(self):
         return self._appointment_date
     
     @appointment_date.setter
     def appointment_date(self, appointment_date):
-        # Add validation if necessary
-        self._appointment_date = appointment_date
+        # Stored as "YYYY-MM-DD HH:MM" so text order matches time order in the indexes
+        self._appointment_date = format_datetime(appointment_date)
 
     @property
     def patient_id(self):
@@ -58,10 +94,21 @@ class Appointment:
             self._notes = notes
         else:
             raise ValueError("Notes must be a string or None")
+
+    @property
+    def duration(self):
+        return self._duration
+    
+    @duration.setter
+    def duration(self, duration):
+        if isinstance(duration, int) and 0 < duration <= MAX_DURATION:
+            self._duration = duration
+        else:
+            raise ValueError(f"Duration must be a whole number of minutes between 1 and {MAX_DURATION}")
     
     @classmethod
     def create_table(cls):
-        """Create a new table to persist the attributes of Appointment instances"""
+        """Create a new table (and its lookup indexes) to persist the attributes of Appointment instances"""
         sql = """
             CREATE TABLE IF NOT EXISTS appointments (
                 id INTEGER PRIMARY KEY,
@@ -69,81 +116,134 @@ class Appointment:
                 patient_id INTEGER NOT NULL,
                 doctor_id INTEGER NOT NULL,
                 notes TEXT,
+                duration INTEGER NOT NULL DEFAULT 30,
                 FOREIGN KEY(patient_id) REFERENCES patients(id),
                 FOREIGN KEY(doctor_id) REFERENCES doctors(id)
             )
         """
         CURSOR.execute(sql)
-        CONN.commit()
+        for sql in cls.INDEXES:
+            CURSOR.execute(sql)
+        commit()
     
     @classmethod
     def drop_table(cls):
         """Drop the table that persists the attributes of Appointment instances"""
         sql = "DROP TABLE IF EXISTS appointments"
         CURSOR.execute(sql)
-        CONN.commit()
+        commit()
     
     def save(self):
-        """Persist the attributes of an Appointment instance to the database"""
+        """Persist the attributes of an Appointment instance to the database.
+
+        Raises SchedulingConflict if the doctor or patient already has an
+        appointment overlapping this one.
+        """
         sql = """
-            INSERT INTO appointments (appointment_date, patient_id, doctor_id, notes)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO appointments (appointment_date, patient_id, doctor_id, notes, duration)
+            VALUES (?, ?, ?, ?, ?)
         """
-        CURSOR.execute(sql, (self.appointment_date, self.patient_id, self.doctor_id, self.notes))
-        CONN.commit()
-        self.id = CURSOR.lastrowid
+        with transaction(immediate=True):
+            check_availability(self.appointment_date, self.duration, self.doctor_id, self.patient_id)
+            CURSOR.execute(sql, (self.appointment_date, self.patient_id, self.doctor_id, self.notes, self.duration))
+            id = CURSOR.lastrowid
+        self.id = id
+        invalidate("appointments", id=self.id, patient_id=self.patient_id, doctor_id=self.doctor_id)
     
     def update(self):
-        """Update the table row corresponding to the current Appointment instance"""
+        """Update the table row corresponding to the current Appointment instance.
+
+        Raises SchedulingConflict if the new time overlaps another appointment
+        of the same doctor or patient.
+        """
         sql = """
             UPDATE appointments
-            SET appointment_date = ?, patient_id = ?, doctor_id = ?, notes = ?
+            SET appointment_date = ?, patient_id = ?, doctor_id = ?, notes = ?, duration = ?
             WHERE id = ?
         """
-        CURSOR.execute(sql, (self.appointment_date, self.patient_id, self.doctor_id, self.notes, self.id))
-        CONN.commit()
+        with transaction(immediate=True):
+            check_availability(self.appointment_date, self.duration, self.doctor_id, self.patient_id, exclude_id=self.id)
+            # The old owners' cached lists change too if the appointment was moved
+            old = CURSOR.execute("SELECT patient_id, doctor_id FROM appointments WHERE id = ?", (self.id,)).fetchone()
+            CURSOR.execute(sql, (self.appointment_date, self.patient_id, self.doctor_id, self.notes, self.duration, self.id))
+        patient_ids, doctor_ids = {self.patient_id}, {self.doctor_id}
+        if old:
+            patient_ids.add(old[0])
+            doctor_ids.add(old[1])
+        invalidate("appointments", id=self.id, patient_id=patient_ids, doctor_id=doctor_ids)
     
     def delete(self):
         """Delete the table row corresponding to the current Appointment instance"""
         sql = "DELETE FROM appointments WHERE id = ?"
         CURSOR.execute(sql, (self.id,))
-        CONN.commit()
+        commit()
+        type(self).all.pop(self.id, None)
+        invalidate("appointments", id=self.id, patient_id=self.patient_id, doctor_id=self.doctor_id)
     
     @classmethod
-    def create(cls, appointment_date, patient_id, doctor_id, notes=None):
+    def create(cls, appointment_date, patient_id, doctor_id, notes=None, duration=DEFAULT_DURATION):
         """Create a new Appointment instance and persist it to the database"""
-        appointment = cls(appointment_date, patient_id, doctor_id, notes)
+        appointment = cls(appointment_date, patient_id, doctor_id, notes, duration)
         appointment.save()
         return appointment
     
+    @classmethod
+    def create_many(cls, rows):
+        """Create and persist Appointment instances from an iterable of tuples or dicts.
+
+        Rows use the argument order (or keyword names) of create(). All rows are
+        validated through the property setters and checked for double bookings,
+        against each other and against the stored calendars, before anything
+        is written, then inserted in a single transaction. Returns the new
+        ids; a row that gives an id keeps it.
+        """
+        appointments = [cls(**row) if isinstance(row, dict) else cls(*row) for row in rows]
+        sql = """
+            INSERT INTO appointments (id, appointment_date, patient_id, doctor_id, notes, duration)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """
+        check_batch(appointments)
+        with transaction(immediate=True):
+            for appointment in appointments:
+                check_availability(appointment.appointment_date, appointment.duration, appointment.doctor_id, appointment.patient_id)
+            ids = insert_many(sql, ((appointment.id, appointment.appointment_date, appointment.patient_id, appointment.doctor_id, appointment.notes, appointment.duration) for appointment in appointments))
+        for appointment, id in zip(appointments, ids):
+            appointment.id = id
+        invalidate(
+            "appointments",
+            id=ids,
+            patient_id={appointment.patient_id for appointment in appointments},
+            doctor_id={appointment.doctor_id for appointment in appointments},
+        )
+        return ids
+    
+    def _load(self, row):
+        """Assign the values of a table row without validation; they were validated when written"""
+        self.id, self._appointment_date, self._patient_id, self._doctor_id, self._notes, self._duration = row[:6]
+    
     @classmethod
     def instance_from_db(cls, row):
-        """Return an Appointment object having the attribute values from the table row."""
-        
-        # Check the dictionary for existing instances using the row's primary key
-        appointment = cls.all.get(row[0])
-        if appointment:
-            # Ensure attributes match row values in case local instance was modified
-            appointment.appointment_date = row[1]
-            appointment.patient_id = row[2]
-            appointment.doctor_id = row[3]
-            appointment.notes = row[4]
-        else:
-            # Create a new instance using row values
-            appointment = cls(row[1], row[2], row[3], row[4], id=row[0])
-            cls.all[row[0]] = appointment
-        
-        return appointment
+        """Return an Appointment object having the attribute values from the table row (see models.instance_from_row)"""
+        return instance_from_row(cls, row)
     
     @classmethod
-    def get_all(cls):
-        """Return a list of all Appointment instances persisted to the database"""
-        sql = "SELECT * FROM appointments"
+    def get_all(cls, lightweight=False):
+        """Return a list of all Appointment instances persisted to the database (AppointmentRow tuples with lightweight=True)"""
+        sql = f"SELECT {cls.COLUMNS} FROM appointments"
         CURSOR.execute(sql)
         rows = CURSOR.fetchall()
+        return list(map(AppointmentRow._make if lightweight else cls.instance_from_db, rows))
+    
+    @classmethod
+    def page(cls, after_id=None, limit=20, order_by="id", before_id=None):
+        """Return up to limit Appointment instances following after_id (or preceding before_id) in order_by order"""
+        if order_by not in cls.PAGE_ORDERS:
+            raise ValueError(f"order_by must be one of {', '.join(cls.PAGE_ORDERS)}")
+        rows = keyset_page("appointments", cls.PAGE_ORDERS[order_by], after_id, before_id, limit)
         return [cls.instance_from_db(row) for row in rows]
     
     @classmethod
+    @cached("appointments", "id")
     def find_by_id(cls, id):
         """Return the Appointment instance with the given primary key"""
         sql = "SELECT * FROM appointments WHERE id = ?"
@@ -151,21 +251,81 @@ class Appointment:
         return cls.instance_from_db(row) if row else None
     
     @classmethod
-    def find_by_patient_id(cls, patient_id):
-        """Return a list of Appointment instances for the given patient_id"""
-        sql = "SELECT * FROM appointments WHERE patient_id = ?"
+    def find_between(cls, start, end, doctor_id=None, lightweight=False):
+        """Return the Appointment instances starting from start up to (not including) end, in start order.
+
+        start and end are datetimes, dates or ISO-8601 strings; the query is a
+        range scan on the appointment_date index, or on (doctor_id,
+        appointment_date) when doctor_id is given. With lightweight=True
+        AppointmentRow tuples are returned instead.
+        """
+        params = [format_datetime(start), format_datetime(end)]
+        where = "appointment_date >= ? AND appointment_date < ?"
+        if doctor_id is not None:
+            where = "doctor_id = ? AND " + where
+            params.insert(0, doctor_id)
+        sql = f"SELECT {cls.COLUMNS} FROM appointments WHERE {where} ORDER BY appointment_date, id"
+        CURSOR.execute(sql, params)
+        rows = CURSOR.fetchall()
+        return list(map(AppointmentRow._make if lightweight else cls.instance_from_db, rows))
+    
+    @classmethod
+    @cached("appointments", "patient_id")
+    def find_by_patient_id(cls, patient_id, lightweight=False):
+        """Return a list of Appointment instances for the given patient_id (AppointmentRow tuples with lightweight=True)"""
+        sql = f"SELECT {cls.COLUMNS} FROM appointments WHERE patient_id = ?"
         CURSOR.execute(sql, (patient_id,))
         rows = CURSOR.fetchall()
-        return [cls.instance_from_db(row) for row in rows]
+        return list(map(AppointmentRow._make if lightweight else cls.instance_from_db, rows))
 
     @classmethod
-    def find_by_doctor_id(cls, doctor_id):
-        """Return a list of Appointment instances for the given doctor_id"""
-        sql = "SELECT * FROM appointments WHERE doctor_id = ?"
+    @cached("appointments", "doctor_id")
+    def find_by_doctor_id(cls, doctor_id, lightweight=False):
+        """Return a list of Appointment instances for the given doctor_id (AppointmentRow tuples with lightweight=True)"""
+        sql = f"SELECT {cls.COLUMNS} FROM appointments WHERE doctor_id = ?"
         CURSOR.execute(sql, (doctor_id,))
         rows = CURSOR.fetchall()
-        return [cls.instance_from_db(row) for row in rows]
-    #CLI Interface
+        return list(map(AppointmentRow._make if lightweight else cls.instance_from_db, rows))
+
+    @classmethod
+    def free_slots(cls, doctor_id, start, end, count=5, duration=DEFAULT_DURATION):
+        """Return up to count free start times ("YYYY-MM-DD HH:MM") for doctor_id between start and end"""
+        return next_free_slots(doctor_id, start, end, count, duration)
+
+    @classmethod
+    def iter_all(cls, arraysize=None, lightweight=False):
+        """Yield every Appointment instance (or AppointmentRow tuple), fetching rows from the database in chunks of arraysize"""
+        sql = f"SELECT {cls.COLUMNS} FROM appointments"
+        hydrate = AppointmentRow._make if lightweight else cls.instance_from_db
+        for rows in iter_chunks(sql, (), arraysize):
+            yield from map(hydrate, rows)
+
+    @classmethod
+    def iter_by_patient_id(cls, patient_id, arraysize=None, lightweight=False):
+        """Yield the Appointment instances (or AppointmentRow tuples) for the given patient_id, fetched in chunks of arraysize"""
+        sql = f"SELECT {cls.COLUMNS} FROM appointments WHERE patient_id = ?"
+        hydrate = AppointmentRow._make if lightweight else cls.instance_from_db
+        for rows in iter_chunks(sql, (patient_id,), arraysize):
+            yield from map(hydrate, rows)
+
+    @classmethod
+    def iter_by_doctor_id(cls, doctor_id, arraysize=None, lightweight=False):
+        """Yield the Appointment instances (or AppointmentRow tuples) for the given doctor_id, fetched in chunks of arraysize"""
+        sql = f"SELECT {cls.COLUMNS} FROM appointments WHERE doctor_id = ?"
+        hydrate = AppointmentRow._make if lightweight else cls.instance_from_db
+        for rows in iter_chunks(sql, (doctor_id,), arraysize):
+            yield from map(hydrate, rows)
+
+    @classmethod
+    def find_by_patient_ids(cls, patient_ids=None):
+        """Return a dict mapping each patient_id to its list of Appointment instances (every row when patient_ids is None)"""
+        return find_grouped("appointments", "patient_id", patient_ids, cls.instance_from_db)
+
+    @classmethod
+    def find_by_doctor_ids(cls, doctor_ids=None):
+        """Return a dict mapping each doctor_id to its list of Appointment instances (every row when doctor_ids is None)"""
+        return find_grouped("appointments", "doctor_id", doctor_ids, cls.instance_from_db)
+
 def manage_appointments():
      while True:
         print("\n--- Manage Appointments ---")
@@ -173,6 +333,8 @@ def manage_appointments():
         print("2. View All Appointments")
         print("3. Find Appointment by ID")
         print("4. Delete Appointment")
+        print("5. Browse Appointments")
+        print("6. Find Free Slots for a Doctor")
         print("0. Back to Main Menu")
         
         choice = input("> ")
@@ -185,27 +347,58 @@ def manage_appointments():
             find_appointment_by_id()
         elif choice == "4":
             delete_appointment()
+        elif choice == "5":
+            browse_appointments()
+        elif choice == "6":
+            find_free_slots()
         elif choice == "0":
             break
         else:
             print("Invalid choice, please try again.")
 
+@operation("cli appointments add")
 def create_appointment():
     try:
         appointment_date = input("Enter appointment date (YYYY-MM-DD HH:MM): ")
         patient_id = int(input("Enter patient ID: "))
         doctor_id = int(input("Enter doctor ID: "))
+        duration = input(f"Enter duration in minutes (default {DEFAULT_DURATION}): ")
+        duration = int(duration) if duration else DEFAULT_DURATION
         notes = input("Enter notes (optional): ")
-        Appointment.create(appointment_date, patient_id, doctor_id, notes)
+        Appointment.create(appointment_date, patient_id, doctor_id, notes, duration)
         print("Appointment created successfully!")
     except Exception as e:
         print(f"Error creating appointment: {e}")
 
+@operation("cli appointments view")
 def view_all_appointments():
-    appointments = Appointment.get_all()
-    for appointment in appointments:
+    for appointment in Appointment.iter_all():
         print(appointment)
 
+@operation("cli appointments browse")
+def browse_appointments():
+    from helpers import browse_pages
+    order_by = "appointment_date" if input("Sort by date? (y/n): ").lower() == "y" else "id"
+    browse_pages(lambda **page: Appointment.page(order_by=order_by, **page))
+
+@operation("cli appointments free slots")
+def find_free_slots():
+    try:
+        doctor_id = int(input("Enter doctor ID: "))
+        start = input("Enter earliest start (YYYY-MM-DD HH:MM): ")
+        end = input("Enter latest end (YYYY-MM-DD HH:MM): ")
+        duration = input(f"Enter duration in minutes (default {DEFAULT_DURATION}): ")
+        duration = int(duration) if duration else DEFAULT_DURATION
+        slots = Appointment.free_slots(doctor_id, start, end, duration=duration)
+        if slots:
+            for slot in slots:
+                print(slot)
+        else:
+            print("No free slots in that range.")
+    except ValueError as e:
+        print(f"Error finding free slots: {e}")
+
+@operation("cli appointments find")
 def find_appointment_by_id():
     try:
         appointment_id = int(input("Enter appointment ID: "))
@@ -217,6 +410,7 @@ def find_appointment_by_id():
     except ValueError:
         print("Invalid ID format.")
 
+@operation("cli appointments delete")
 def delete_appointment():
     try:
         appointment_id = int(input("Enter appointment ID: "))
@@ -0,0 +1,61 @@
+# lib/models/dates.py
+"""Canonical text forms for the date columns.
+
+appointment_date is stored as "YYYY-MM-DD HH:MM" and record_date as
+"YYYY-MM-DD". Both are zero-padded ISO-8601, so comparing the stored text
+orders rows by time and range queries can be answered from an index.
+Values are parsed once by the model setters and written in these forms.
+"""
+from datetime import date, datetime
+
+DATE_FORMAT = "%Y-%m-%d"
+DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+
+# Accepted on input; strptime also takes unpadded months, days and hours
+DATETIME_INPUT_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S")
+DATE_INPUT_FORMATS = ("%Y-%m-%d",)
+
+
+def _parse(value, formats):
+    if isinstance(value, str):
+        for format in formats:
+            try:
+                return datetime.strptime(value.strip(), format)
+            except ValueError:
+                pass
+    return None
+
+
+def parse_datetime(value):
+    """Return a naive datetime (to the minute) for a datetime, date or ISO-8601 string"""
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, date):
+        parsed = datetime(value.year, value.month, value.day)
+    else:
+        parsed = _parse(value, DATETIME_INPUT_FORMATS + DATE_INPUT_FORMATS)
+    if parsed is None or parsed.tzinfo is not None:
+        raise ValueError(f"Date and time must use the format YYYY-MM-DD HH:MM, got {value!r}")
+    return parsed.replace(second=0, microsecond=0)
+
+
+def parse_date(value):
+    """Return a date for a date, datetime or YYYY-MM-DD string"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    parsed = _parse(value, DATE_INPUT_FORMATS)
+    if parsed is None:
+        raise ValueError(f"Date must use the format YYYY-MM-DD, got {value!r}")
+    return parsed.date()
+
+
+def format_datetime(value):
+    """Return value in the stored "YYYY-MM-DD HH:MM" form"""
+    return parse_datetime(value).strftime(DATETIME_FORMAT)
+
+
+def format_date(value):
+    """Return value in the stored "YYYY-MM-DD" form"""
+    return parse_date(value).strftime(DATE_FORMAT)
@@ -1,24 +1,60 @@
 # lib/models/doctor.py
-from models.__init__ import CURSOR, CONN
+from collections import namedtuple
+
+from models import CURSOR, insert_many, iter_chunks, keyset_page, commit, cached, invalidate, QUERY_CACHE, operation, create_indexes_sql, Row, instance_from_row, update_fields, still_mapped
+from models.identity_map import IdentityMap
+from models.names import doctor_keys, normalize, prefix_range, query_tokens, score
+from models.aio import async_methods
 from models.medical_record import MedicalRecord
 from models.appointment import Appointment
 
+class DoctorRow(Row, namedtuple("DoctorRow", ["id", "name", "specialization"])):
+    """Read-only Doctor row returned by the finders with lightweight=True (see models.Row)"""
+    __slots__ = ()
+
+# Awaitable a<name> versions of the blocking methods (see models.aio)
+@async_methods(
+    "find_by_id", "find_by_name", "search_by_name", "page", "create", "create_many", "save",
+    "update", "delete", "iter_all",
+)
 class Doctor:
     
-    all = {}
+    all = IdentityMap()
+    
+    # Indexes backing the find_by_* lookups, created alongside the table (see create_indexes_sql)
+    INDEXES = create_indexes_sql["doctors"]
+    
+    # Persisted attributes, in the argument order of create()
+    FIELDS = ("name", "specialization")
+    
+    # Columns read by the lightweight finders, in DoctorRow order
+    COLUMNS = ", ".join(DoctorRow._fields)
+    
+    # Sort orders accepted by page(); each ends with id and is backed by an index
+    PAGE_ORDERS = {
+        "id": ("id",),
+        "name": ("name", "id"),
+    }
+    
+    # Rows read from each index by search_by_name before ranking
+    SEARCH_CANDIDATES = 200
     
     def __init__(self, name, specialization, id=None):
         self.id = id
         self.name = name
         self.specialization = specialization
-        self.appointments = []
-        self.medical_records = []
+        self._appointments = None
+        self._medical_records = None
 
     def __repr__(self):
         return (
             f"Doctor(id={self.id}, name={self.name}, specialization={self.specialization}, appointments={self.appointments}, medical_records={self.medical_records})"
         )
     
+    def to_dict(self):
+        """Return the persisted attributes (and id) as a JSON-serializable dict"""
+        return {"id": self.id, **{field: getattr(self, field) for field in self.FIELDS}}
+    
     @property
     def name(self):
         return self._name
@@ -41,51 +77,92 @@ class Doctor:
         else:
             raise ValueError("Specialization must be a non-empty string")
             
+    @property
+    def appointments(self):
+        """Related Appointment instances, loaded from the database on first access"""
+        if self._appointments is None:
+            if self.id is None:
+                return []
+            appointments = Appointment.find_by_doctor_id(self.id)
+            # Not kept if the identity map already evicted part of it
+            self._appointments = still_mapped(Appointment, appointments)
+            return appointments
+        return self._appointments
+    
+    @appointments.setter
+    def appointments(self, appointments):
+        self._appointments = appointments
+    
+    @property
+    def medical_records(self):
+        """Related MedicalRecord instances, loaded from the database on first access"""
+        if self._medical_records is None:
+            if self.id is None:
+                return []
+            medical_records = MedicalRecord.find_by_doctor_id(self.id)
+            # Not kept if the identity map already evicted part of it
+            self._medical_records = still_mapped(MedicalRecord, medical_records)
+            return medical_records
+        return self._medical_records
+    
+    @medical_records.setter
+    def medical_records(self, medical_records):
+        self._medical_records = medical_records
+    
     @classmethod
     def create_table(cls):
-        """Create a new table to persist the attributes of Doctor instances"""
+        """Create a new table (and its lookup indexes) to persist the attributes of Doctor instances"""
         sql = """
             CREATE TABLE IF NOT EXISTS doctors (
                 id INTEGER PRIMARY KEY,
                 name TEXT NOT NULL,
-                specialization TEXT NOT NULL
+                specialization TEXT NOT NULL,
+                name_norm TEXT,
+                surname_norm TEXT,
+                surname_soundex TEXT
             )
         """
         CURSOR.execute(sql)
-        CONN.commit()
+        for sql in cls.INDEXES:
+            CURSOR.execute(sql)
+        commit()
     
     @classmethod
     def drop_table(cls):
         """Drop the table that persists the attributes of Doctor instances"""
         sql = "DROP TABLE IF EXISTS doctors"
         CURSOR.execute(sql)
-        CONN.commit()
+        commit()
     
     def save(self):
         """Persist the attributes of a Doctor instance to the database"""
         sql = """
-            INSERT INTO doctors (name, specialization)
-            VALUES (?, ?)
+            INSERT INTO doctors (name, specialization, name_norm, surname_norm, surname_soundex)
+            VALUES (?, ?, ?, ?, ?)
         """
-        CURSOR.execute(sql, (self.name, self.specialization))
-        CONN.commit()
+        CURSOR.execute(sql, (self.name, self.specialization, *doctor_keys(self.name)))
+        commit()
         self.id = CURSOR.lastrowid
+        invalidate("doctors", id=self.id)
     
     def update(self):
         """Update the table row corresponding to the current Doctor instance"""
         sql = """
             UPDATE doctors
-            SET name = ?, specialization = ?
+            SET name = ?, specialization = ?, name_norm = ?, surname_norm = ?, surname_soundex = ?
             WHERE id = ?
         """
-        CURSOR.execute(sql, (self.name, self.specialization, self.id))
-        CONN.commit()
+        CURSOR.execute(sql, (self.name, self.specialization, *doctor_keys(self.name), self.id))
+        commit()
+        invalidate("doctors", id=self.id)
     
     def delete(self):
         """Delete the table row corresponding to the current Doctor instance"""
         sql = "DELETE FROM doctors WHERE id = ?"
         CURSOR.execute(sql, (self.id,))
-        CONN.commit()
+        commit()
+        type(self).all.pop(self.id, None)
+        invalidate("doctors", id=self.id)
     
     @classmethod
     def create(cls, name, specialization):
@@ -94,44 +171,180 @@ class Doctor:
         doctor.save()
         return doctor
     
+    @classmethod
+    def create_many(cls, rows):
+        """Create and persist Doctor instances from an iterable of tuples or dicts.
+
+        Rows use the argument order (or keyword names) of create(). All rows are
+        validated through the property setters before anything is written, then
+        inserted in a single transaction. Returns the new ids; a row that
+        gives an id keeps it.
+        """
+        doctors = [cls(**row) if isinstance(row, dict) else cls(*row) for row in rows]
+        sql = """
+            INSERT INTO doctors (id, name, specialization, name_norm, surname_norm, surname_soundex)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """
+        ids = insert_many(sql, ((doctor.id, doctor.name, doctor.specialization, *doctor_keys(doctor.name)) for doctor in doctors))
+        for doctor, id in zip(doctors, ids):
+            doctor.id = id
+        invalidate("doctors", id=ids)
+        return ids
+    
+    def _load(self, row):
+        """Assign the values of a table row without validation; they were validated when written"""
+        self.id, self._name, self._specialization = row[:3]
+        # Related rows are reloaded lazily on next access
+        self._appointments = None
+        self._medical_records = None
+    
     @classmethod
     def instance_from_db(cls, row):
-        """Return a Doctor object having the attribute values from the table row."""
-        
-        doctor = cls.all.get(row[0])
-        if doctor:
-            doctor.name = row[1]
-            doctor.specialization = row[2]
-        else:
-            doctor = cls(row[1], row[2], id=row[0])
-            cls.all[row[0]] = doctor
+        """Return a Doctor object having the attribute values from the table row (see models.instance_from_row)"""
+        return instance_from_row(cls, row)
     
-        doctor.appointments = Appointment.find_by_doctor_id(doctor.id)
-        doctor.medical_records = MedicalRecord.find_by_doctor_id(doctor.id)
-        
-        return doctor
+    @classmethod
+    def load_related(cls, doctors, doctor_ids=None):
+        """Attach appointments and medical records to the given doctors with one batched query per table.
+
+        Pass doctor_ids=None when doctors covers the whole table so each
+        related table is read once instead of filtered by id. A doctor's
+        relation that its identity map could not hold in full is left to
+        load on first access instead.
+        """
+        appointments = Appointment.find_by_doctor_ids(doctor_ids)
+        medical_records = MedicalRecord.find_by_doctor_ids(doctor_ids)
+        for doctor in doctors:
+            doctor.appointments = still_mapped(Appointment, appointments.get(doctor.id, []))
+            doctor.medical_records = still_mapped(MedicalRecord, medical_records.get(doctor.id, []))
+        return doctors
     
     @classmethod
-    def get_all(cls):
-        """Return a list of all Doctor instances persisted to the database"""
+    def get_all(cls, prefetch=False, lightweight=False):
+        """Return a list of all Doctor instances persisted to the database.
+
+        With prefetch=True related appointments and medical records are
+        loaded up front in one query per table instead of on first access.
+        With lightweight=True DoctorRow tuples are returned instead.
+        """
+        if lightweight:
+            if prefetch:
+                raise ValueError("prefetch requires full Doctor instances")
+            CURSOR.execute(f"SELECT {cls.COLUMNS} FROM doctors")
+            return list(map(DoctorRow._make, CURSOR.fetchall()))
         sql = "SELECT * FROM doctors"
         CURSOR.execute(sql)
         rows = CURSOR.fetchall()
-        return [cls.instance_from_db(row) for row in rows]
+        doctors = [cls.instance_from_db(row) for row in rows]
+        return cls.load_related(doctors) if prefetch else doctors
+    
+    @classmethod
+    def iter_all(cls, arraysize=None, prefetch=False, lightweight=False):
+        """Yield every Doctor instance, fetching rows from the database in chunks of arraysize.
+
+        With prefetch=True the relations of each chunk are loaded together
+        through load_related, one query per related table per chunk. With
+        lightweight=True DoctorRow tuples are yielded instead.
+        """
+        if lightweight:
+            if prefetch:
+                raise ValueError("prefetch requires full Doctor instances")
+            for rows in iter_chunks(f"SELECT {cls.COLUMNS} FROM doctors", (), arraysize):
+                yield from map(DoctorRow._make, rows)
+            return
+        sql = "SELECT * FROM doctors"
+        for rows in iter_chunks(sql, (), arraysize):
+            doctors = [cls.instance_from_db(row) for row in rows]
+            if prefetch:
+                cls.load_related(doctors, [doctor.id for doctor in doctors])
+            yield from doctors
+    
+    @classmethod
+    def page(cls, after_id=None, limit=20, order_by="id", before_id=None, prefetch=False):
+        """Return up to limit Doctor instances following after_id (or preceding before_id) in order_by order"""
+        if order_by not in cls.PAGE_ORDERS:
+            raise ValueError(f"order_by must be one of {', '.join(cls.PAGE_ORDERS)}")
+        rows = keyset_page("doctors", cls.PAGE_ORDERS[order_by], after_id, before_id, limit)
+        doctors = [cls.instance_from_db(row) for row in rows]
+        if prefetch:
+            cls.load_related(doctors, [doctor.id for doctor in doctors])
+        return doctors
     
     @classmethod
-    def find_by_id(cls, id):
+    @cached("doctors", "id")
+    def find_by_id(cls, id, prefetch=False):
         """Return the Doctor instance with the given primary key"""
         sql = "SELECT * FROM doctors WHERE id = ?"
         row = CURSOR.execute(sql, (id,)).fetchone()
-        return cls.instance_from_db(row) if row else None
+        if not row:
+            return None
+        doctor = cls.instance_from_db(row)
+        if prefetch:
+            cls.load_related([doctor], [doctor.id])
+        return doctor
     
     @classmethod
-    def find_by_name(cls, name):
+    def find_by_name(cls, name, prefetch=False):
         """Return a list of Doctor instances with the given name"""
         sql = "SELECT * FROM doctors WHERE name = ?"
         row = CURSOR.execute(sql, (name,)).fetchone()
-        return cls.instance_from_db(row) if row else None
+        if not row:
+            return None
+        doctor = cls.instance_from_db(row)
+        if prefetch:
+            cls.load_related([doctor], [doctor.id])
+        return doctor
+    
+    @classmethod
+    def search_by_name(cls, query, limit=10, prefetch=False):
+        """Return up to limit Doctor instances whose name matches query, best match first.
+
+        The whole query is looked up as a prefix of the normalized name
+        ("greg ho" finds "Dr. Gregory House"), and each word as a prefix of
+        the surname and, from three letters on, by the surname's Soundex
+        code. Candidates are ranked by models.names.score, then alphabetically.
+        """
+        tokens = query_tokens(query)
+        if not tokens:
+            return []
+        branches, params = [], []
+        
+        def branch(where, *values):
+            branches.append(f"SELECT * FROM (SELECT * FROM doctors WHERE {where} LIMIT ?)")
+            params.extend((*values, cls.SEARCH_CANDIDATES))
+        
+        branch("name_norm >= ? AND name_norm < ?", *prefix_range(normalize(query)))
+        for token, token_soundex in tokens:
+            branch("surname_norm >= ? AND surname_norm < ?", *prefix_range(token))
+            if token_soundex:
+                branch("surname_soundex = ?", token_soundex)
+        rows = CURSOR.execute(" UNION ".join(branches), params).fetchall()
+        # Rows end with name_norm, surname_norm, surname_soundex
+        rows.sort(key=lambda row: (-score(tokens, [(row[3], row[5])]), row[3], row[0]))
+        doctors = [cls.instance_from_db(row) for row in rows[:limit]]
+        if prefetch:
+            cls.load_related(doctors, [doctor.id for doctor in doctors])
+        return doctors
+
+def _forget_related(attribute):
+    """Return a listener that unloads a relation of the identity-mapped Doctor it names"""
+    def forget(doctor_id):
+        doctor = Doctor.all.peek(doctor_id)
+        if doctor is not None:
+            setattr(doctor, attribute, None)
+    return forget
+
+_forget_medical_records = _forget_related("medical_records")
+_forget_appointments = _forget_related("appointments")
+
+# Reload a loaded relation after a write to any of its rows
+QUERY_CACHE.listen("medical_records", "doctor_id", _forget_medical_records)
+QUERY_CACHE.listen("appointments", "doctor_id", _forget_appointments)
+
+# ...and once its identity map evicts one of them, so the relation does not
+# keep evicted instances alive beyond the map's capacity
+MedicalRecord.all.listen(lambda record: _forget_medical_records(record.doctor_id))
+Appointment.all.listen(lambda appointment: _forget_appointments(appointment.doctor_id))
 
 def manage_doctors():
     """Function to manage doctor-related operations from the CLI"""
@@ -141,37 +354,61 @@ def manage_doctors():
         print("2. View Doctors")
         print("3. Update Doctor")
         print("4. Delete Doctor")
-        print("5. Back to Main Menu")
+        print("5. Browse Doctors")
+        print("6. Search Doctors by Name")
+        print("7. Back to Main Menu")
         choice = input("Enter your choice: ")
         
         if choice == '1':
-            name = input("Enter doctor's name: ")
-            specialization = input("Enter doctor's specialization: ")
-            Doctor.create(name, specialization)
-            print(f"Doctor {name} added successfully.")
+            with operation("cli doctors add"):
+                name = input("Enter doctor's name: ")
+                specialization = input("Enter doctor's specialization: ")
+                Doctor.create(name, specialization)
+                print(f"Doctor {name} added successfully.")
         elif choice == '2':
-            doctors = Doctor.get_all()
-            for doctor in doctors:
-                print(doctor)
+            with operation("cli doctors view"):
+                for doctor in Doctor.iter_all(prefetch=True):
+                    print(doctor)
         elif choice == '3':
-            id = int(input("Enter doctor's ID to update: "))
-            doctor = Doctor.find_by_id(id)
-            if doctor:
-                doctor.name = input(f"Enter new name (current: {doctor.name}): ") or doctor.name
-                doctor.specialization = input(f"Enter new specialization (current: {doctor.specialization}): ") or doctor.specialization
-                doctor.update()
-                print(f"Doctor {doctor.name} updated successfully.")
-            else:
-                print("Doctor not found.")
+            with operation("cli doctors update"):
+                try:
+                    id = int(input("Enter doctor's ID to update: "))
+                    doctor = Doctor.find_by_id(id)
+                    if doctor:
+                        # Applied to a copy by update_fields, so a rejected value
+                        # leaves the shared instance as it was
+                        changes = {
+                            "name": input(f"Enter new name (current: {doctor.name}): ") or doctor.name,
+                            "specialization": input(f"Enter new specialization (current: {doctor.specialization}): ") or doctor.specialization,
+                        }
+                        doctor = update_fields(doctor, changes)
+                        print(f"Doctor {doctor.name} updated successfully.")
+                    else:
+                        print("Doctor not found.")
+                except ValueError as e:
+                    print(f"Error: {e}")
         elif choice == '4':
-            id = int(input("Enter doctor's ID to delete: "))
-            doctor = Doctor.find_by_id(id)
-            if doctor:
-                doctor.delete()
-                print(f"Doctor {doctor.name} deleted successfully.")
-            else:
-                print("Doctor not found.")
+            with operation("cli doctors delete"):
+                id = int(input("Enter doctor's ID to delete: "))
+                doctor = Doctor.find_by_id(id)
+                if doctor:
+                    doctor.delete()
+                    print(f"Doctor {doctor.name} deleted successfully.")
+                else:
+                    print("Doctor not found.")
         elif choice == '5':
+            with operation("cli doctors browse"):
+                from helpers import browse_pages
+                order_by = "name" if input("Sort by name? (y/n): ").lower() == "y" else "id"
+                browse_pages(lambda **page: Doctor.page(order_by=order_by, prefetch=True, **page))
+        elif choice == '6':
+            with operation("cli doctors search"):
+                doctors = Doctor.search_by_name(input("Enter part of the doctor's name: "))
+                for doctor in doctors:
+                    print(f"{doctor.id}: {doctor.name} ({doctor.specialization})")
+                if not doctors:
+                    print("No matching doctors found.")
+        elif choice == '7':
             break
         else:
             print("Invalid choice. Please try again.")
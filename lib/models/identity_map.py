@@ -0,0 +1,147 @@
+# lib/models/identity_map.py
+import threading
+import weakref
+from collections import OrderedDict
+
+
+class IdentityMap:
+    """Bounded cache of hydrated model instances keyed by primary key.
+
+    Used as the class-level `all` attribute of every model. Lookups go
+    through get(), so the least recently used entry is evicted once the
+    map holds more than `capacity` instances. With weak=True the map holds
+    weak references instead and an instance leaves it when nothing else
+    refers to it; capacity is then not enforced. Hits, misses and evictions
+    are counted for diagnostics. A lock keeps the LRU order consistent when
+    several threads hydrate instances of the same model.
+
+    Instances evicted for capacity are passed to the listeners registered
+    with listen(), so objects holding on to them (such as a Patient's
+    loaded medical_records) can let go and capacity bounds memory.
+    """
+
+    DEFAULT_CAPACITY = 10000
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, weak=False):
+        self._instances = weakref.WeakValueDictionary() if weak else OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.weak = weak
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        mode = "weak" if self.weak else f"capacity={self.capacity}"
+        return f"IdentityMap(size={len(self)}, {mode})"
+
+    def __len__(self):
+        return len(self._instances)
+
+    def __contains__(self, id):
+        return id in self._instances
+
+    def __iter__(self):
+        return iter(list(self._instances))
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @capacity.setter
+    def capacity(self, capacity):
+        if isinstance(capacity, int) and capacity >= 0:
+            with self._lock:
+                self._capacity = capacity
+                evicted = self._evict()
+            self._notify(evicted)
+        else:
+            raise ValueError("Capacity must be a non-negative integer")
+
+    def configure(self, capacity=None, weak=None):
+        """Change the capacity and/or switch between LRU and weak references, keeping the current entries"""
+        if weak is not None and weak != self.weak:
+            with self._lock:
+                if weak:
+                    self._instances = weakref.WeakValueDictionary(self._instances)
+                else:
+                    self._instances = OrderedDict(self._instances.items())
+                self.weak = weak
+        # Also applies the capacity to entries kept from weak mode
+        self.capacity = self._capacity if capacity is None else capacity
+
+    def listen(self, listener):
+        """Call listener(instance) for every instance evicted to stay within capacity"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def get(self, id, default=None):
+        with self._lock:
+            instance = self._instances.get(id)
+            if instance is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            if not self.weak:
+                self._instances.move_to_end(id)
+            return instance
+
+    def peek(self, id, default=None):
+        """Return the instance for id without counting a lookup or refreshing its LRU position"""
+        return self._instances.get(id, default)
+
+    def __getitem__(self, id):
+        return self._instances[id]
+
+    def __setitem__(self, id, instance):
+        with self._lock:
+            self._instances[id] = instance
+            if not self.weak:
+                self._instances.move_to_end(id)
+            evicted = self._evict()
+        self._notify(evicted)
+
+    def __delitem__(self, id):
+        with self._lock:
+            del self._instances[id]
+
+    def pop(self, id, default=None):
+        with self._lock:
+            return self._instances.pop(id, default)
+
+    def values(self):
+        return list(self._instances.values())
+
+    def clear(self):
+        with self._lock:
+            self._instances.clear()
+
+    def stats(self):
+        """Return the size and hit/miss counters as a dict"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "capacity": None if self.weak else self.capacity,
+            "weak": self.weak,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _evict(self):
+        """Drop least recently used entries beyond capacity and return them; call with the lock held"""
+        evicted = []
+        if self.weak:
+            return evicted
+        while len(self._instances) > self._capacity:
+            evicted.append(self._instances.popitem(last=False)[1])
+            self.evictions += 1
+        return evicted
+
+    def _notify(self, evicted):
+        # Outside the lock: listeners may look instances up in this map
+        for instance in evicted:
+            for listener in self._listeners:
+                listener(instance)
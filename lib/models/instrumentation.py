@@ -0,0 +1,350 @@
+# lib/models/instrumentation.py
+"""Timing and counting of every SQL statement the models run.
+
+The connection pool opens InstrumentedConnection objects, whose cursors
+time each statement from execute() until its rows have been fetched
+(fetchone(), fetchall(), the last fetchmany(), iteration running out, the
+next execute() or close()) and count the rows returned. While QUERY_STATS
+is enabled each finished statement is added to:
+
+- a latency histogram and row count for its SQL, with whitespace and IN
+  (...) lists collapsed so every call of a finder shares one entry;
+- the innermost operation() block open on the thread, so a logical action
+  reports how many statements and rows it took;
+- the slow-query log, with its EXPLAIN QUERY PLAN, when it ran longer than
+  the slow_ms threshold.
+
+snapshot() returns all of it as a JSON-serializable dict. While disabled
+the cursors only pay one attribute check per call.
+"""
+import functools
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import ContextDecorator
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (in milliseconds) of the latency histogram buckets
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float("inf"))
+
+_IN_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_sql(sql):
+    """Return sql with runs of whitespace and IN (?, ?, ...) placeholder lists collapsed"""
+    return _IN_LIST.sub("?, ...", _WHITESPACE.sub(" ", sql).strip())
+
+
+def _bucket_label(bound):
+    return f"<={bound:g}ms" if bound != float("inf") else f">{BUCKETS_MS[-2]:g}ms"
+
+
+class QueryStats:
+    """Aggregated statement timings, per-operation counts and the slow-query log.
+
+    Disabled until configured; records from every thread under one lock.
+    """
+
+    DEFAULT_SLOW_MS = 100.0
+    DEFAULT_SLOW_LOG_SIZE = 100
+
+    def __init__(self, enabled=False, slow_ms=DEFAULT_SLOW_MS, slow_log_size=DEFAULT_SLOW_LOG_SIZE):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.slow_log_size = slow_log_size
+        self.reset()
+
+    def __repr__(self):
+        state = "enabled" if self.enabled else "disabled"
+        return f"QueryStats({state}, statements={len(self._statements)}, slow_ms={self.slow_ms})"
+
+    @property
+    def slow_ms(self):
+        return self._slow_ms
+
+    @slow_ms.setter
+    def slow_ms(self, slow_ms):
+        if isinstance(slow_ms, (int, float)) and slow_ms >= 0:
+            self._slow_ms = slow_ms
+        else:
+            raise ValueError("Slow query threshold must be a non-negative number of milliseconds")
+
+    def configure(self, enabled=None, slow_ms=None, slow_log_size=None):
+        """Change any of enabled, slow_ms and slow_log_size"""
+        if slow_ms is not None:
+            self.slow_ms = slow_ms
+        if slow_log_size is not None:
+            self.slow_log_size = slow_log_size
+            with self._lock:
+                self._slow = deque(self._slow, maxlen=slow_log_size)
+        if enabled is not None:
+            self.enabled = enabled
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self._lock:
+            self._statements = {}
+            self._operations = {}
+            self._slow = deque(maxlen=self.slow_log_size)
+            self.started = time.time()
+
+    def record(self, sql, params, seconds, rows, connection=None):
+        """Add one finished statement; connection is used to explain it if it was slow"""
+        key = normalize_sql(sql)
+        milliseconds = seconds * 1000
+        stack = getattr(self._local, "operations", None)
+        if stack:
+            current = stack[-1]
+            current[2] += 1
+            current[3] += rows
+            current[4] += seconds
+        slow = milliseconds >= self._slow_ms
+        plan = self._explain(connection, sql, params) if slow and connection is not None else None
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None:
+                entry = self._statements[key] = {"count": 0, "rows": 0, "total_ms": 0.0, "max_ms": 0.0, "buckets": [0] * len(BUCKETS_MS)}
+            entry["count"] += 1
+            entry["rows"] += rows
+            entry["total_ms"] += milliseconds
+            entry["max_ms"] = max(entry["max_ms"], milliseconds)
+            entry["buckets"][next(i for i, bound in enumerate(BUCKETS_MS) if milliseconds <= bound)] += 1
+            if slow:
+                self._slow.append({
+                    "at": datetime.now().isoformat(timespec="milliseconds"),
+                    "ms": round(milliseconds, 3),
+                    "rows": rows,
+                    "operation": stack[-1][0] if stack else None,
+                    "sql": key,
+                    "params": [repr(param) for param in params] if isinstance(params, (list, tuple)) else None,
+                    "plan": plan,
+                })
+        if slow:
+            logger.warning("Slow query (%.1f ms, %d rows): %s; plan: %s", milliseconds, rows, key, plan)
+
+    @staticmethod
+    def _explain(connection, sql, params):
+        # The base class's execute() uses a plain cursor, so explaining is not itself recorded
+        if params is None:
+            return None
+        try:
+            rows = sqlite3.Connection.execute(connection, f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        except sqlite3.Error:
+            return None
+        return [row[3] for row in rows]
+
+    def operation(self, name):
+        """Return a context manager (or decorator) counting the statements run inside it as operation name"""
+        return _Operation(self, name)
+
+    def _enter(self, name):
+        stack = getattr(self._local, "operations", None)
+        if stack is None:
+            stack = self._local.operations = []
+        # name, started, statements, rows, SQL seconds
+        stack.append([name, time.perf_counter(), 0, 0, 0.0])
+
+    def _exit(self):
+        name, started, statements, rows, seconds = self._local.operations.pop()
+        if not self.enabled:
+            return
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            entry = self._operations.get(name)
+            if entry is None:
+                entry = self._operations[name] = {"calls": 0, "statements": 0, "rows": 0, "sql_ms": 0.0, "wall_ms": 0.0, "max_statements": 0}
+            entry["calls"] += 1
+            entry["statements"] += statements
+            entry["rows"] += rows
+            entry["sql_ms"] += seconds * 1000
+            entry["wall_ms"] += elapsed * 1000
+            entry["max_statements"] = max(entry["max_statements"], statements)
+
+    def snapshot(self):
+        """Return the recorded statistics as a JSON-serializable dict"""
+        with self._lock:
+            statements = {key: dict(entry, buckets=list(entry["buckets"])) for key, entry in self._statements.items()}
+            operations = {name: dict(entry) for name, entry in self._operations.items()}
+            slow = list(self._slow)
+        for entry in statements.values():
+            buckets = entry.pop("buckets")
+            entry["mean_ms"] = entry["total_ms"] / entry["count"]
+            entry["p50_ms"] = _percentile(buckets, entry["count"], 0.50, entry["max_ms"])
+            entry["p95_ms"] = _percentile(buckets, entry["count"], 0.95, entry["max_ms"])
+            entry["p99_ms"] = _percentile(buckets, entry["count"], 0.99, entry["max_ms"])
+            entry["histogram"] = {_bucket_label(bound): count for bound, count in zip(BUCKETS_MS, buckets) if count}
+            _round(entry)
+        for entry in operations.values():
+            entry["statements_per_call"] = entry["statements"] / entry["calls"]
+            _round(entry)
+        return {
+            "enabled": self.enabled,
+            "since": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "slow_ms": self.slow_ms,
+            "totals": {
+                "statements": sum(entry["count"] for entry in statements.values()),
+                "rows": sum(entry["rows"] for entry in statements.values()),
+                "sql_ms": round(sum(entry["total_ms"] for entry in statements.values()), 3),
+            },
+            "statements": dict(sorted(statements.items(), key=lambda item: -item[1]["total_ms"])),
+            "operations": operations,
+            "slow_queries": slow,
+        }
+
+    def export(self, path):
+        """Write snapshot() to path as JSON"""
+        with open(path, "w") as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+
+def _percentile(buckets, count, fraction, maximum):
+    """Estimate a latency percentile as the upper bound of the bucket holding it"""
+    rank = fraction * count
+    seen = 0
+    for bound, bucket in zip(BUCKETS_MS, buckets):
+        seen += bucket
+        if seen >= rank:
+            return min(bound, maximum)
+    return maximum
+
+
+def _round(entry):
+    for key, value in entry.items():
+        if isinstance(value, float):
+            entry[key] = round(value, 3)
+
+
+class _Operation(ContextDecorator):
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.stats._enter(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.stats._exit()
+        return False
+
+
+QUERY_STATS = QueryStats()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement's duration and row count to QUERY_STATS"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # [sql, params, seconds so far, rows so far] of the statement being read
+        self._pending = None
+
+    def execute(self, sql, parameters=()):
+        if self._pending is not None:
+            self._finish()
+        if not QUERY_STATS.enabled:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._pending = [sql, parameters, time.perf_counter() - started, 0]
+            if self.description is None:
+                self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        if self._pending is not None:
+            self._finish()
+        if not QUERY_STATS.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            # Parameter sets may be a spent generator, so none are kept for EXPLAIN
+            self._pending = [sql, None, time.perf_counter() - started, 0]
+            self._finish()
+        return self
+
+    def fetchone(self):
+        if self._pending is None:
+            return super().fetchone()
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._pending[2] += time.perf_counter() - started
+        self._pending[3] += row is not None
+        # find_by_* read a single row, so the statement counts as done here
+        self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self.arraysize
+        if self._pending is None:
+            return super().fetchmany(size)
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._pending[2] += time.perf_counter() - started
+        self._pending[3] += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        if self._pending is None:
+            return super().fetchall()
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._pending[2] += time.perf_counter() - started
+        self._pending[3] += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        if self._pending is None:
+            return super().__next__()
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._pending[2] += time.perf_counter() - started
+            self._finish()
+            raise
+        self._pending[2] += time.perf_counter() - started
+        self._pending[3] += 1
+        return row
+
+    def close(self):
+        if self._pending is not None:
+            self._finish()
+        super().close()
+
+    def _finish(self):
+        sql, params, seconds, rows = self._pending
+        self._pending = None
+        QUERY_STATS.record(sql, params, seconds, rows, self.connection)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors, including those behind execute(), are InstrumentedCursors"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -1,9 +1,52 @@
 # lib/models/medical_record.py
-from models.__init__ import CONN, CURSOR
+from collections import namedtuple
 
+from models import CURSOR, iter_chunks, insert_many, keyset_page, commit, cached, invalidate, create_search_index, fts_query, update_fields, operation, create_indexes_sql, find_grouped, Row, instance_from_row
+from models.dates import format_date
+from models.identity_map import IdentityMap
+from models.aio import async_methods
+
+# One result of MedicalRecord.search(): the record plus its diagnosis and
+# treatment with the matched terms wrapped in HIGHLIGHT markers
+SearchResult = namedtuple("SearchResult", ["record", "diagnosis", "treatment"])
+
+class MedicalRecordRow(Row, namedtuple("MedicalRecordRow", ["id", "patient_id", "doctor_id", "record_date", "diagnosis", "treatment"])):
+    """Read-only MedicalRecord row returned by the finders with lightweight=True (see models.Row)"""
+    __slots__ = ()
+
+# Awaitable a<name> versions of the blocking methods (see models.aio)
+@async_methods(
+    "find_by_id", "find_by_patient_id", "find_by_doctor_id", "find_between", "search", "page",
+    "create", "create_many", "save", "update", "delete", "iter_all", "iter_by_patient_id",
+    "iter_by_doctor_id",
+)
 class MedicalRecord:
     
-    all = {}
+    all = IdentityMap()
+    
+    # Indexes backing the find_by_* lookups, created alongside the table (see create_indexes_sql)
+    INDEXES = create_indexes_sql["medical_records"]
+    
+    # Persisted attributes, in the argument order of create()
+    FIELDS = ("patient_id", "doctor_id", "record_date", "diagnosis", "treatment")
+    
+    # Columns read by the finders, in MedicalRecordRow order
+    COLUMNS = ", ".join(MedicalRecordRow._fields)
+    
+    # Sort orders accepted by page(); each ends with id and is backed by an index
+    PAGE_ORDERS = {
+        "id": ("id",),
+        "record_date": ("record_date", "id"),
+    }
+    
+    # Markers placed around matched terms by search()
+    HIGHLIGHT = ("[", "]")
+    
+    # bm25 ordering for search(); diagnosis matches weigh twice as much as treatment matches
+    RANK = "bm25(medical_records_fts, 2.0, 1.0)"
+    
+    # Matches ranked by search(), newest first, when a query matches more rows
+    RANK_WINDOW = 10000
     
     def __init__(self, patient_id, doctor_id, record_date, diagnosis, treatment, id=None):
         self.id = id
@@ -18,6 +61,10 @@ class MedicalRecord:
             f"MedicalRecord(id={self.id}, patient_id={self.patient_id}, doctor_id={self.doctor_id}, record_date={self.record_date}, diagnosis={self.diagnosis}, treatment={self.treatment})"
         )
     
+    def to_dict(self):
+        """Return the persisted attributes (and id) as a JSON-serializable dict"""
+        return {"id": self.id, **{field: getattr(self, field) for field in self.FIELDS}}
+    
     @property
     def diagnosis(self):
         return self._diagnosis
@@ -46,7 +93,8 @@ class MedicalRecord:
     
     @record_date.setter
     def record_date(self, record_date):
-        self._record_date = record_date  # You might want to add more validation here
+        # Stored as "YYYY-MM-DD" so text order matches date order in the indexes
+        self._record_date = format_date(record_date)
     
     @property
     def patient_id(self):
@@ -72,7 +120,7 @@ class MedicalRecord:
     
     @classmethod
     def create_table(cls):
-        """Create a new table to persist the attributes of MedicalRecord instances"""
+        """Create a new table (and its lookup indexes) to persist the attributes of MedicalRecord instances"""
         sql = """
             CREATE TABLE IF NOT EXISTS medical_records (
                 id INTEGER PRIMARY KEY,
@@ -86,14 +134,18 @@ class MedicalRecord:
             )
         """
         CURSOR.execute(sql)
-        CONN.commit()
+        for sql in cls.INDEXES:
+            CURSOR.execute(sql)
+        create_search_index()
+        commit()
     
     @classmethod
     def drop_table(cls):
         """Drop the table that persists the attributes of MedicalRecord instances"""
         sql = "DROP TABLE IF EXISTS medical_records"
         CURSOR.execute(sql)
-        CONN.commit()
+        CURSOR.execute("DROP TABLE IF EXISTS medical_records_fts")
+        commit()
     
     def save(self):
         """Persist the attributes of a MedicalRecord instance to the database"""
@@ -102,8 +154,9 @@ class MedicalRecord:
             VALUES (?, ?, ?, ?, ?)
         """
         CURSOR.execute(sql, (self.patient_id, self.doctor_id, self.record_date, self.diagnosis, self.treatment))
-        CONN.commit()
+        commit()
         self.id = CURSOR.lastrowid
+        invalidate("medical_records", id=self.id, patient_id=self.patient_id, doctor_id=self.doctor_id)
     
     def update(self):
         """Update the table row corresponding to the current MedicalRecord instance"""
@@ -112,14 +165,23 @@ class MedicalRecord:
             SET patient_id = ?, doctor_id = ?, record_date = ?, diagnosis = ?, treatment = ?
             WHERE id = ?
         """
+        # The old owners' cached lists change too if the record was reassigned
+        old = CURSOR.execute("SELECT patient_id, doctor_id FROM medical_records WHERE id = ?", (self.id,)).fetchone()
         CURSOR.execute(sql, (self.patient_id, self.doctor_id, self.record_date, self.diagnosis, self.treatment, self.id))
-        CONN.commit()
+        commit()
+        patient_ids, doctor_ids = {self.patient_id}, {self.doctor_id}
+        if old:
+            patient_ids.add(old[0])
+            doctor_ids.add(old[1])
+        invalidate("medical_records", id=self.id, patient_id=patient_ids, doctor_id=doctor_ids)
     
     def delete(self):
         """Delete the table row corresponding to the current MedicalRecord instance"""
         sql = "DELETE FROM medical_records WHERE id = ?"
         CURSOR.execute(sql, (self.id,))
-        CONN.commit()
+        commit()
+        type(self).all.pop(self.id, None)
+        invalidate("medical_records", id=self.id, patient_id=self.patient_id, doctor_id=self.doctor_id)
     
     @classmethod
     def create(cls, patient_id, doctor_id, record_date, diagnosis, treatment):
@@ -128,35 +190,58 @@ class MedicalRecord:
         medical_record.save()
         return medical_record
     
+    @classmethod
+    def create_many(cls, rows):
+        """Create and persist MedicalRecord instances from an iterable of tuples or dicts.
+
+        Rows use the argument order (or keyword names) of create(). All rows are
+        validated through the property setters before anything is written, then
+        inserted in a single transaction. Returns the new ids; a row that
+        gives an id keeps it.
+        """
+        medical_records = [cls(**row) if isinstance(row, dict) else cls(*row) for row in rows]
+        sql = """
+            INSERT INTO medical_records (id, patient_id, doctor_id, record_date, diagnosis, treatment)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """
+        ids = insert_many(sql, ((medical_record.id, medical_record.patient_id, medical_record.doctor_id, medical_record.record_date, medical_record.diagnosis, medical_record.treatment) for medical_record in medical_records))
+        for medical_record, id in zip(medical_records, ids):
+            medical_record.id = id
+        invalidate(
+            "medical_records",
+            id=ids,
+            patient_id={medical_record.patient_id for medical_record in medical_records},
+            doctor_id={medical_record.doctor_id for medical_record in medical_records},
+        )
+        return ids
+    
+    def _load(self, row):
+        """Assign the values of a table row without validation; they were validated when written"""
+        self.id, self._patient_id, self._doctor_id, self._record_date, self._diagnosis, self._treatment = row[:6]
+    
     @classmethod
     def instance_from_db(cls, row):
-        """Return a MedicalRecord object having the attribute values from the table row."""
-        
-        
-        medical_record = cls.all.get(row[0])
-        if medical_record:
-            
-            medical_record.patient_id = row[1]
-            medical_record.doctor_id = row[2]
-            medical_record.record_date = row[3]
-            medical_record.diagnosis = row[4]
-            medical_record.treatment = row[5]
-        else:
-            
-            medical_record = cls(row[1], row[2], row[3], row[4], row[5], id=row[0])
-            cls.all[row[0]] = medical_record
-        
-        return medical_record
+        """Return a MedicalRecord object having the attribute values from the table row (see models.instance_from_row)"""
+        return instance_from_row(cls, row)
     
     @classmethod
-    def get_all(cls):
-        """Return a list of all MedicalRecord instances persisted to the database"""
-        sql = "SELECT * FROM medical_records"
+    def get_all(cls, lightweight=False):
+        """Return a list of all MedicalRecord instances persisted to the database (MedicalRecordRow tuples with lightweight=True)"""
+        sql = f"SELECT {cls.COLUMNS} FROM medical_records"
         CURSOR.execute(sql)
         rows = CURSOR.fetchall()
+        return list(map(MedicalRecordRow._make if lightweight else cls.instance_from_db, rows))
+    
+    @classmethod
+    def page(cls, after_id=None, limit=20, order_by="id", before_id=None):
+        """Return up to limit MedicalRecord instances following after_id (or preceding before_id) in order_by order"""
+        if order_by not in cls.PAGE_ORDERS:
+            raise ValueError(f"order_by must be one of {', '.join(cls.PAGE_ORDERS)}")
+        rows = keyset_page("medical_records", cls.PAGE_ORDERS[order_by], after_id, before_id, limit)
         return [cls.instance_from_db(row) for row in rows]
     
     @classmethod
+    @cached("medical_records", "id")
     def find_by_id(cls, id):
         """Return the MedicalRecord instance with the given primary key"""
         sql = "SELECT * FROM medical_records WHERE id = ?"
@@ -164,20 +249,115 @@ class MedicalRecord:
         return cls.instance_from_db(row) if row else None
     
     @classmethod
-    def find_by_patient_id(cls, patient_id):
-        """Return a list of MedicalRecord instances for the given patient_id"""
-        sql = "SELECT * FROM medical_records WHERE patient_id = ?"
+    def find_between(cls, start, end, doctor_id=None, lightweight=False):
+        """Return the MedicalRecord instances dated from start up to (not including) end, oldest first.
+
+        start and end are dates (or YYYY-MM-DD strings); the query is a range
+        scan on the record_date index, or on (doctor_id, record_date) when
+        doctor_id is given. With lightweight=True MedicalRecordRow tuples are
+        returned instead.
+        """
+        params = [format_date(start), format_date(end)]
+        where = "record_date >= ? AND record_date < ?"
+        if doctor_id is not None:
+            where = "doctor_id = ? AND " + where
+            params.insert(0, doctor_id)
+        sql = f"SELECT {cls.COLUMNS} FROM medical_records WHERE {where} ORDER BY record_date, id"
+        CURSOR.execute(sql, params)
+        rows = CURSOR.fetchall()
+        return list(map(MedicalRecordRow._make if lightweight else cls.instance_from_db, rows))
+    
+    @classmethod
+    def search(cls, query, limit=20, patient_id=None):
+        """Return up to limit SearchResults whose diagnosis or treatment contains every word of query.
+
+        Results come from the full-text index, best match first. Words match
+        their stems ("fractures" finds "fractured"), and a trailing * makes a
+        word a prefix ("bronch*"). Scoring every match of a very common word
+        would dominate the query, so only the newest RANK_WINDOW matches are
+        ranked; with patient_id, all of that patient's matches are ranked.
+        """
+        match = fts_query(query)
+        if match is None:
+            return []
+        start, end = cls.HIGHLIGHT
+        if patient_id is None:
+            # Rank only matches at or after the RANK_WINDOW-th newest one
+            scope = """medical_records_fts.rowid >= coalesce((
+                SELECT rowid FROM medical_records_fts WHERE medical_records_fts MATCH ?
+                ORDER BY rowid DESC LIMIT 1 OFFSET ?
+            ), 0)"""
+            scope_params = (match, cls.RANK_WINDOW - 1)
+        else:
+            # The unary + keeps FTS5 from looking up each of the patient's
+            # rows separately; the match list is scanned once instead.
+            scope = "+medical_records_fts.rowid IN (SELECT id FROM medical_records WHERE patient_id = ?)"
+            scope_params = (patient_id,)
+        sql = f"""
+            SELECT medical_records.*,
+                highlight(medical_records_fts, 0, ?, ?), highlight(medical_records_fts, 1, ?, ?)
+            FROM medical_records_fts
+            JOIN medical_records ON medical_records.id = medical_records_fts.rowid
+            WHERE medical_records_fts MATCH ? AND {scope}
+            ORDER BY {cls.RANK}
+            LIMIT ?
+        """
+        params = (start, end, start, end, match, *scope_params, limit)
+        CURSOR.execute(sql, params)
+        rows = CURSOR.fetchall()
+        return [SearchResult(cls.instance_from_db(row[:6]), row[6], row[7]) for row in rows]
+    
+    @classmethod
+    @cached("medical_records", "patient_id")
+    def find_by_patient_id(cls, patient_id, lightweight=False):
+        """Return a list of MedicalRecord instances for the given patient_id (MedicalRecordRow tuples with lightweight=True)"""
+        sql = f"SELECT {cls.COLUMNS} FROM medical_records WHERE patient_id = ?"
         CURSOR.execute(sql, (patient_id,))
         rows = CURSOR.fetchall()
-        return [cls.instance_from_db(row) for row in rows]
+        return list(map(MedicalRecordRow._make if lightweight else cls.instance_from_db, rows))
 
     @classmethod
-    def find_by_doctor_id(cls, doctor_id):
-        """Return a list of MedicalRecord instances for the given doctor_id"""
-        sql = "SELECT * FROM medical_records WHERE doctor_id = ?"
+    @cached("medical_records", "doctor_id")
+    def find_by_doctor_id(cls, doctor_id, lightweight=False):
+        """Return a list of MedicalRecord instances for the given doctor_id (MedicalRecordRow tuples with lightweight=True)"""
+        sql = f"SELECT {cls.COLUMNS} FROM medical_records WHERE doctor_id = ?"
         CURSOR.execute(sql, (doctor_id,))
         rows = CURSOR.fetchall()
-        return [cls.instance_from_db(row) for row in rows]
+        return list(map(MedicalRecordRow._make if lightweight else cls.instance_from_db, rows))
+
+    @classmethod
+    def iter_all(cls, arraysize=None, lightweight=False):
+        """Yield every MedicalRecord instance (or MedicalRecordRow tuple), fetching rows from the database in chunks of arraysize"""
+        sql = f"SELECT {cls.COLUMNS} FROM medical_records"
+        hydrate = MedicalRecordRow._make if lightweight else cls.instance_from_db
+        for rows in iter_chunks(sql, (), arraysize):
+            yield from map(hydrate, rows)
+
+    @classmethod
+    def iter_by_patient_id(cls, patient_id, arraysize=None, lightweight=False):
+        """Yield the MedicalRecord instances (or MedicalRecordRow tuples) for the given patient_id, fetched in chunks of arraysize"""
+        sql = f"SELECT {cls.COLUMNS} FROM medical_records WHERE patient_id = ?"
+        hydrate = MedicalRecordRow._make if lightweight else cls.instance_from_db
+        for rows in iter_chunks(sql, (patient_id,), arraysize):
+            yield from map(hydrate, rows)
+
+    @classmethod
+    def iter_by_doctor_id(cls, doctor_id, arraysize=None, lightweight=False):
+        """Yield the MedicalRecord instances (or MedicalRecordRow tuples) for the given doctor_id, fetched in chunks of arraysize"""
+        sql = f"SELECT {cls.COLUMNS} FROM medical_records WHERE doctor_id = ?"
+        hydrate = MedicalRecordRow._make if lightweight else cls.instance_from_db
+        for rows in iter_chunks(sql, (doctor_id,), arraysize):
+            yield from map(hydrate, rows)
+
+    @classmethod
+    def find_by_patient_ids(cls, patient_ids=None):
+        """Return a dict mapping each patient_id to its list of MedicalRecord instances (every row when patient_ids is None)"""
+        return find_grouped("medical_records", "patient_id", patient_ids, cls.instance_from_db)
+
+    @classmethod
+    def find_by_doctor_ids(cls, doctor_ids=None):
+        """Return a dict mapping each doctor_id to its list of MedicalRecord instances (every row when doctor_ids is None)"""
+        return find_grouped("medical_records", "doctor_id", doctor_ids, cls.instance_from_db)
 
 def manage_medical_records():
     """Function to manage medical record-related operations from the CLI"""
@@ -187,45 +367,75 @@ def manage_medical_records():
         print("2. View Medical Records")
         print("3. Update Medical Record")
         print("4. Delete Medical Record")
-        print("5. Back to Main Menu")
+        print("5. Browse Medical Records")
+        print("6. Search Medical Records")
+        print("7. Back to Main Menu")
         choice = input("Enter your choice: ")
         
         if choice == '1':
-            from models.patient import Patient
-            from models.doctor import Doctor  
-            patient_id = int(input("Enter patient's ID: "))
-            doctor_id = int(input("Enter doctor's ID: "))
-            record_date = input("Enter record date (YYYY-MM-DD): ")
-            diagnosis = input("Enter diagnosis: ")
-            treatment = input("Enter treatment: ")
-            MedicalRecord.create(patient_id, doctor_id, record_date, diagnosis, treatment)
-            print("Medical record added successfully.")
+            with operation("cli records add"):
+                try:
+                    patient_id = int(input("Enter patient's ID: "))
+                    doctor_id = int(input("Enter doctor's ID: "))
+                    record_date = input("Enter record date (YYYY-MM-DD): ")
+                    diagnosis = input("Enter diagnosis: ")
+                    treatment = input("Enter treatment: ")
+                    MedicalRecord.create(patient_id, doctor_id, record_date, diagnosis, treatment)
+                    print("Medical record added successfully.")
+                except ValueError as e:
+                    print(f"Error: {e}")
         elif choice == '2':
-            records = MedicalRecord.get_all()
-            for record in records:
-                print(record)
+            with operation("cli records view"):
+                for record in MedicalRecord.iter_all():
+                    print(record)
         elif choice == '3':
-            id = int(input("Enter medical record ID to update: "))
-            record = MedicalRecord.find_by_id(id)
-            if record:
-                record.patient_id = int(input(f"Enter new patient ID (current: {record.patient_id}): ") or record.patient_id)
-                record.doctor_id = int(input(f"Enter new doctor ID (current: {record.doctor_id}): ") or record.doctor_id)
-                record.record_date = input(f"Enter new record date (current: {record.record_date}): ") or record.record_date
-                record.diagnosis = input(f"Enter new diagnosis (current: {record.diagnosis}): ") or record.diagnosis
-                record.treatment = input(f"Enter new treatment (current: {record.treatment}): ") or record.treatment
-                record.update()
-                print("Medical record updated successfully.")
-            else:
-                print("Medical record not found.")
+            with operation("cli records update"):
+                try:
+                    id = int(input("Enter medical record ID to update: "))
+                    record = MedicalRecord.find_by_id(id)
+                    if record:
+                        # Every answer is collected first and validated by
+                        # update_fields on a copy, so a bad one leaves the record as it was
+                        changes = {
+                            "patient_id": int(input(f"Enter new patient ID (current: {record.patient_id}): ") or record.patient_id),
+                            "doctor_id": int(input(f"Enter new doctor ID (current: {record.doctor_id}): ") or record.doctor_id),
+                            "record_date": input(f"Enter new record date (current: {record.record_date}): ") or record.record_date,
+                            "diagnosis": input(f"Enter new diagnosis (current: {record.diagnosis}): ") or record.diagnosis,
+                            "treatment": input(f"Enter new treatment (current: {record.treatment}): ") or record.treatment,
+                        }
+                        update_fields(record, changes)
+                        print("Medical record updated successfully.")
+                    else:
+                        print("Medical record not found.")
+                except ValueError as e:
+                    print(f"Error: {e}")
         elif choice == '4':
-            id = int(input("Enter medical record ID to delete: "))
-            record = MedicalRecord.find_by_id(id)
-            if record:
-                record.delete()
-                print("Medical record deleted successfully.")
-            else:
-                print("Medical record not found.")
+            with operation("cli records delete"):
+                id = int(input("Enter medical record ID to delete: "))
+                record = MedicalRecord.find_by_id(id)
+                if record:
+                    record.delete()
+                    print("Medical record deleted successfully.")
+                else:
+                    print("Medical record not found.")
         elif choice == '5':
+            with operation("cli records browse"):
+                from helpers import browse_pages
+                order_by = "record_date" if input("Sort by date? (y/n): ").lower() == "y" else "id"
+                browse_pages(lambda **page: MedicalRecord.page(order_by=order_by, **page))
+        elif choice == '6':
+            with operation("cli records search"):
+                query = input("Search diagnoses and treatments: ")
+                patient_id = input("Limit to patient ID (optional): ")
+                results = MedicalRecord.search(query, patient_id=int(patient_id) if patient_id else None)
+                for result in results:
+                    record = result.record
+                    print(f"#{record.id} {record.record_date} patient {record.patient_id}, doctor {record.doctor_id}")
+                    print(f"    Diagnosis: {result.diagnosis}")
+                    print(f"    Treatment: {result.treatment}")
+                if not results:
+                    print("No matching medical records.")
+        elif choice == '7':
             break
         else:
             print("Invalid choice. Please try again.")
@@ -0,0 +1,116 @@
+# lib/models/names.py
+"""Normalized and phonetic name keys for the search_by_name finders.
+
+Names are stored alongside two derived forms: a normalized spelling
+(case-folded, accents and punctuation removed) that is matched by prefix
+with an index range scan, and a Soundex code that is matched for equality
+so misspellings such as "Smyth" still find "Smith".
+"""
+import unicodedata
+
+# Words dropped from names and queries before matching
+HONORIFICS = {"dr", "doctor", "prof", "professor", "mr", "mrs", "ms", "miss", "mx"}
+
+# Tokens shorter than this are only matched as prefixes; their Soundex
+# codes would match too many names to be useful.
+MIN_FUZZY_LENGTH = 3
+
+# Scores for how well one query token matches one name part
+EXACT, PREFIX, SOUNDS_LIKE = 4, 3, 1
+
+_SOUNDEX_CODES = {
+    letter: digit
+    for digit, letters in (("1", "bfpv"), ("2", "cgjkqsxz"), ("3", "dt"), ("4", "l"), ("5", "mn"), ("6", "r"))
+    for letter in letters
+}
+
+# Latin letters with no decomposition into a base letter plus accent
+_LATIN_FOLDS = str.maketrans({"ł": "l", "ø": "o", "đ": "d", "ħ": "h", "ı": "i", "æ": "ae", "œ": "oe", "þ": "th"})
+
+# Sorts after every other character, so [prefix, prefix + _MAX) covers all
+# strings starting with prefix
+_MAX = "\U0010ffff"
+
+
+def normalize(name):
+    """Return name case-folded, without accents or punctuation, words separated by single spaces"""
+    decomposed = unicodedata.normalize("NFKD", name)
+    letters = "".join(
+        char if char.isalnum() else " "
+        for char in decomposed.casefold().translate(_LATIN_FOLDS)
+        if not unicodedata.combining(char) and char not in "'’"
+    )
+    return " ".join(word for word in letters.split() if word not in HONORIFICS)
+
+
+def soundex(name):
+    """Return the American Soundex code of a name ("" if it has no Latin letters)"""
+    letters = [char for char in normalize(name) if "a" <= char <= "z"]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0])
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter)
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # Vowels separate repeated codes; h and w do not
+        if letter not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def name_keys(name):
+    """Return the (normalized, soundex) pair stored for a name"""
+    return normalize(name), soundex(name)
+
+
+def prefix_range(prefix):
+    """Return the (low, high) bounds of an index range scan for strings starting with prefix"""
+    return prefix, prefix + _MAX
+
+
+def query_tokens(query, max_tokens=3):
+    """Return (token, soundex or None) for the first max_tokens words of a search query"""
+    return [
+        (token, soundex(token) if len(token) >= MIN_FUZZY_LENGTH else None)
+        for token in normalize(query).split()[:max_tokens]
+    ]
+
+
+def score(tokens, keys):
+    """Score how well query tokens match a row's (normalized, soundex) name parts.
+
+    Each token adds the best of EXACT (equals a word of a part), PREFIX
+    (starts one) or SOUNDS_LIKE (same Soundex code as a part); a token
+    matching nothing adds 0.
+    """
+    total = 0
+    for token, token_soundex in tokens:
+        best = 0
+        for normalized, code in keys:
+            words = normalized.split()
+            if token == normalized or token in words:
+                best = EXACT
+                break
+            if normalized.startswith(token) or any(word.startswith(token) for word in words):
+                best = max(best, PREFIX)
+            elif token_soundex and token_soundex == code:
+                best = max(best, SOUNDS_LIKE)
+        total += best
+    return total
+
+
+def patient_keys(first_name, last_name):
+    """Return (first_name_norm, last_name_norm, first_name_soundex, last_name_soundex)"""
+    first, last = name_keys(first_name), name_keys(last_name)
+    return first[0], last[0], first[1], last[1]
+
+
+def doctor_keys(name):
+    """Return (name_norm, surname_norm, surname_soundex); the surname is the last word of the name"""
+    normalized = normalize(name)
+    surname = normalized.rsplit(" ", 1)[-1]
+    return normalized, surname, soundex(surname)
@@ -1,11 +1,44 @@
 # lib/models/patient.py
-from models.__init__ import CONN, CURSOR
+from collections import namedtuple
+from itertools import permutations
+
+from models import CURSOR, insert_many, iter_chunks, keyset_page, commit, cached, invalidate, QUERY_CACHE, operation, create_indexes_sql, Row, instance_from_row, update_fields, still_mapped
+from models.identity_map import IdentityMap
+from models.names import patient_keys, prefix_range, query_tokens, score
+from models.aio import async_methods
 from models.medical_record import MedicalRecord
 from models.appointment import Appointment
 
+class PatientRow(Row, namedtuple("PatientRow", ["id", "first_name", "last_name", "age", "gender"])):
+    """Read-only Patient row returned by the finders with lightweight=True (see models.Row)"""
+    __slots__ = ()
+
+# Awaitable a<name> versions of the blocking methods (see models.aio)
+@async_methods(
+    "find_by_id", "find_by_name", "search_by_name", "page", "create", "create_many", "save",
+    "update", "delete", "iter_all",
+)
 class Patient:
     
-    all = {}
+    all = IdentityMap()
+    
+    # Indexes backing the find_by_* lookups, created alongside the table (see create_indexes_sql)
+    INDEXES = create_indexes_sql["patients"]
+    
+    # Persisted attributes, in the argument order of create()
+    FIELDS = ("first_name", "last_name", "age", "gender")
+    
+    # Columns read by the lightweight finders, in PatientRow order
+    COLUMNS = ", ".join(PatientRow._fields)
+    
+    # Sort orders accepted by page(); each ends with id and is backed by an index
+    PAGE_ORDERS = {
+        "id": ("id",),
+        "name": ("last_name", "first_name", "id"),
+    }
+    
+    # Rows read from each index by search_by_name before ranking
+    SEARCH_CANDIDATES = 200
     
     def __init__(self, first_name, last_name, age, gender, id=None):
         self.id = id
@@ -13,14 +46,18 @@ class Patient:
         self.last_name = last_name
         self.age = age
         self.gender = gender
-        self.medical_records = []
-        self.appointments = []
+        self._medical_records = None
+        self._appointments = None
 
     def __repr__(self):
         return (
             f"Patient(id={self.id}, first_name={self.first_name}, last_name={self.last_name}, age={self.age}, gender={self.gender}, medical_records={self.medical_records}, appointments={self.appointments})"
         )
     
+    def to_dict(self):
+        """Return the persisted attributes (and id) as a JSON-serializable dict"""
+        return {"id": self.id, **{field: getattr(self, field) for field in self.FIELDS}}
+    
     @property
     def first_name(self):
         return self._first_name
@@ -65,53 +102,97 @@ class Patient:
         else:
             raise ValueError("Gender must be 'Male', 'Female', or 'Other'")
     
+    @property
+    def medical_records(self):
+        """Related MedicalRecord instances, loaded from the database on first access"""
+        if self._medical_records is None:
+            if self.id is None:
+                return []
+            medical_records = MedicalRecord.find_by_patient_id(self.id)
+            # Not kept if the identity map already evicted part of it
+            self._medical_records = still_mapped(MedicalRecord, medical_records)
+            return medical_records
+        return self._medical_records
+    
+    @medical_records.setter
+    def medical_records(self, medical_records):
+        self._medical_records = medical_records
+    
+    @property
+    def appointments(self):
+        """Related Appointment instances, loaded from the database on first access"""
+        if self._appointments is None:
+            if self.id is None:
+                return []
+            appointments = Appointment.find_by_patient_id(self.id)
+            # Not kept if the identity map already evicted part of it
+            self._appointments = still_mapped(Appointment, appointments)
+            return appointments
+        return self._appointments
+    
+    @appointments.setter
+    def appointments(self, appointments):
+        self._appointments = appointments
+    
     @classmethod
     def create_table(cls):
-        """Create a new table to persist the attributes of Patient instances"""
+        """Create a new table (and its lookup indexes) to persist the attributes of Patient instances"""
         sql = """
             CREATE TABLE IF NOT EXISTS patients (
                 id INTEGER PRIMARY KEY,
                 first_name TEXT NOT NULL,
                 last_name TEXT NOT NULL,
                 age INTEGER NOT NULL,
-                gender TEXT NOT NULL
+                gender TEXT NOT NULL,
+                first_name_norm TEXT,
+                last_name_norm TEXT,
+                first_name_soundex TEXT,
+                last_name_soundex TEXT
             )
         """
         CURSOR.execute(sql)
-        CONN.commit()
+        for sql in cls.INDEXES:
+            CURSOR.execute(sql)
+        commit()
     
     @classmethod
     def drop_table(cls):
         """Drop the table that persists the attributes of Patient instances"""
         sql = "DROP TABLE IF EXISTS patients"
         CURSOR.execute(sql)
-        CONN.commit()
+        commit()
     
     def save(self):
         """Persist the attributes of a Patient instance to the database"""
         sql = """
-            INSERT INTO patients (first_name, last_name, age, gender)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO patients (first_name, last_name, age, gender,
+                first_name_norm, last_name_norm, first_name_soundex, last_name_soundex)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """
-        CURSOR.execute(sql, (self.first_name, self.last_name, self.age, self.gender))
-        CONN.commit()
+        CURSOR.execute(sql, (self.first_name, self.last_name, self.age, self.gender, *patient_keys(self.first_name, self.last_name)))
+        commit()
         self.id = CURSOR.lastrowid
+        invalidate("patients", id=self.id)
     
     def update(self):
         """Update the table row corresponding to the current Patient instance"""
         sql = """
             UPDATE patients
-            SET first_name = ?, last_name = ?, age = ?, gender = ?
+            SET first_name = ?, last_name = ?, age = ?, gender = ?,
+                first_name_norm = ?, last_name_norm = ?, first_name_soundex = ?, last_name_soundex = ?
             WHERE id = ?
         """
-        CURSOR.execute(sql, (self.first_name, self.last_name, self.age, self.gender, self.id))
-        CONN.commit()
+        CURSOR.execute(sql, (self.first_name, self.last_name, self.age, self.gender, *patient_keys(self.first_name, self.last_name), self.id))
+        commit()
+        invalidate("patients", id=self.id)
     
     def delete(self):
         """Delete the table row corresponding to the current Patient instance"""
         sql = "DELETE FROM patients WHERE id = ?"
         CURSOR.execute(sql, (self.id,))
-        CONN.commit()
+        commit()
+        type(self).all.pop(self.id, None)
+        invalidate("patients", id=self.id)
     
     @classmethod
     def create(cls, first_name, last_name, age, gender):
@@ -120,48 +201,189 @@ class Patient:
         patient.save()
         return patient
     
+    @classmethod
+    def create_many(cls, rows):
+        """Create and persist Patient instances from an iterable of tuples or dicts.
+
+        Rows use the argument order (or keyword names) of create(). All rows are
+        validated through the property setters before anything is written, then
+        inserted in a single transaction. Returns the new ids; a row that
+        gives an id keeps it.
+        """
+        patients = [cls(**row) if isinstance(row, dict) else cls(*row) for row in rows]
+        sql = """
+            INSERT INTO patients (id, first_name, last_name, age, gender,
+                first_name_norm, last_name_norm, first_name_soundex, last_name_soundex)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        ids = insert_many(sql, ((patient.id, patient.first_name, patient.last_name, patient.age, patient.gender, *patient_keys(patient.first_name, patient.last_name)) for patient in patients))
+        for patient, id in zip(patients, ids):
+            patient.id = id
+        invalidate("patients", id=ids)
+        return ids
+    
+    def _load(self, row):
+        """Assign the values of a table row without validation; they were validated when written"""
+        self.id, self._first_name, self._last_name, self._age, self._gender = row[:5]
+        # Related rows are reloaded lazily on next access
+        self._medical_records = None
+        self._appointments = None
+    
     @classmethod
     def instance_from_db(cls, row):
-        """Return a Patient object having the attribute values from the table row."""
-        patient = cls.all.get(row[0])
-        if patient:
-            patient.first_name = row[1]
-            patient.last_name = row[2]
-            patient.age = row[3]
-            patient.gender = row[4]
-        else:
-            patient = cls(row[1], row[2], row[3], row[4], id=row[0])
-            cls.all[row[0]] = patient
-        
-        # Retrieve and assign related medical records
-        patient.medical_records = MedicalRecord.find_by_patient_id(patient.id)
-        # Retrieve and assign related appointments
-        patient.appointments = Appointment.find_by_patient_id(patient.id)
-        
-        return patient
+        """Return a Patient object having the attribute values from the table row (see models.instance_from_row)"""
+        return instance_from_row(cls, row)
+    
+    @classmethod
+    def load_related(cls, patients, patient_ids=None):
+        """Attach medical records and appointments to the given patients with one batched query per table.
+
+        Pass patient_ids=None when patients covers the whole table so each
+        related table is read once instead of filtered by id. A patient's
+        relation that its identity map could not hold in full is left to
+        load on first access instead.
+        """
+        medical_records = MedicalRecord.find_by_patient_ids(patient_ids)
+        appointments = Appointment.find_by_patient_ids(patient_ids)
+        for patient in patients:
+            patient.medical_records = still_mapped(MedicalRecord, medical_records.get(patient.id, []))
+            patient.appointments = still_mapped(Appointment, appointments.get(patient.id, []))
+        return patients
     
     @classmethod
-    def get_all(cls):
-        """Return a list of all Patient instances persisted to the database"""
+    def get_all(cls, prefetch=False, lightweight=False):
+        """Return a list of all Patient instances persisted to the database.
+
+        With prefetch=True related medical records and appointments are
+        loaded up front in one query per table instead of on first access.
+        With lightweight=True PatientRow tuples are returned instead.
+        """
+        if lightweight:
+            if prefetch:
+                raise ValueError("prefetch requires full Patient instances")
+            CURSOR.execute(f"SELECT {cls.COLUMNS} FROM patients")
+            return list(map(PatientRow._make, CURSOR.fetchall()))
         sql = "SELECT * FROM patients"
         CURSOR.execute(sql)
         rows = CURSOR.fetchall()
-        return [cls.instance_from_db(row) for row in rows]
+        patients = [cls.instance_from_db(row) for row in rows]
+        return cls.load_related(patients) if prefetch else patients
+    
+    @classmethod
+    def iter_all(cls, arraysize=None, prefetch=False, lightweight=False):
+        """Yield every Patient instance, fetching rows from the database in chunks of arraysize.
+
+        With prefetch=True the relations of each chunk are loaded together
+        through load_related, one query per related table per chunk. With
+        lightweight=True PatientRow tuples are yielded instead.
+        """
+        if lightweight:
+            if prefetch:
+                raise ValueError("prefetch requires full Patient instances")
+            for rows in iter_chunks(f"SELECT {cls.COLUMNS} FROM patients", (), arraysize):
+                yield from map(PatientRow._make, rows)
+            return
+        sql = "SELECT * FROM patients"
+        for rows in iter_chunks(sql, (), arraysize):
+            patients = [cls.instance_from_db(row) for row in rows]
+            if prefetch:
+                cls.load_related(patients, [patient.id for patient in patients])
+            yield from patients
+    
+    @classmethod
+    def page(cls, after_id=None, limit=20, order_by="id", before_id=None, prefetch=False):
+        """Return up to limit Patient instances following after_id (or preceding before_id) in order_by order"""
+        if order_by not in cls.PAGE_ORDERS:
+            raise ValueError(f"order_by must be one of {', '.join(cls.PAGE_ORDERS)}")
+        rows = keyset_page("patients", cls.PAGE_ORDERS[order_by], after_id, before_id, limit)
+        patients = [cls.instance_from_db(row) for row in rows]
+        if prefetch:
+            cls.load_related(patients, [patient.id for patient in patients])
+        return patients
     
     @classmethod
-    def find_by_id(cls, id):
+    @cached("patients", "id")
+    def find_by_id(cls, id, prefetch=False):
         """Return the Patient instance with the given primary key"""
         sql = "SELECT * FROM patients WHERE id = ?"
         row = CURSOR.execute(sql, (id,)).fetchone()
-        return cls.instance_from_db(row) if row else None
+        if not row:
+            return None
+        patient = cls.instance_from_db(row)
+        if prefetch:
+            cls.load_related([patient], [patient.id])
+        return patient
     
     @classmethod
-    def find_by_name(cls, first_name, last_name):
+    def find_by_name(cls, first_name, last_name, prefetch=False):
         """Return a list of Patient instances with the given name"""
         sql = "SELECT * FROM patients WHERE first_name = ? AND last_name = ?"
         row = CURSOR.execute(sql, (first_name, last_name)).fetchone()
-        return cls.instance_from_db(row) if row else None
+        if not row:
+            return None
+        patient = cls.instance_from_db(row)
+        if prefetch:
+            cls.load_related([patient], [patient.id])
+        return patient
     
+    @classmethod
+    def search_by_name(cls, query, limit=10, prefetch=False):
+        """Return up to limit Patient instances whose name matches query, best match first.
+
+        Each word of query is looked up as a prefix of the first and last
+        name and, from three letters on, by Soundex, with index range scans
+        on the normalized name columns. Two-word queries also match first and
+        last name together in either order. Candidates are ranked by
+        models.names.score, then alphabetically.
+        """
+        tokens = query_tokens(query)
+        if not tokens:
+            return []
+        branches, params = [], []
+        
+        def branch(where, *values):
+            branches.append(f"SELECT * FROM (SELECT * FROM patients WHERE {where} LIMIT ?)")
+            params.extend((*values, cls.SEARCH_CANDIDATES))
+        
+        for token, token_soundex in tokens:
+            branch("last_name_norm >= ? AND last_name_norm < ?", *prefix_range(token))
+            branch("first_name_norm >= ? AND first_name_norm < ?", *prefix_range(token))
+            if token_soundex:
+                branch("last_name_soundex = ?", token_soundex)
+                branch("first_name_soundex = ?", token_soundex)
+        for (last, _), (first, _) in permutations(tokens, 2):
+            branch(
+                "last_name_norm >= ? AND last_name_norm < ? AND first_name_norm >= ? AND first_name_norm < ?",
+                *prefix_range(last), *prefix_range(first),
+            )
+        rows = CURSOR.execute(" UNION ".join(branches), params).fetchall()
+        # Rows end with first_name_norm, last_name_norm, first_name_soundex, last_name_soundex
+        rows.sort(key=lambda row: (-score(tokens, [(row[6], row[8]), (row[5], row[7])]), row[6], row[5], row[0]))
+        patients = [cls.instance_from_db(row) for row in rows[:limit]]
+        if prefetch:
+            cls.load_related(patients, [patient.id for patient in patients])
+        return patients
+
+def _forget_related(attribute):
+    """Return a listener that unloads a relation of the identity-mapped Patient it names"""
+    def forget(patient_id):
+        patient = Patient.all.peek(patient_id)
+        if patient is not None:
+            setattr(patient, attribute, None)
+    return forget
+
+_forget_medical_records = _forget_related("medical_records")
+_forget_appointments = _forget_related("appointments")
+
+# Reload a loaded relation after a write to any of its rows
+QUERY_CACHE.listen("medical_records", "patient_id", _forget_medical_records)
+QUERY_CACHE.listen("appointments", "patient_id", _forget_appointments)
+
+# ...and once its identity map evicts one of them, so the relation does not
+# keep evicted instances alive beyond the map's capacity
+MedicalRecord.all.listen(lambda record: _forget_medical_records(record.patient_id))
+Appointment.all.listen(lambda appointment: _forget_appointments(appointment.patient_id))
+
 def manage_patients():
     while True:
         print("\n--- Patient Management Menu ---")
@@ -169,7 +391,9 @@ def manage_patients():
         print("2. Add a new patient")
         print("3. Update a patient")
         print("4. Delete a patient")
-        print("5. Return to main menu")
+        print("5. Browse patients page by page")
+        print("6. Search patients by name")
+        print("7. Return to main menu")
         
         choice = input("Enter your choice: ")
         
@@ -182,18 +406,39 @@ def manage_patients():
         elif choice == "4":
             delete_patient()
         elif choice == "5":
+            browse_patients()
+        elif choice == "6":
+            search_patients()
+        elif choice == "7":
             break
         else:
-            print("Invalid choice. Please enter a number between 1 and 5.")
+            print("Invalid choice. Please enter a number between 1 and 7.")
 
+@operation("cli patients view")
 def view_all_patients():
-    patients = Patient.get_all()
-    if patients:
-        for patient in patients:
-            print(patient)
-    else:
+    found = False
+    for patient in Patient.iter_all(prefetch=True):
+        print(patient)
+        found = True
+    if not found:
         print("No patients found.")
 
+@operation("cli patients browse")
+def browse_patients():
+    from helpers import browse_pages
+    order_by = "name" if input("Sort by name? (y/n): ").lower() == "y" else "id"
+    browse_pages(lambda **page: Patient.page(order_by=order_by, prefetch=True, **page))
+
+@operation("cli patients search")
+def search_patients():
+    query = input("Enter part of the patient's name: ")
+    patients = Patient.search_by_name(query)
+    for patient in patients:
+        print(f"{patient.id}: {patient.first_name} {patient.last_name}, {patient.age}, {patient.gender}")
+    if not patients:
+        print("No matching patients found.")
+
+@operation("cli patients add")
 def add_patient():
     first_name = input("Enter patient's first name: ")
     last_name = input("Enter patient's last name: ")
@@ -206,6 +451,7 @@ def add_patient():
     except ValueError as e:
         print(f"Error: {e}")
 
+@operation("cli patients update")
 def update_patient():
     patient_id = int(input("Enter patient ID to update: "))
     patient = Patient.find_by_id(patient_id)
@@ -217,17 +463,17 @@ def update_patient():
         new_gender = input(f"Enter new gender (current: {patient.gender}): ")
         
         try:
-            patient.first_name = new_first_name
-            patient.last_name = new_last_name
-            patient.age = new_age
-            patient.gender = new_gender
-            patient.update()
+            # patient is the shared identity-mapped instance: update_fields
+            # validates and writes a copy, so a rejected value changes nothing
+            changes = {"first_name": new_first_name, "last_name": new_last_name, "age": new_age, "gender": new_gender}
+            patient = update_fields(patient, changes)
             print(f"Patient {patient.first_name} {patient.last_name} updated successfully.")
         except ValueError as e:
             print(f"Error: {e}")
     else:
         print("Patient not found.")
 
+@operation("cli patients delete")
 def delete_patient():
     patient_id = int(input("Enter patient ID to delete: "))
     patient = Patient.find_by_id(patient_id)
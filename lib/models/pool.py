@@ -0,0 +1,195 @@
+# lib/models/pool.py
+import os
+import sqlite3
+import threading
+import weakref
+
+# Database file used when none is configured; HOSPITAL_DB overrides it
+DEFAULT_DATABASE = os.environ.get("HOSPITAL_DB", "hospital.db")
+
+# PRAGMA settings applied to every new connection, by profile name. WAL lets
+# readers run alongside a writer; the profiles trade durability of the last
+# commits (synchronous), memory (cache_size in KiB when negative, mmap_size
+# in bytes) and lock patience (busy_timeout in ms) differently.
+PROFILES = {
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    "throughput": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+    "readonly-analytics": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -262144,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+        "query_only": 1,
+    },
+}
+
+# Profile used when none is configured; HOSPITAL_DB_PROFILE overrides it
+DEFAULT_PROFILE = os.environ.get("HOSPITAL_DB_PROFILE", "durable")
+
+# Order in which settings are applied and reported; journal_mode must be set
+# before query_only forbids the write it needs.
+PRAGMAS = ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout", "query_only")
+
+
+def resolve_profile(profile):
+    """Return the PRAGMA settings for a profile name or a dict of settings"""
+    if isinstance(profile, dict):
+        settings = profile
+    elif profile in PROFILES:
+        settings = PROFILES[profile]
+    else:
+        raise ValueError(f"Unknown profile {profile!r}; expected one of {', '.join(PROFILES)}")
+    unknown = set(settings) - set(PRAGMAS)
+    if unknown:
+        raise ValueError(f"Unsupported PRAGMA settings: {', '.join(sorted(unknown))}")
+    for name, value in settings.items():
+        # Values are interpolated into the PRAGMA statement, so only plain
+        # integers and keywords are accepted.
+        if not (isinstance(value, int) or (isinstance(value, str) and value.isalnum())):
+            raise ValueError(f"Invalid value for PRAGMA {name}: {value!r}")
+    return settings
+
+
+def apply_profile(connection, settings):
+    """Run the PRAGMA statements for the given settings on a connection"""
+    for name in PRAGMAS:
+        if name in settings:
+            connection.execute(f"PRAGMA {name} = {settings[name]}")
+
+
+class _Owner:
+    """Placeholder kept in a thread's `local` state; its collection when the thread ends closes the connection"""
+
+    __slots__ = ("__weakref__",)
+
+
+class ConnectionPool:
+    """Hands every thread its own sqlite3 connection and cursor.
+
+    Connections are opened on first use in each thread and reused for the
+    rest of that thread's life, so concurrent front-desk sessions and
+    background jobs never share a cursor. When a thread ends its connection
+    is closed and leaves the pool, so short-lived threads do not pile up
+    open files. Per-thread state such as the transaction nesting level is
+    kept alongside the connection in `local`.
+    Connections are created by factory, an sqlite3.Connection subclass, and
+    passed to on_open, if set, once they are the calling thread's connection.
+    """
+
+    def __init__(self, database=DEFAULT_DATABASE, timeout=30.0, profile=DEFAULT_PROFILE, factory=sqlite3.Connection,
+                 on_open=None):
+        self.database = database
+        self.timeout = timeout
+        self.profile = profile
+        self.factory = factory
+        self.on_open = on_open
+        self.local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set()
+
+    def __repr__(self):
+        return f"ConnectionPool(database={self.database!r}, profile={self.profile_name!r}, open={len(self._connections)})"
+
+    @property
+    def profile(self):
+        return self._settings
+
+    @profile.setter
+    def profile(self, profile):
+        self._settings = resolve_profile(profile)
+        self.profile_name = profile if isinstance(profile, str) else "custom"
+
+    def connection(self):
+        """Return the calling thread's connection, opening it if necessary"""
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self._open()
+        return connection
+
+    def cursor(self):
+        """Return the calling thread's shared cursor"""
+        cursor = getattr(self.local, "cursor", None)
+        if cursor is None:
+            cursor = self.connection().cursor()
+            self.local.cursor = cursor
+        return cursor
+
+    def close(self):
+        """Close the calling thread's connection, if it has one"""
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            self._release(connection)
+        self.local.__dict__.clear()
+
+    def close_all(self):
+        """Close every connection handed out by the pool"""
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for connection in connections:
+            connection.close()
+        # Threads notice their closed connection and reopen on next use
+        self.local = threading.local()
+
+    def configure(self, database=None, timeout=None, profile=None):
+        """Change the database file, timeout or profile, closing existing connections"""
+        if profile is not None:
+            self.profile = profile
+        self.close_all()
+        if database is not None:
+            self.database = database
+        if timeout is not None:
+            self.timeout = timeout
+
+    def active_settings(self):
+        """Return the PRAGMA values in effect on the calling thread's connection"""
+        connection = self.connection()
+        settings = {"database": self.database, "profile": self.profile_name}
+        for name in PRAGMAS:
+            settings[name] = connection.execute(f"PRAGMA {name}").fetchone()[0]
+        return settings
+
+    @property
+    def size(self):
+        return len(self._connections)
+
+    def _release(self, connection):
+        with self._lock:
+            self._connections.discard(connection)
+        connection.close()
+
+    def _open(self):
+        # check_same_thread is off only so close_all() can close connections
+        # from another thread; each connection is still used by one thread.
+        connection = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False, factory=self.factory)
+        apply_profile(connection, self._settings)
+        self.local.connection = connection
+        self.local.cursor = None
+        # Thread-local values are dropped when their thread ends (or the pool
+        # is reconfigured), and the owner with them
+        self.local.owner = _Owner()
+        weakref.finalize(self.local.owner, self._release, connection)
+        with self._lock:
+            self._connections.add(connection)
+        if self.on_open is not None:
+            try:
+                self.on_open(connection)
+            except BaseException:
+                self.close()
+                raise
+        return connection
@@ -0,0 +1,165 @@
+# lib/models/query_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """Bounded, expiring cache of finder results with tag-based invalidation.
+
+    Every entry carries a set of tags, (table, column, value) triples naming
+    the rows it was built from. invalidate() drops every entry holding one
+    of the given tags, so a write only evicts the results it can change.
+    Entries also expire ttl seconds after they were stored, and the least
+    recently used entry is evicted once more than capacity are held.
+
+    The cache is off until enabled; while off, get() always misses and
+    set() stores nothing.
+    """
+
+    DEFAULT_TTL = 30.0
+    DEFAULT_CAPACITY = 1000
+
+    def __init__(self, ttl=DEFAULT_TTL, capacity=DEFAULT_CAPACITY, enabled=False):
+        self._entries = OrderedDict()
+        self._keys_by_tag = {}
+        self._listeners = {}
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self.capacity = capacity
+        self.enabled = enabled
+        # Bumped by every invalidation; results computed across a bump are not stored
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __repr__(self):
+        state = "enabled" if self.enabled else "disabled"
+        return f"QueryCache({state}, size={len(self)}, capacity={self.capacity}, ttl={self.ttl})"
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def ttl(self):
+        return self._ttl
+
+    @ttl.setter
+    def ttl(self, ttl):
+        if isinstance(ttl, (int, float)) and ttl > 0:
+            self._ttl = ttl
+        else:
+            raise ValueError("TTL must be a positive number of seconds")
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @capacity.setter
+    def capacity(self, capacity):
+        if isinstance(capacity, int) and capacity >= 0:
+            with self._lock:
+                self._capacity = capacity
+                self._evict()
+        else:
+            raise ValueError("Capacity must be a non-negative integer")
+
+    def get(self, key):
+        """Return (True, value) for a live entry, otherwise (False, None)"""
+        if not self.enabled:
+            return False, None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def set(self, key, value, tags, version):
+        """Store value under key unless the cache was invalidated since version was read"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self._ttl, value, frozenset(tags))
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            self._evict()
+
+    def invalidate(self, tags):
+        """Drop every entry carrying one of tags and notify the listeners of each tag"""
+        listeners = []
+        with self._lock:
+            self.version += 1
+            for tag in tags:
+                for key in self._keys_by_tag.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+                listeners.extend((listener, tag[2]) for listener in self._listeners.get(tag[:2], ()))
+        for listener, value in listeners:
+            listener(value)
+
+    def listen(self, table, column, listener):
+        """Call listener(value) whenever the tag (table, column, value) is invalidated"""
+        with self._lock:
+            self._listeners.setdefault((table, column), []).append(listener)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def configure(self, enabled=None, ttl=None, capacity=None):
+        """Change any of enabled, ttl and capacity; disabling also empties the cache"""
+        if ttl is not None:
+            self.ttl = ttl
+        if capacity is not None:
+            self.capacity = capacity
+        if enabled is not None:
+            self.enabled = enabled
+            if not enabled:
+                self.clear()
+
+    def stats(self):
+        """Return the size, settings and hit/miss counters as a dict"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self),
+            "capacity": self.capacity,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def _evict(self):
+        while len(self._entries) > self._capacity:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
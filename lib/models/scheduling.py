@@ -0,0 +1,170 @@
+# lib/models/scheduling.py
+"""Double-booking checks and free-slot search for appointments.
+
+Appointments are intervals [start, start + duration). Both questions are
+answered from the (doctor_id, appointment_date) and (patient_id,
+appointment_date) indexes, which keep each calendar sorted by start.
+Because no appointment is longer than MAX_DURATION, every appointment
+that can overlap an interval starts within MAX_DURATION before it, so a
+check is one bounded index range scan no matter how much history exists.
+Stored dates are canonical (see models.dates), so they are read back with
+datetime.fromisoformat. Legacy values that normalize_dates() could not
+repair are skipped with a warning rather than failing every check for
+that calendar.
+"""
+import warnings
+from datetime import date, datetime, time, timedelta
+
+from models import CURSOR, iter_chunks
+from models.dates import format_datetime, parse_datetime
+
+# Appointment lengths in minutes
+DEFAULT_DURATION = 30
+MAX_DURATION = 24 * 60
+
+# Granularity and daily window used when proposing free slots
+SLOT_STEP = 15
+DAY_START = time(9, 0)
+DAY_END = time(17, 0)
+
+
+class SchedulingConflict(ValueError):
+    """Raised when an appointment would overlap another one for the same doctor or patient"""
+
+    def __init__(self, message, conflicts):
+        super().__init__(message)
+        self.conflicts = conflicts
+
+
+def _stored_start(id, value):
+    """Return the start of a stored appointment, or None (with a warning) when it cannot be parsed"""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        warnings.warn(f"appointments.appointment_date of row {id} is unparseable ({value!r}); it is ignored")
+        return None
+
+
+def _overlapping(column, value, start, end, exclude_id=None):
+    """Return (id, start, end) for appointments in one calendar that overlap [start, end)"""
+    sql = f"""
+        SELECT id, appointment_date, duration FROM appointments
+        WHERE {column} = ? AND appointment_date > ? AND appointment_date < ?
+    """
+    params = [value, format_datetime(start - timedelta(minutes=MAX_DURATION)), format_datetime(end)]
+    overlaps = []
+    for id, other_date, duration in CURSOR.execute(sql, params).fetchall():
+        if id == exclude_id:
+            continue
+        other_start = _stored_start(id, other_date)
+        if other_start is None:
+            continue
+        other_end = other_start + timedelta(minutes=duration)
+        if other_end > start:
+            overlaps.append((id, other_start, other_end))
+    return overlaps
+
+
+def find_conflicts(appointment_date, duration, doctor_id, patient_id, exclude_id=None):
+    """Return {"doctor": [...], "patient": [...]} overlapping appointments as (id, start, end)"""
+    start = parse_datetime(appointment_date)
+    end = start + timedelta(minutes=duration)
+    return {
+        "doctor": _overlapping("doctor_id", doctor_id, start, end, exclude_id),
+        "patient": _overlapping("patient_id", patient_id, start, end, exclude_id),
+    }
+
+
+def check_availability(appointment_date, duration, doctor_id, patient_id, exclude_id=None):
+    """Raise SchedulingConflict if the doctor or patient is already booked in that interval"""
+    conflicts = find_conflicts(appointment_date, duration, doctor_id, patient_id, exclude_id)
+    for party, overlaps in conflicts.items():
+        if overlaps:
+            ids = ", ".join(str(id) for id, _, _ in overlaps)
+            raise SchedulingConflict(f"The {party} is already booked at that time (appointment {ids})", conflicts)
+
+
+def check_batch(appointments):
+    """Raise SchedulingConflict if appointments in the same batch overlap each other.
+
+    Each calendar is sorted by start; any overlap in a sorted calendar shows
+    up between neighbours, so one pass per calendar is enough.
+    """
+    calendars = {}
+    for appointment in appointments:
+        start = parse_datetime(appointment.appointment_date)
+        interval = (start, start + timedelta(minutes=appointment.duration), appointment)
+        calendars.setdefault(("doctor", appointment.doctor_id), []).append(interval)
+        calendars.setdefault(("patient", appointment.patient_id), []).append(interval)
+    for (party, _), intervals in calendars.items():
+        intervals.sort(key=lambda interval: interval[0])
+        for previous, current in zip(intervals, intervals[1:]):
+            if current[0] < previous[1]:
+                raise SchedulingConflict(
+                    f"The {party} is booked twice in this batch at {format_datetime(current[0])}",
+                    {party: [previous[2], current[2]]},
+                )
+
+
+def _align(moment, step, day_start, day_end, duration, end):
+    """Return the first slot start at or after moment on the step grid inside working hours.
+
+    Once moment passes end it is returned as is; the caller stops there.
+    """
+    midnight = datetime.combine(moment.date(), time())
+    minutes = (moment - midnight).total_seconds() / 60
+    moment = midnight + timedelta(minutes=-(-minutes // step) * step)
+    while moment <= end:
+        opening = datetime.combine(moment.date(), day_start)
+        closing = datetime.combine(moment.date(), day_end)
+        if moment < opening:
+            moment = opening
+        if moment + timedelta(minutes=duration) <= closing:
+            return moment
+        moment = datetime.combine(moment.date() + timedelta(days=1), day_start)
+    return moment
+
+
+def next_free_slots(doctor_id, start, end, count=5, duration=DEFAULT_DURATION,
+                    step=SLOT_STEP, day_start=DAY_START, day_end=DAY_END):
+    """Return up to count free slot start times (as strings) for a doctor between start and end.
+
+    The doctor's appointments are read in start order from the index and
+    walked once; reading stops as soon as enough gaps have been found.
+    Raises ValueError when duration does not fit between day_start and day_end.
+    """
+    working_day = datetime.combine(date.min, day_end) - datetime.combine(date.min, day_start)
+    if timedelta(minutes=duration) > working_day:
+        raise ValueError(
+            f"A {duration} minute appointment does not fit between {day_start:%H:%M} and {day_end:%H:%M}"
+        )
+    start, end = parse_datetime(start), parse_datetime(end)
+    sql = """
+        SELECT id, appointment_date, duration FROM appointments
+        WHERE doctor_id = ? AND appointment_date > ? AND appointment_date < ?
+        ORDER BY appointment_date
+    """
+    params = (doctor_id, format_datetime(start - timedelta(minutes=MAX_DURATION)), format_datetime(end))
+    slots = []
+    candidate = _align(start, step, day_start, day_end, duration, end)
+    length = timedelta(minutes=duration)
+
+    def fill_until(limit):
+        nonlocal candidate
+        while len(slots) < count and candidate + length <= min(limit, end):
+            slots.append(format_datetime(candidate))
+            candidate = _align(candidate + timedelta(minutes=step), step, day_start, day_end, duration, end)
+
+    for rows in iter_chunks(sql, params):
+        for id, booked_date, booked_duration in rows:
+            booked_start = _stored_start(id, booked_date)
+            if booked_start is None:
+                continue
+            booked_end = booked_start + timedelta(minutes=booked_duration)
+            fill_until(booked_start)
+            if len(slots) >= count:
+                return slots
+            if booked_end > candidate:
+                candidate = _align(booked_end, step, day_start, day_end, duration, end)
+    fill_until(end)
+    return slots
@@ -0,0 +1,355 @@
+# lib/models/transfer.py
+"""Streaming CSV and JSONL export and import of whole tables.
+
+export_table() writes a table in id order to a CSV or JSONL file, gzipped
+when the path ends in .gz or compress=True. Rows are read and written
+chunk_size at a time, so memory use does not grow with the table. After
+every chunk the file is flushed and a checkpoint (last id, row count and
+file size) is saved beside it as <path>.checkpoint. An interrupted export
+run again with resume=True truncates the file to the checkpoint and carries
+on after that id. Gzipped output is written as one gzip member per chunk;
+readers see the members as one stream, and every checkpoint falls on a
+member boundary.
+
+import_table() loads such a file, or any CSV or JSONL with the create()
+fields, through the model's create_many, one transaction per chunk. The
+count of input rows committed is stored in the transfer_checkpoints table
+in the same transaction, so resume=True skips exactly the rows already
+loaded. An id column in the input, as written by export_table(), is kept,
+so appointments and medical records still point at the same patients and
+doctors after a round trip; a row whose id is already taken rejects its
+chunk. Rows without an id get one from the database.
+
+Both return a TransferStats and call progress(stats) after every chunk.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from itertools import islice
+
+from models import CURSOR, iter_chunks, transaction
+from models.dates import format_date, format_datetime
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Columns given to the setters as integers when read from CSV
+INTEGER_FIELDS = {"id", "age", "patient_id", "doctor_id", "duration"}
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+def tables():
+    """Return {table: (model, row type, (date column, formatter) or None)}, importing the models on first use"""
+    from models.patient import Patient, PatientRow
+    from models.doctor import Doctor, DoctorRow
+    from models.appointment import Appointment, AppointmentRow
+    from models.medical_record import MedicalRecord, MedicalRecordRow
+
+    return {
+        "patients": (Patient, PatientRow, None),
+        "doctors": (Doctor, DoctorRow, None),
+        "appointments": (Appointment, AppointmentRow, ("appointment_date", format_datetime)),
+        "medical_records": (MedicalRecord, MedicalRecordRow, ("record_date", format_date)),
+    }
+
+
+def _table(table):
+    try:
+        return tables()[table]
+    except KeyError:
+        raise ValueError(f"Unknown table {table!r}; expected one of {', '.join(tables())}") from None
+
+
+def detect_format(path, format=None):
+    """Return format, or "csv" / "jsonl" from path's extension (ignoring a trailing .gz)"""
+    if format is not None:
+        if format not in ("csv", "jsonl"):
+            raise ValueError(f"Unknown format {format!r}; expected csv or jsonl")
+        return format
+    stem = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(stem)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Cannot tell the format of {path}; name it .csv or .jsonl (optionally .gz) or pass format")
+    return FORMATS[extension]
+
+
+class InputError(ValueError):
+    """A row of the input that could not be applied; line is its position in the input"""
+
+    def __init__(self, line, message):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+def read_rows(stream, format):
+    """Yield (line number, dict) for every row of a JSONL or CSV text stream.
+
+    Empty CSV cells are left out and CSV integer columns are converted, so
+    both formats give the setters the same values.
+    """
+    if format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, _from_csv(reader.line_num, row)
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as error:
+            raise InputError(number, f"invalid JSON ({error})") from None
+        if not isinstance(row, dict):
+            raise InputError(number, "expected a JSON object")
+        yield number, row
+
+
+def _from_csv(number, row):
+    values = {}
+    for field, value in row.items():
+        if field is None or value in (None, ""):
+            continue
+        if field in INTEGER_FIELDS:
+            try:
+                value = int(value)
+            except ValueError:
+                raise InputError(number, f"{field} must be an integer, not {value!r}") from None
+        values[field] = value
+    return values
+
+
+def batches(rows, size):
+    """Yield lists of up to size items from rows without reading further ahead"""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def creation_fields(model, batch):
+    """Return the create() arguments of each (line number, row) pair, including any id.
+
+    Raises InputError naming the first row with a field the model does not have.
+    """
+    rows = []
+    for number, row in batch:
+        unknown = set(row) - set(model.FIELDS) - {"id"}
+        if unknown:
+            raise InputError(number, f"unknown fields {', '.join(sorted(unknown))}")
+        rows.append(row)
+    return rows
+
+
+def select_rows(table, since=None, until=None, patient_id=None, doctor_id=None, after_id=None, chunk_size=None):
+    """Yield lists of up to chunk_size rows of table, as row type tuples in id order.
+
+    since and until bound the table's date column (from start up to, not
+    including, end) and are normalized like find_between()'s range.
+    """
+    model, row_type, dated = _table(table)
+    conditions, params = [], []
+    if (since is not None or until is not None) and dated is None:
+        raise ValueError(f"{table} has no date column to filter on")
+    if since is not None:
+        conditions.append(f"{dated[0]} >= ?")
+        params.append(dated[1](since))
+    if until is not None:
+        conditions.append(f"{dated[0]} < ?")
+        params.append(dated[1](until))
+    if patient_id is not None:
+        conditions.append("patient_id = ?")
+        params.append(patient_id)
+    if doctor_id is not None:
+        conditions.append("doctor_id = ?")
+        params.append(doctor_id)
+    if after_id is not None:
+        conditions.append("id > ?")
+        params.append(after_id)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"SELECT {model.COLUMNS} FROM {table}{where} ORDER BY id"
+    for rows in iter_chunks(sql, params, chunk_size):
+        yield list(map(row_type._make, rows))
+
+
+class TransferStats:
+    """Rows and bytes moved by one export or import run, and how fast"""
+
+    def __init__(self, table, path, skipped=0):
+        self.table = table
+        self.path = path
+        # Rows already transferred by an earlier run this one resumed
+        self.skipped = skipped
+        self.rows = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def __repr__(self):
+        return f"TransferStats({self.table!r}, rows={self.rows}, rows_per_second={self.rows_per_second:.0f})"
+
+    @property
+    def seconds(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def rows_per_second(self):
+        seconds = self.seconds
+        return self.rows / seconds if seconds else 0.0
+
+    def to_dict(self):
+        return {
+            "table": self.table,
+            "path": self.path,
+            "rows": self.rows,
+            "skipped": self.skipped,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def _encode(rows, format, header=None):
+    """Return rows (row type tuples) as CSV or JSONL bytes, preceded by the CSV header if given"""
+    if format == "jsonl":
+        return "".join(json.dumps(row._asdict()) + "\n" for row in rows).encode()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _read_checkpoint(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _write_checkpoint(path, checkpoint):
+    # Written aside and renamed over the old one, so a crash never leaves half a checkpoint
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(checkpoint, file)
+    os.replace(f"{path}.tmp", path)
+
+
+def export_table(table, path, format=None, compress=None, chunk_size=DEFAULT_CHUNK_SIZE, resume=False,
+                 progress=None, **filters):
+    """Write the rows of table to path as CSV or JSONL and return a TransferStats.
+
+    filters are select_rows()'s since, until, patient_id and doctor_id. With
+    resume=True an export interrupted earlier continues from its
+    checkpoint; without a checkpoint it starts over.
+    """
+    format = detect_format(path, format)
+    compress = path.endswith(".gz") if compress is None else compress
+    _, row_type, _ = _table(table)
+    checkpoint_path = f"{path}.checkpoint"
+    settings = {"table": table, "format": format, "compress": compress, "filters": {key: str(value) for key, value in filters.items()}}
+    checkpoint = _read_checkpoint(checkpoint_path) if resume else None
+    if checkpoint is not None:
+        if checkpoint["settings"] != settings:
+            raise ValueError(f"{checkpoint_path} is for an export with other settings: {checkpoint['settings']}")
+        if not os.path.exists(path) or os.path.getsize(path) < checkpoint["offset"]:
+            raise ValueError(f"{path} is shorter than its checkpoint; export it again without resume")
+    else:
+        checkpoint = {"settings": settings, "last_id": None, "rows": 0, "offset": 0}
+
+    stats = TransferStats(table, path, skipped=checkpoint["rows"])
+    with open(path, "r+b" if checkpoint["offset"] else "wb") as file:
+        file.seek(checkpoint["offset"])
+        file.truncate()
+        header = row_type._fields if format == "csv" and not checkpoint["offset"] else None
+        chunks = select_rows(table, after_id=checkpoint["last_id"], chunk_size=chunk_size, **filters)
+        for rows in chunks:
+            data = _encode(rows, format, header)
+            header = None
+            file.write(gzip.compress(data) if compress else data)
+            file.flush()
+            checkpoint.update(last_id=rows[-1].id, rows=checkpoint["rows"] + len(rows), offset=file.tell())
+            _write_checkpoint(checkpoint_path, checkpoint)
+            stats.rows += len(rows)
+            stats.bytes = file.tell()
+            if progress is not None:
+                progress(stats)
+        if header:
+            # An empty table still gets its header row
+            file.write(gzip.compress(_encode([], format, header)) if compress else _encode([], format, header))
+        stats.bytes = file.tell()
+    stats.finished = time.perf_counter()
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return stats
+
+
+def export_all(directory, format="csv", compress=False, chunk_size=DEFAULT_CHUNK_SIZE, resume=False, progress=None):
+    """Export every table to <directory>/<table>.<format>[.gz]; returns {table: TransferStats}"""
+    os.makedirs(directory, exist_ok=True)
+    suffix = f".{format}" + (".gz" if compress else "")
+    return {
+        table: export_table(table, os.path.join(directory, table + suffix), format, compress, chunk_size, resume, progress)
+        for table in tables()
+    }
+
+
+def _open_text(path):
+    """Open path for reading as text, decompressing it if it starts with the gzip magic number"""
+    raw = open(path, "rb")
+    if raw.peek(2)[:2] == b"\x1f\x8b":
+        return raw, io.TextIOWrapper(gzip.GzipFile(fileobj=raw), encoding="utf-8", newline="")
+    return raw, io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+
+def _committed_rows(job):
+    row = CURSOR.execute("SELECT rows FROM transfer_checkpoints WHERE job = ?", (job,)).fetchone()
+    return row[0] if row else 0
+
+
+def import_table(table, path, format=None, chunk_size=DEFAULT_CHUNK_SIZE, resume=False, job=None, progress=None):
+    """Load the rows of a CSV or JSONL file (gzipped or not) into table and return a TransferStats.
+
+    job names the checkpoint, by default the table and the file's absolute
+    path. With resume=True the rows committed by an earlier run of the same
+    job are skipped; otherwise the import starts from the first row. The
+    checkpoint is removed once the whole file is loaded. A row that fails
+    validation raises InputError and rolls back its chunk only.
+    """
+    format = detect_format(path, format)
+    model, _, _ = _table(table)
+    job = job or f"{table}:{os.path.abspath(path)}"
+    skipped = _committed_rows(job) if resume else 0
+    stats = TransferStats(table, path, skipped=skipped)
+    raw, stream = _open_text(path)
+    with raw, stream:
+        rows = islice(read_rows(stream, format), skipped, None)
+        for batch in batches(rows, chunk_size):
+            fields = creation_fields(model, batch)
+            try:
+                with transaction(immediate=True):
+                    model.create_many(fields)
+                    CURSOR.execute(
+                        "INSERT OR REPLACE INTO transfer_checkpoints (job, rows, updated) VALUES (?, ?, ?)",
+                        (job, skipped + stats.rows + len(batch), datetime.now().isoformat(timespec="seconds")),
+                    )
+            except (ValueError, TypeError, sqlite3.IntegrityError) as error:
+                if isinstance(error, InputError):
+                    raise
+                raise InputError(batch[0][0], f"chunk starting here was rejected: {error}") from None
+            stats.rows += len(batch)
+            stats.bytes = raw.tell()
+            if progress is not None:
+                progress(stats)
+        stats.bytes = raw.tell()
+    with transaction():
+        CURSOR.execute("DELETE FROM transfer_checkpoints WHERE job = ?", (job,))
+    stats.finished = time.perf_counter()
+    return stats
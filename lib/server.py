@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# lib/server.py
+"""HTTP/JSON front-end for the hospital models.
+
+Routes (every resource is one of patients, doctors, appointments,
+medical_records):
+
+    GET    /<resource>                    stream every row as a JSON array
+    GET    /<resource>?after_id=&limit=&order_by=&before_id=
+                                          one keyset page
+    GET    /<resource>?start=&end=[&doctor_id=]
+                                          rows dated in [start, end) (appointments, medical_records)
+    GET    /<resource>?patient_id=N       rows for a patient (appointments, medical_records)
+    GET    /<resource>?doctor_id=N        rows for a doctor (appointments, medical_records)
+    GET    /<resource>/search?q=&limit=   ranked name search (patients, doctors) or full-text
+                                          search (medical_records, also takes patient_id)
+    GET    /<resource>/search?...         exact name: patients first_name, last_name; doctors name
+    GET    /<resource>/<id>
+    POST   /<resource>                    create from a JSON object (409 if an appointment
+                                          overlaps another for the same doctor or patient)
+    PUT    /<resource>/<id>               update the given fields
+    DELETE /<resource>/<id>
+    GET    /stats                         SQL statement timings per statement and per route,
+                                          the slow-query log and the result cache counters
+
+Requests are handled by a fixed pool of worker threads, each with its own
+pooled database connection. List responses are built from the finders'
+lightweight rows, which serialize to the same JSON as full instances.
+With --sql-stats each request is counted as one operation named after its
+route, so /stats shows how many statements every route runs.
+limit= must be positive and is capped at MAX_LIMIT. A filter the resource
+does not support (e.g. /patients?doctor_id=) is a 400, not the whole table.
+"""
+import argparse
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from models.patient import Patient
+from models.doctor import Doctor
+from models.appointment import Appointment
+from models.medical_record import MedicalRecord
+from models.scheduling import SchedulingConflict
+from models import (
+    configure_instrumentation, configure_query_cache, instrumentation_snapshot, operation, query_cache_stats, update_fields,
+)
+
+# Query parameters that narrow a collection listing; one the resource cannot apply is a 400
+FILTERS = {"start", "end", "patient_id", "doctor_id"}
+
+RESOURCES = {
+    "patients": Patient,
+    "doctors": Doctor,
+    "appointments": Appointment,
+    "medical_records": MedicalRecord,
+}
+
+# Objects serialized into each chunk of a streamed list response
+STREAM_CHUNK_SIZE = 200
+
+# Largest page or search result a request can ask for with limit=; larger
+# values are capped so one request cannot read a whole table into memory
+MAX_LIMIT = 500
+
+DEFAULT_WORKERS = 8
+
+
+class NotFound(Exception):
+    pass
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a fixed-size pool of worker threads"""
+
+    request_queue_size = 128
+
+    def __init__(self, address, handler_class, workers=DEFAULT_WORKERS):
+        super().__init__(address, handler_class)
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hospital-http")
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "HospitalHTTP/1.0"
+    # Idle keep-alive connections give their worker back after this many seconds
+    timeout = 30
+    # Headers and body go out in separate writes; without TCP_NODELAY each
+    # keep-alive response waits on the client's delayed ACK.
+    disable_nagle_algorithm = True
+    quiet = False
+
+    def do_GET(self):
+        self._dispatch(self._get)
+
+    def do_POST(self):
+        self._dispatch(self._post)
+
+    def do_PUT(self):
+        self._dispatch(self._put)
+
+    def do_DELETE(self):
+        self._dispatch(self._delete)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self._streaming = False
+        try:
+            if parts == ["stats"] and method == self._get:
+                self._send_json(200, {"sql": instrumentation_snapshot(), "query_cache": query_cache_stats()})
+                return
+            if not parts or parts[0] not in RESOURCES or len(parts) > 2:
+                raise NotFound(f"No route for {url.path}")
+            with operation(_route(self.command, parts)):
+                method(RESOURCES[parts[0]], parts[1:], query)
+        except (NotFound, ValueError, TypeError, KeyError, sqlite3.Error) as error:
+            if self._streaming:
+                # The status line is already sent; drop the connection so the
+                # client sees a truncated body rather than a bogus complete one.
+                self.close_connection = True
+                raise
+            if isinstance(error, NotFound):
+                status = 404
+            elif isinstance(error, SchedulingConflict):
+                status = 409
+            elif isinstance(error, sqlite3.Error):
+                status = 500
+            else:
+                status = 400
+            self._send_json(status, {"error": str(error)})
+
+    def _get(self, model, parts, query):
+        if parts == ["search"]:
+            self._send_json(200, self._search(model, query))
+        elif parts:
+            self._send_json(200, self._find(model, parts[0]).to_dict())
+        elif {"after_id", "before_id", "limit", "order_by"} & set(query):
+            page = model.page(
+                after_id=_optional_int(query, "after_id"),
+                limit=_limit(query, 20),
+                order_by=query.get("order_by", "id"),
+                before_id=_optional_int(query, "before_id"),
+            )
+            self._send_json(200, [instance.to_dict() for instance in page])
+        elif {"start", "end"} <= set(query) and hasattr(model, "find_between"):
+            found = model.find_between(query["start"], query["end"], _optional_int(query, "doctor_id"), lightweight=True)
+            self._send_json(200, [instance.to_dict() for instance in found])
+        elif "patient_id" in query and hasattr(model, "iter_by_patient_id"):
+            self._stream(model.iter_by_patient_id(_optional_int(query, "patient_id"), lightweight=True))
+        elif "doctor_id" in query and hasattr(model, "iter_by_doctor_id"):
+            self._stream(model.iter_by_doctor_id(_optional_int(query, "doctor_id"), lightweight=True))
+        elif FILTERS & set(query):
+            # Streaming the whole table would look like an empty filter result
+            raise ValueError(f"Unsupported filter for this resource: {', '.join(sorted(FILTERS & set(query)))}")
+        else:
+            self._stream(model.iter_all(lightweight=True))
+
+    def _post(self, model, parts, query):
+        if parts:
+            raise NotFound("POST is only supported on a collection")
+        body = self._read_json()
+        instance = model.create(**{field: body[field] for field in model.FIELDS if field in body})
+        self._send_json(201, instance.to_dict())
+
+    def _put(self, model, parts, query):
+        if len(parts) != 1:
+            raise NotFound("PUT requires an id")
+        instance = self._find(model, parts[0])
+        body = self._read_json()
+        changed = update_fields(instance, {field: body[field] for field in model.FIELDS if field in body})
+        self._send_json(200, changed.to_dict())
+
+    def _delete(self, model, parts, query):
+        if len(parts) != 1:
+            raise NotFound("DELETE requires an id")
+        self._find(model, parts[0]).delete()
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _search(self, model, query):
+        if model is MedicalRecord:
+            results = MedicalRecord.search(
+                query["q"], _limit(query, 20), _optional_int(query, "patient_id"),
+            )
+            return [
+                {**result.record.to_dict(), "highlight": {"diagnosis": result.diagnosis, "treatment": result.treatment}}
+                for result in results
+            ]
+        if "q" in query and model in (Patient, Doctor):
+            found = model.search_by_name(query["q"], _limit(query, 10))
+            return [instance.to_dict() for instance in found]
+        if model is Patient:
+            found = Patient.find_by_name(query["first_name"], query["last_name"])
+        elif model is Doctor:
+            found = Doctor.find_by_name(query["name"])
+        else:
+            raise NotFound("Search is only supported for patients, doctors and medical records")
+        return [found.to_dict()] if found else []
+
+    def _find(self, model, id):
+        instance = model.find_by_id(int(id))
+        if instance is None:
+            raise NotFound(f"{model.__name__} {id} not found")
+        return instance
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object")
+        return body
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, instances):
+        """Send instances as a JSON array using chunked transfer encoding"""
+        instances = iter(instances)
+        # Pull the first row before committing to a 200 so query errors
+        # can still be reported with a proper status.
+        first = next(instances, None)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._streaming = True
+        if first is None:
+            self._write_chunk(b"[]")
+            self.wfile.write(b"0\r\n\r\n")
+            return
+        parts = ["[", json.dumps(first.to_dict())]
+        for count, instance in enumerate(instances, 1):
+            parts.append(",")
+            parts.append(json.dumps(instance.to_dict()))
+            if count % STREAM_CHUNK_SIZE == 0:
+                self._write_chunk("".join(parts).encode())
+                parts = []
+        parts.append("]")
+        self._write_chunk("".join(parts).encode())
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, data):
+        self.wfile.write(b"%X\r\n%s\r\n" % (len(data), data))
+
+
+def _route(command, parts):
+    """Name a request by its route, e.g. "GET /patients/<id>", so every id shares one operation"""
+    if len(parts) == 1:
+        return f"{command} /{parts[0]}"
+    return f"{command} /{parts[0]}/{'search' if parts[1] == 'search' else '<id>'}"
+
+
+def _optional_int(query, key):
+    value = query.get(key)
+    return int(value) if value not in (None, "") else None
+
+
+def _limit(query, default):
+    """Return the limit parameter (default when absent), capped at MAX_LIMIT"""
+    limit = _optional_int(query, "limit")
+    if limit is None:
+        return default
+    if limit < 1:
+        raise ValueError(f"limit must be a positive integer, got {limit}")
+    return min(limit, MAX_LIMIT)
+
+
+def make_server(host="127.0.0.1", port=8000, workers=DEFAULT_WORKERS, quiet=False):
+    """Create (but do not start) a server bound to host:port"""
+    handler = type("Handler", (RequestHandler,), {"quiet": quiet})
+    return PooledHTTPServer((host, port), handler, workers)
+
+
+def serve(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the hospital models over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="request worker threads")
+    parser.add_argument("--quiet", action="store_true", help="do not log each request")
+    parser.add_argument("--cache-ttl", type=float, help="cache finder results for this many seconds")
+    parser.add_argument("--sql-stats", action="store_true", help="time every SQL statement (see GET /stats)")
+    parser.add_argument("--slow-ms", type=float, help="log statements slower than this many milliseconds")
+    args = parser.parse_args(argv)
+    if args.cache_ttl:
+        configure_query_cache(ttl=args.cache_ttl)
+    if args.sql_stats or args.slow_ms is not None:
+        configure_instrumentation(slow_ms=args.slow_ms)
+    server = make_server(args.host, args.port, args.workers, args.quiet)
+    print(f"Serving on http://{args.host}:{server.server_port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()
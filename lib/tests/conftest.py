@@ -0,0 +1,39 @@
+# lib/tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# The tests import the models from lib/, as cli.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import POOL, configure_database, configure_query_cache
+from models.patient import Patient
+from models.doctor import Doctor
+from models.appointment import Appointment
+from models.medical_record import MedicalRecord
+
+MODELS = (Patient, Doctor, Appointment, MedicalRecord)
+
+
+@pytest.fixture(autouse=True)
+def database(tmp_path):
+    """Point every thread at an empty database of its own for each test; yields its path"""
+    path = str(tmp_path / "hospital.db")
+    configure_database(path, profile="durable")
+    configure_query_cache(enabled=False)
+    for model in MODELS:
+        model.all.clear()
+    yield path
+    configure_query_cache(enabled=False)
+    POOL.close_all()
+
+
+@pytest.fixture
+def patient():
+    return Patient.create("Jane", "Doe", 40, "Female")
+
+
+@pytest.fixture
+def doctor():
+    return Doctor.create("Dr. Gregory House", "Diagnostics")
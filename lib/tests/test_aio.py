@@ -0,0 +1,47 @@
+# lib/tests/test_aio.py
+import asyncio
+
+import pytest
+
+from models.patient import Patient
+from models.appointment import Appointment
+
+
+def test_awaitable_methods_return_what_the_blocking_ones_do():
+    async def main():
+        created = await Patient.acreate("John", "Roe", 50, "Male")
+        found = await Patient.afind_by_id(created.id)
+        assert found.to_dict() == created.to_dict()
+        found.age = 51
+        await found.aupdate()
+        return created.id
+
+    id = asyncio.run(main())
+    assert Patient.find_by_id(id).age == 51
+
+
+def test_setter_errors_reach_the_awaiting_coroutine():
+    with pytest.raises(ValueError):
+        asyncio.run(Patient.acreate("John", "Roe", -1, "Male"))
+
+
+def test_generators_passed_in_are_drained_before_the_worker_runs():
+    rows = ((f"First{i}", f"Last{i}", 30 + i, "Female") for i in range(3))
+    asyncio.run(Patient.acreate_many(rows))
+    assert len(Patient.get_all()) == 3
+
+
+def test_iter_methods_become_async_iterators(patient, doctor):
+    for hour in (9, 10, 11):
+        Appointment.create(f"2024-01-01 {hour:02}:00", patient.id, doctor.id)
+
+    async def collect():
+        return [row.appointment_date async for row in Appointment.aiter_by_doctor_id(doctor.id, lightweight=True)]
+
+    assert asyncio.run(collect()) == ["2024-01-01 09:00", "2024-01-01 10:00", "2024-01-01 11:00"]
+
+
+def test_generated_methods_keep_their_binding():
+    assert isinstance(Patient.__dict__["afind_by_id"], classmethod)
+    assert not isinstance(Patient.__dict__["aupdate"], classmethod)
+    assert Patient.afind_by_id.__qualname__ == "Patient.afind_by_id"
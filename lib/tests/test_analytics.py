@@ -0,0 +1,159 @@
+# lib/tests/test_analytics.py
+import random
+from array import array
+
+import pytest
+
+from models import CONN, CURSOR, analytics
+from models.analytics import load_appointments, load_medical_records, monthly_utilization
+from models.patient import Patient
+from models.doctor import Doctor
+
+DIAGNOSES = ["Influenza", "Asthma", "Fracture", "Migraine"]
+
+
+@pytest.fixture(params=["numpy", "counter"])
+def backend(request, monkeypatch):
+    """Group with NumPy, or with the Counter fallback used when it is not installed"""
+    monkeypatch.setattr(analytics, "numpy", pytest.importorskip("numpy") if request.param == "numpy" else None)
+    return request.param
+
+
+@pytest.fixture
+def rows():
+    """Records and appointments for 3 doctors and 5 patients over three months, plus a legacy undated row each"""
+    pick = random.Random(0)
+    doctors = Doctor.create_many([(f"Dr. Doctor{i}", "General") for i in range(3)])
+    patients = Patient.create_many([(f"First{i}", "Doe", 30 + i, "Female") for i in range(5)])
+    records, appointments = [], []
+    for i in range(300):
+        day = f"2024-{pick.randint(1, 3):02}-{pick.randint(1, 28):02}"
+        records.append((pick.choice(patients), pick.choice(doctors), day, pick.choice(DIAGNOSES), "Rest"))
+        # One appointment per minute slot, so none overlap
+        appointments.append((f"{day} {8 + i // 60:02}:{i % 60:02}", pick.choice(patients), pick.choice(doctors),
+                             pick.choice((15, 30, 45))))
+    records.append((patients[0], doctors[0], "not a date", "Influenza", "Rest"))
+    appointments.append(("not a date", patients[0], doctors[0], 30))
+    CONN.executemany(
+        "INSERT INTO medical_records (patient_id, doctor_id, record_date, diagnosis, treatment) VALUES (?, ?, ?, ?, ?)",
+        records,
+    )
+    CONN.executemany(
+        "INSERT INTO appointments (appointment_date, patient_id, doctor_id, duration) VALUES (?, ?, ?, ?)", appointments,
+    )
+    CONN.commit()
+    return doctors
+
+
+def grouped(sql, params=()):
+    """Return {key: value} from rows of key columns followed by one value column"""
+    result = {}
+    for row in CURSOR.execute(sql, params).fetchall():
+        *key, value = row
+        result[key[0] if len(key) == 1 else tuple(key)] = value
+    return result
+
+
+DATED_RECORDS = "FROM medical_records WHERE julianday(record_date) IS NOT NULL"
+
+
+@pytest.mark.parametrize("name, expression", [
+    ("doctor_id", "doctor_id"),
+    ("patient_id", "patient_id"),
+    ("diagnosis", "diagnosis"),
+    ("day", "date(record_date)"),
+    ("month", "strftime('%Y-%m', record_date)"),
+])
+def test_counts_match_sql(backend, rows, name, expression):
+    table = load_medical_records(("doctor_id", "patient_id", "day", "diagnosis"), arraysize=64)
+    expected = grouped(f"SELECT {expression}, COUNT(*) {DATED_RECORDS} GROUP BY 1 ORDER BY 1")
+    counted = table.count_by(name)
+    assert counted == expected
+    assert list(counted) == sorted(expected)
+
+
+def test_counts_on_several_columns_match_sql(backend, rows):
+    table = load_medical_records(("doctor_id", "month", "diagnosis"))
+    expected = grouped(
+        f"SELECT doctor_id, strftime('%Y-%m', record_date), diagnosis, COUNT(*) {DATED_RECORDS} GROUP BY 1, 2, 3"
+    )
+    assert table.count_by("doctor_id", "month", "diagnosis") == expected
+
+
+def test_undated_rows_are_only_left_out_when_dates_are_loaded(backend, rows):
+    assert sum(load_medical_records(("diagnosis",)).count_by("diagnosis").values()) == 301
+    assert len(load_medical_records(("diagnosis", "day"))) == 300
+
+
+def test_filters_match_sql(backend, rows):
+    doctor_id = rows[1]
+    table = load_medical_records(("diagnosis",), start="2024-02-01", end="2024-03-01", doctor_id=doctor_id)
+    expected = grouped(
+        "SELECT diagnosis, COUNT(*) FROM medical_records"
+        " WHERE record_date >= '2024-02-01' AND record_date < '2024-03-01' AND doctor_id = ? GROUP BY 1",
+        (doctor_id,),
+    )
+    assert table.count_by("diagnosis") == expected
+
+
+def test_sums_match_sql(backend, rows):
+    table = load_appointments(("doctor_id", "day", "minute", "duration"), arraysize=50)
+    expected = {
+        key: (count, total) for key, count, total in
+        CURSOR.execute(
+            "SELECT date(appointment_date), COUNT(*), SUM(duration) FROM appointments"
+            " WHERE julianday(appointment_date) IS NOT NULL GROUP BY 1"
+        ).fetchall()
+    }
+    assert table.sum_by("duration", "day") == expected
+    assert table.sum_by("minute", "doctor_id") == {
+        key: (count, total) for key, count, total in
+        CURSOR.execute(
+            "SELECT doctor_id, COUNT(*), SUM(CAST(substr(appointment_date, 12, 2) AS INTEGER) * 60"
+            " + CAST(substr(appointment_date, 15, 2) AS INTEGER)) FROM appointments"
+            " WHERE julianday(appointment_date) IS NOT NULL GROUP BY 1"
+        ).fetchall()
+    }
+
+
+def test_monthly_utilization_matches_sql(backend, rows):
+    expected = {
+        (doctor_id, month): {"appointments": count, "booked_minutes": minutes}
+        for doctor_id, month, count, minutes in CURSOR.execute(
+            "SELECT doctor_id, strftime('%Y-%m', appointment_date), COUNT(*), SUM(duration) FROM appointments"
+            " WHERE appointment_date >= '2024-02-01 00:00' AND julianday(appointment_date) IS NOT NULL GROUP BY 1, 2"
+        ).fetchall()
+    }
+    assert monthly_utilization(start="2024-02-01") == expected
+
+
+def test_empty_tables_have_no_groups(backend):
+    table = load_appointments(("doctor_id", "month", "duration"))
+    assert len(table) == 0
+    assert table.count_by("doctor_id", "month") == {}
+    assert table.sum_by("duration", "month") == {}
+
+
+def test_columns_are_typed_buffers(rows):
+    table = load_medical_records(("doctor_id", "diagnosis"))
+    assert isinstance(table.columns["doctor_id"], array)
+    assert table.nbytes == 2 * 4 * len(table)
+    assert sorted(table.dictionaries["diagnosis"]) == sorted(DIAGNOSES)
+
+
+def test_without_numpy_columns_are_the_buffers_themselves(monkeypatch, rows):
+    monkeypatch.setattr(analytics, "numpy", None)
+    table = load_medical_records(("doctor_id",))
+    assert table.column("doctor_id") is table.columns["doctor_id"]
+
+
+def test_invalid_columns_are_rejected(rows):
+    with pytest.raises(ValueError, match="Unknown medical_records columns: minute"):
+        load_medical_records(("minute",))
+    table = load_medical_records(("doctor_id", "diagnosis"))
+    with pytest.raises(ValueError, match="was not loaded"):
+        table.count_by("month")
+    with pytest.raises(ValueError, match="Cannot sum 'diagnosis'"):
+        table.sum_by("diagnosis", "doctor_id")
+    with pytest.raises(ValueError, match="at least one column"):
+        table.count_by()
@@ -0,0 +1,163 @@
+# lib/tests/test_batch.py
+import io
+import json
+import sqlite3
+
+import pytest
+
+import batch
+from models import CURSOR, configure_database
+from models.patient import Patient
+from models.appointment import Appointment
+
+
+def run(argv, lines=()):
+    """Run a batch command with lines as stdin; returns the rows it wrote to stdout"""
+    stdout = io.StringIO()
+    batch.main(argv, stdin=io.StringIO("".join(line + "\n" for line in lines)), stdout=stdout)
+    return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+
+def run_failing(capsys, argv, lines=()):
+    """Run a batch command expected to stop on invalid input; returns (rows written, error)"""
+    stdout = io.StringIO()
+    with pytest.raises(SystemExit) as exited:
+        batch.main(argv, stdin=io.StringIO("".join(line + "\n" for line in lines)), stdout=stdout)
+    assert exited.value.code == 1
+    rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    return rows, json.loads(capsys.readouterr().err)
+
+
+def jsonl(*rows):
+    return [json.dumps(row) for row in rows]
+
+
+def stored(table, columns="*"):
+    return [tuple(row) for row in CURSOR.execute(f"SELECT {columns} FROM {table} ORDER BY id").fetchall()]
+
+
+def patient_row(first_name, age=30, **fields):
+    return {"first_name": first_name, "last_name": "Doe", "age": age, "gender": "Female", **fields}
+
+
+def test_import_writes_the_stored_rows():
+    created = run(["patients", "import"], jsonl(patient_row("Ann"), patient_row("Bob", id=7)))
+    assert created == [
+        {"id": 1, "first_name": "Ann", "last_name": "Doe", "age": 30, "gender": "Female"},
+        {"id": 7, "first_name": "Bob", "last_name": "Doe", "age": 30, "gender": "Female"},
+    ]
+    assert stored("patients", "id, first_name") == [(1, "Ann"), (7, "Bob")]
+
+
+def test_csv_import_converts_numbers_and_skips_empty_cells(patient, doctor):
+    lines = ["appointment_date,patient_id,doctor_id,notes", f"2024-01-01 09:00,{patient.id},{doctor.id},"]
+    [created] = run(["appointments", "import", "--format", "csv"], lines)
+    assert (created["patient_id"], created["notes"], created["duration"]) == (patient.id, None, 30)
+
+
+def test_invalid_import_row_rolls_back_its_batch_only(capsys):
+    lines = jsonl(*(patient_row(f"First{i}", age=-1 if i == 3 else 30) for i in range(5)))
+    created, error = run_failing(capsys, ["patients", "import", "--batch-size", "2"], lines)
+    assert [row["first_name"] for row in created] == ["First0", "First1"]
+    assert error["line"] == 3
+    assert stored("patients", "first_name") == [("First0",), ("First1",)]
+
+
+def test_import_rejects_unknown_fields_and_taken_ids(capsys, patient):
+    _, error = run_failing(capsys, ["patients", "import"], jsonl(patient_row("Ann", height=170)))
+    assert (error["line"], "unknown fields height" in error["error"]) == (1, True)
+    _, error = run_failing(capsys, ["patients", "import"], jsonl(patient_row("Ann"), patient_row("Bob", id=patient.id)))
+    assert "UNIQUE" in error["error"]
+    assert stored("patients", "first_name") == [("Jane",)]
+
+
+def test_update_changes_only_the_given_fields(patient):
+    [updated] = run(["patients", "update"], jsonl({"id": patient.id, "age": 41}))
+    assert (updated["first_name"], updated["age"]) == ("Jane", 41)
+    assert stored("patients", "first_name, age") == [("Jane", 41)]
+
+
+@pytest.mark.parametrize("bad, message", [
+    ({"id": 99, "age": 50}, "Patient 99 not found"),
+    ({"id": 1, "age": -5}, "Age must be"),
+    ({"id": 1, "height": 170}, "unknown field height"),
+])
+def test_invalid_update_row_rolls_back_its_batch(capsys, patient, bad, message):
+    shared = Patient.find_by_id(patient.id)
+    other = Patient.create("John", "Roe", 50, "Male")
+    lines = jsonl({"id": other.id, "age": 51}, bad)
+    updated, error = run_failing(capsys, ["patients", "update"], lines)
+    assert updated == []
+    assert error["line"] == 2 and message in error["error"]
+    assert stored("patients", "age") == [(40,), (50,)]
+    assert shared.age == 40
+
+
+def test_delete_reports_missing_ids(patient):
+    other = Patient.create("John", "Roe", 50, "Male")
+    deleted = run(["patients", "delete"], jsonl({"id": patient.id}, {"id": 99}))
+    assert deleted == [{"id": patient.id, "deleted": True}, {"id": 99, "deleted": False}]
+    assert stored("patients", "id") == [(other.id,)]
+
+
+def test_failed_delete_rolls_back_its_batch(monkeypatch, patient):
+    other = Patient.create("John", "Roe", 50, "Male")
+    delete = Patient.delete
+
+    def delete_then_fail(self):
+        if self.id == other.id:
+            raise sqlite3.OperationalError("database is locked")
+        delete(self)
+
+    monkeypatch.setattr(Patient, "delete", delete_then_fail)
+    with pytest.raises(sqlite3.OperationalError):
+        run(["patients", "delete"], jsonl({"id": patient.id}, {"id": other.id}))
+    assert stored("patients", "id") == [(patient.id,), (other.id,)]
+
+
+def test_delete_rejects_non_integer_ids(capsys, patient):
+    _, error = run_failing(capsys, ["patients", "delete"], jsonl({"id": patient.id}, {"id": "1"}))
+    assert (error["line"], error["error"]) == (2, "line 2: id must be an integer")
+    assert stored("patients", "id") == [(patient.id,)]
+
+
+def test_export_applies_the_filters(patient, doctor):
+    other = type(doctor).create("Dr. Lisa Cuddy", "Endocrinology")
+    for day, booked in ((1, doctor), (2, doctor), (3, other)):
+        Appointment.create(f"2024-01-0{day} 09:00", patient.id, booked.id)
+    assert len(run(["appointments", "export", "--batch-size", "1"])) == 3
+    exported = run(["appointments", "export", "--doctor-id", str(doctor.id), "--since", "2024-01-02"])
+    assert [row["appointment_date"] for row in exported] == ["2024-01-02 09:00"]
+    assert run(["records", "export"]) == run(["medical_records", "export"]) == []
+
+
+def test_export_rejects_an_invalid_date_bound():
+    with pytest.raises(SystemExit) as exited:
+        run(["appointments", "export", "--since", "2024-02-30"])
+    assert exited.value.code == 2
+
+
+def test_file_transfer_round_trip(tmp_path, capsys):
+    Patient.create_many([(f"First{i}", "Doe", 30 + i, "Female") for i in range(5)])
+    expected = stored("patients")
+    path = str(tmp_path / "patients.csv.gz")
+    assert run(["patients", "export", "--output", path]) == []
+    assert json.loads(capsys.readouterr().err)["rows"] == 5
+    configure_database(str(tmp_path / "second.db"))
+    assert run(["patients", "import", "--input", path, "--batch-size", "2"]) == []
+    assert json.loads(capsys.readouterr().err)["rows"] == 5
+    assert stored("patients") == expected
+
+
+def test_file_import_stops_at_an_invalid_chunk(tmp_path, capsys):
+    path = tmp_path / "patients.jsonl"
+    path.write_text("".join(line + "\n" for line in jsonl(*(patient_row(f"First{i}", age=-1 if i == 3 else 30) for i in range(5)))))
+    _, error = run_failing(capsys, ["patients", "import", "--input", str(path), "--batch-size", "2"])
+    assert error["line"] == 3
+    assert stored("patients", "first_name") == [("First0",), ("First1",)]
+
+
+def test_batch_size_must_be_positive():
+    with pytest.raises(SystemExit) as exited:
+        run(["patients", "import", "--batch-size", "0"])
+    assert exited.value.code == 2
@@ -0,0 +1,60 @@
+# lib/tests/test_dates.py
+import pytest
+
+from models import CONN, CURSOR, normalize_dates
+from models.appointment import Appointment
+from models.medical_record import MedicalRecord, manage_medical_records
+
+
+def normalized(table, column, value):
+    CONN.execute(f"UPDATE {table} SET {column} = ?", (value,))
+    normalize_dates()
+    return CURSOR.execute(f"SELECT {column} FROM {table}").fetchone()[0]
+
+
+@pytest.fixture
+def record(patient, doctor):
+    return MedicalRecord.create(patient.id, doctor.id, "2024-01-05", "Flu", "Rest")
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-01-05", "2024-01-05"),
+    ("2024-1-5", "2024-01-05"),
+    ("2024-01-05 09:30", "2024-01-05"),
+])
+def test_legacy_record_dates_are_rewritten(record, value, expected):
+    assert normalized("medical_records", "record_date", value) == expected
+
+
+@pytest.mark.parametrize("value", ["2024-13-45", "2024-02-30", "2024-13-45 99:99"])
+def test_impossible_dates_that_look_canonical_are_reported(record, value):
+    # A pattern match on the text used to accept these as already canonical
+    with pytest.warns(UserWarning, match="unparseable"):
+        assert normalized("medical_records", "record_date", value) == value
+
+
+def test_impossible_appointment_times_are_reported(patient, doctor):
+    Appointment.create("2024-01-05 09:30", patient.id, doctor.id)
+    assert normalized("appointments", "appointment_date", "2024-01-05 9:30") == "2024-01-05 09:30"
+    with pytest.warns(UserWarning, match="appointments.appointment_date"):
+        assert normalized("appointments", "appointment_date", "2024-01-05 24:61") == "2024-01-05 24:61"
+
+
+def run_menu(monkeypatch, answers):
+    answers = iter(answers + ["7"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    manage_medical_records()
+
+
+def test_menu_reports_an_invalid_date_on_add(monkeypatch, capsys, patient, doctor):
+    run_menu(monkeypatch, ["1", str(patient.id), str(doctor.id), "2024-02-30", "Flu", "Rest"])
+    assert "Error:" in capsys.readouterr().out
+    assert MedicalRecord.get_all() == []
+
+
+def test_menu_update_with_an_invalid_date_changes_nothing(monkeypatch, capsys, record):
+    run_menu(monkeypatch, ["3", str(record.id), "", "", "05/01/2024", "Measles", ""])
+    assert "Error:" in capsys.readouterr().out
+    assert (record.record_date, record.diagnosis) == ("2024-01-05", "Flu")
+    stored = CURSOR.execute("SELECT record_date, diagnosis FROM medical_records").fetchone()
+    assert tuple(stored) == ("2024-01-05", "Flu")
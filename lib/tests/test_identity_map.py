@@ -0,0 +1,155 @@
+# lib/tests/test_identity_map.py
+import gc
+
+import pytest
+
+from models.identity_map import IdentityMap
+from models.patient import Patient
+from models.doctor import Doctor
+from models.medical_record import MedicalRecord
+
+
+class Instance:
+    def __init__(self, id):
+        self.id = id
+
+
+@pytest.fixture
+def records_map():
+    """MedicalRecord.all, restored to its defaults afterwards"""
+    yield MedicalRecord.all
+    MedicalRecord.all.configure(capacity=IdentityMap.DEFAULT_CAPACITY, weak=False)
+
+
+@pytest.fixture
+def records(patient, doctor):
+    return [MedicalRecord.create(patient.id, doctor.id, "2024-01-05", f"Diagnosis{i}", "Rest").id for i in range(6)]
+
+
+def test_least_recently_used_entries_are_evicted():
+    identity_map = IdentityMap(capacity=3)
+    for id in range(1, 4):
+        identity_map[id] = Instance(id)
+    identity_map.get(1)
+    identity_map[4] = Instance(4)
+    assert list(identity_map) == [3, 1, 4]
+    identity_map.capacity = 1
+    assert list(identity_map) == [4]
+    assert identity_map.stats()["evictions"] == 3
+
+
+def test_lookups_are_counted():
+    identity_map = IdentityMap()
+    identity_map[1] = Instance(1)
+    identity_map.get(1)
+    identity_map.get(2)
+    identity_map.peek(1)
+    stats = identity_map.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+@pytest.mark.parametrize("capacity", [-1, 1.5, None])
+def test_invalid_capacities_are_rejected(capacity):
+    with pytest.raises(ValueError):
+        IdentityMap(capacity=capacity)
+
+
+def test_listeners_hear_of_evictions_only():
+    identity_map = IdentityMap(capacity=2)
+    heard = []
+    identity_map.listen(lambda instance: heard.append(instance.id))
+    for id in range(1, 5):
+        identity_map[id] = Instance(id)
+    identity_map.pop(3)
+    identity_map.clear()
+    assert heard == [1, 2]
+
+
+def fill(identity_map, ids):
+    """Map a new Instance for every id and return them"""
+    instances = [Instance(id) for id in ids]
+    for instance in instances:
+        identity_map[instance.id] = instance
+    return instances
+
+
+def test_weak_entries_last_as_long_as_their_instance():
+    identity_map = IdentityMap(capacity=1, weak=True)
+    kept = fill(identity_map, range(1, 4))
+    assert identity_map.get(1) is kept[0]
+    assert len(identity_map) == 3
+    del kept[1:]
+    gc.collect()
+    assert list(identity_map) == [1]
+    assert identity_map.stats()["capacity"] is None
+
+
+def test_switching_modes_keeps_live_entries():
+    identity_map = IdentityMap(capacity=2)
+    kept = fill(identity_map, range(1, 3))
+    identity_map.configure(weak=True)
+    assert identity_map.get(2) is kept[1]
+    identity_map[3] = Instance(3)
+    gc.collect()
+    assert sorted(identity_map) == [1, 2]
+    identity_map.configure(weak=False, capacity=1)
+    assert len(identity_map) == 1
+
+
+def test_finders_hand_out_one_instance_per_row(patient, records):
+    found = MedicalRecord.find_by_id(records[0])
+    assert MedicalRecord.find_by_id(records[0]) is found
+    assert MedicalRecord.find_by_patient_id(patient.id)[0] is found
+    assert Patient.find_by_id(patient.id) is Patient.find_by_id(patient.id)
+
+
+def test_deleted_rows_leave_the_map(records):
+    record = MedicalRecord.find_by_id(records[0])
+    record.delete()
+    assert records[0] not in MedicalRecord.all
+    assert MedicalRecord.find_by_id(records[0]) is None
+
+
+def test_capacity_bounds_the_instances_held_under_traffic(records_map, records):
+    records_map.capacity = 2
+    for _ in range(3):
+        for id in records:
+            MedicalRecord.find_by_id(id)
+    assert len(records_map) == 2
+    assert records_map.stats()["evictions"] >= len(records)
+
+
+def test_evictions_unload_the_relations_holding_them(records_map, patient, doctor, records):
+    records_map.capacity = len(records)
+    owner, treating = Patient.find_by_id(patient.id), Doctor.find_by_id(doctor.id)
+    assert owner.medical_records == treating.medical_records
+    assert owner._medical_records is not None
+    other = Patient.create("John", "Roe", 50, "Male")
+    MedicalRecord.create(other.id, doctor.id, "2024-01-06", "Flu", "Rest")
+    MedicalRecord.find_by_patient_id(other.id)
+    assert owner._medical_records is None and treating._medical_records is None
+    assert owner.medical_records[-1] is MedicalRecord.find_by_id(records[-1])
+
+
+def test_relations_larger_than_the_capacity_are_not_kept(records_map, patient, doctor, records):
+    records_map.capacity = 3
+    owner = Patient.find_by_id(patient.id)
+    assert len(owner.medical_records) == len(records)
+    assert owner._medical_records is None
+    Patient.load_related([owner], [owner.id])
+    assert owner._medical_records is None
+    assert len(records_map) == 3
+
+
+def test_weak_mode_keeps_instances_held_by_relations(records_map, patient, records):
+    records_map.configure(weak=True)
+    owner = Patient.find_by_id(patient.id)
+    loaded = owner.medical_records
+    del loaded
+    gc.collect()
+    # The patient's list keeps every record mapped, so finders return the same objects
+    assert [MedicalRecord.find_by_id(id) for id in records] == owner.medical_records
+    assert all(MedicalRecord.find_by_id(id) is record for id, record in zip(records, owner.medical_records))
+    owner.medical_records = None
+    gc.collect()
+    assert len(records_map) == 0
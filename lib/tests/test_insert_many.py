@@ -0,0 +1,38 @@
+# lib/tests/test_insert_many.py
+import pytest
+
+from models import CONN, CURSOR, configure_instrumentation, insert_many
+from models.patient import Patient
+
+
+@pytest.fixture(params=[False, True], ids=["plain", "instrumented"])
+def instrumentation(request):
+    configure_instrumentation(enabled=request.param)
+    yield
+    configure_instrumentation(enabled=False)
+
+
+def test_ids_follow_explicit_and_assigned_rowids(instrumentation):
+    sql = "INSERT INTO doctors (id, name, specialization) VALUES (?, ?, ?)"
+    ids = insert_many(sql, [(5, "Dr. A", "X"), (None, "Dr. B", "Y"), (2, "Dr. C", "Z")])
+    # Deriving them from MAX(id) would give [4, 5, 6]
+    assert ids == [5, 6, 2]
+    assert CURSOR.execute("SELECT id, name FROM doctors ORDER BY id").fetchall() == [(2, "Dr. C"), (5, "Dr. A"), (6, "Dr. B")]
+
+
+def test_rows_skipped_by_a_conflict_clause_get_no_id(instrumentation):
+    sql = "INSERT OR IGNORE INTO doctors (id, name, specialization) VALUES (?, ?, ?)"
+    assert insert_many(sql, [(1, "Dr. A", "X"), (1, "Dr. B", "Y"), (None, "Dr. C", "Z")]) == [1, None, 2]
+
+
+def test_create_many_ids_after_a_gap(patient):
+    Patient.create("John", "Roe", 50, "Male").delete()
+    CURSOR.execute("INSERT INTO patients (id, first_name, last_name, age, gender) VALUES (10, 'Old', 'Row', 70, 'Male')")
+    CONN.commit()
+    ids = Patient.create_many([("Ann", "Lee", 30, "Female"), ("Bob", "Kay", 31, "Male")])
+    assert ids == [11, 12]
+    assert [Patient.find_by_id(id).first_name for id in ids] == ["Ann", "Bob"]
+
+
+def test_empty_input_inserts_nothing():
+    assert insert_many("INSERT INTO doctors (name, specialization) VALUES (?, ?)", iter(())) == []
@@ -0,0 +1,50 @@
+# lib/tests/test_menus.py
+import sqlite3
+
+import pytest
+
+from models.patient import Patient, manage_patients
+from models.doctor import Doctor, manage_doctors
+
+
+def run_menu(monkeypatch, menu, answers):
+    """Feed answers to menu's prompts, then pick its "back to main menu" entry"""
+    answers = iter(answers + ["7"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    menu()
+
+
+def test_rejected_patient_update_leaves_the_shared_instance_unchanged(monkeypatch, capsys, patient):
+    shared = Patient.find_by_id(patient.id)
+    run_menu(monkeypatch, manage_patients, ["3", str(patient.id), "John", "Roe", "41", "Unknown"])
+    assert "Error:" in capsys.readouterr().out
+    assert (shared.first_name, shared.last_name, shared.age) == ("Jane", "Doe", 40)
+    assert Patient.find_by_id(patient.id) is shared
+
+
+def test_patient_update_reaches_the_shared_instance(monkeypatch, capsys, patient):
+    shared = Patient.find_by_id(patient.id)
+    run_menu(monkeypatch, manage_patients, ["3", str(patient.id), "John", "Roe", "41", "Male"])
+    assert "John Roe updated successfully" in capsys.readouterr().out
+    assert (shared.first_name, shared.age) == ("John", 41)
+    assert tuple(Patient.get_all(lightweight=True)[0]) == (patient.id, "John", "Roe", 41, "Male")
+
+
+def test_failed_doctor_update_leaves_the_shared_instance_unchanged(monkeypatch, doctor):
+    shared = Doctor.find_by_id(doctor.id)
+
+    def locked(self):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(Doctor, "update", locked)
+    with pytest.raises(sqlite3.OperationalError):
+        run_menu(monkeypatch, manage_doctors, ["3", str(doctor.id), "Dr. James Wilson", "Oncology"])
+    assert (shared.name, shared.specialization) == ("Dr. Gregory House", "Diagnostics")
+
+
+def test_doctor_update_keeps_blank_answers(monkeypatch, capsys, doctor):
+    shared = Doctor.find_by_id(doctor.id)
+    run_menu(monkeypatch, manage_doctors, ["3", str(doctor.id), "", "Nephrology"])
+    assert "updated successfully" in capsys.readouterr().out
+    assert (shared.name, shared.specialization) == ("Dr. Gregory House", "Nephrology")
+    assert Doctor.get_all(lightweight=True)[0].specialization == "Nephrology"
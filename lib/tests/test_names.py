@@ -0,0 +1,122 @@
+# lib/tests/test_names.py
+import pytest
+
+from models import CONN, fill_derived_columns, update_fields
+from models.names import doctor_keys, normalize, patient_keys, prefix_range, query_tokens, soundex
+from models.patient import Patient
+from models.doctor import Doctor
+
+
+@pytest.mark.parametrize("name, code", [
+    ("Robert", "R163"), ("Rupert", "R163"), ("Ashcraft", "A261"), ("Tymczak", "T522"),
+    ("Pfister", "P236"), ("Honeyman", "H555"), ("Lee", "L000"), ("Smith", "S530"), ("Smyth", "S530"),
+])
+def test_soundex_codes(name, code):
+    assert soundex(name) == code
+
+
+@pytest.mark.parametrize("name", ["", "   ", "123", "Dr.", "-'-", "李"])
+def test_names_without_latin_letters_have_no_soundex(name):
+    assert soundex(name) == ""
+
+
+@pytest.mark.parametrize("name, plain", [
+    ("O'Brien", "OBrien"), ("Smith-Jones", "Smith Jones"), ("J0hn", "Jhn"), ("Müller", "Muller"),
+    ("José", "Jose"), ("Łukasz", "Lukasz"), ("Ørsted", "Orsted"), ("Strauß", "Strauss"),
+])
+def test_soundex_ignores_punctuation_digits_and_accents(name, plain):
+    assert soundex(name) == soundex(plain) != ""
+
+
+@pytest.mark.parametrize("name, normalized", [
+    ("  Jane   DOE ", "jane doe"),
+    ("O’Brien", "obrien"),
+    ("Smith-Jones", "smith jones"),
+    ("Dr. Gregory House", "gregory house"),
+    ("Łukasz Kowalski", "lukasz kowalski"),
+    ("Renée", "renee"),
+    ("李", "李"),
+    ("", ""),
+])
+def test_normalize(name, normalized):
+    assert normalize(name) == normalized
+
+
+def test_derived_keys():
+    assert patient_keys("Renée", "O'Brien") == ("renee", "obrien", "R500", "O165")
+    assert doctor_keys("Dr. Gregory House") == ("gregory house", "house", "H200")
+    assert doctor_keys("Prof.") == ("", "", "")
+
+
+def test_query_tokens_skip_soundex_for_short_words_and_stop_at_the_limit():
+    assert query_tokens("Dr. Jo Smith Lee Extra") == [("jo", None), ("smith", "S530"), ("lee", "L000")]
+    assert query_tokens("!!") == []
+
+
+def test_prefix_range_covers_longer_strings_only_with_the_prefix():
+    low, high = prefix_range("smi")
+    assert low <= "smi" < high and low <= "smithson" < high
+    assert not low <= "smj" < high and not low <= "sm" < high
+
+
+@pytest.fixture
+def patients():
+    return {
+        name: Patient.create(*name.split(), 40, "Female")
+        for name in ("Jane Doe", "Renée Müller", "Sean O'Brien", "John Smith", "Łukasz Kowalski")
+    }
+
+
+def found(model, query):
+    return [str(instance.id) for instance in model.search_by_name(query)]
+
+
+@pytest.mark.parametrize("query, name", [
+    ("muller", "Renée Müller"),
+    ("RENEE", "Renée Müller"),
+    ("obrien", "Sean O'Brien"),
+    ("o'brien", "Sean O'Brien"),
+    ("lukasz", "Łukasz Kowalski"),
+    ("smyth", "John Smith"),
+    ("doe jane", "Jane Doe"),
+    ("jane do", "Jane Doe"),
+])
+def test_patient_search_matches_normalized_and_phonetic_names(patients, query, name):
+    assert found(Patient, query)[0] == str(patients[name].id)
+
+
+def test_patient_search_ranks_exact_over_prefix_over_sounds_like(patients):
+    smithson = Patient.create("Ann", "Smithson", 30, "Female")
+    smyth = Patient.create("Ann", "Smyth", 30, "Female")
+    assert found(Patient, "smith") == [str(id) for id in (patients["John Smith"].id, smithson.id, smyth.id)]
+
+
+def test_short_words_are_only_matched_as_prefixes(patients):
+    # "Sm" would share Soundex S500 with names such as "Sean"
+    assert found(Patient, "sm") == [str(patients["John Smith"].id)]
+
+
+def test_renamed_patients_are_found_by_their_new_name(patients):
+    update_fields(patients["Jane Doe"], {"last_name": "Åberg"})
+    assert found(Patient, "doe") == []
+    assert found(Patient, "aberg") == [str(patients["Jane Doe"].id)]
+
+
+def test_doctor_search_matches_the_normalized_name_and_surname(doctor):
+    other = Doctor.create("Dr. Lisa Cuddy", "Endocrinology")
+    assert found(Doctor, "greg ho") == [str(doctor.id)]
+    assert found(Doctor, "Dr House") == [str(doctor.id)]
+    assert found(Doctor, "hause") == [str(doctor.id)]
+    assert found(Doctor, "cudy") == [str(other.id)]
+    assert found(Doctor, "dr") == []
+
+
+def test_rows_missing_their_keys_are_filled_and_then_found(patients, doctor):
+    CONN.execute("UPDATE patients SET first_name_norm = NULL, last_name_norm = NULL, first_name_soundex = NULL, last_name_soundex = NULL")
+    CONN.execute("UPDATE doctors SET name_norm = NULL, surname_norm = NULL, surname_soundex = NULL")
+    CONN.commit()
+    assert found(Patient, "muller") == [] and found(Doctor, "house") == []
+    fill_derived_columns()
+    CONN.commit()
+    assert found(Patient, "muller") == [str(patients["Renée Müller"].id)]
+    assert found(Doctor, "house") == [str(doctor.id)]
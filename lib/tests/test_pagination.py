@@ -0,0 +1,105 @@
+# lib/tests/test_pagination.py
+import pytest
+
+from models import CONN, iter_chunks, keyset_page
+from models.patient import Patient
+from models.medical_record import MedicalRecord
+
+LAST_NAMES = ["Brown", "Adams", "Clark"]
+
+
+def add_patients(count, first="First"):
+    """Create count patients sharing three last names, so the name order has ties"""
+    return Patient.create_many([(f"{first}{i:02}", LAST_NAMES[i % 3], 30, "Female") for i in range(count)])
+
+
+def walk(order_by, limit, after_id=None):
+    """Return the ids of every page following after_id (or from the start), in order_by order"""
+    pages = []
+    while True:
+        page = Patient.page(after_id=after_id, limit=limit, order_by=order_by)
+        if not page:
+            return pages
+        pages.append([patient.id for patient in page])
+        after_id = page[-1].id
+
+
+def name_order():
+    return [row[0] for row in CONN.execute("SELECT id FROM patients ORDER BY last_name, first_name, id")]
+
+
+@pytest.mark.parametrize("count, sizes", [(25, [10, 10, 5]), (20, [10, 10]), (1, [1]), (0, [])])
+def test_pages_cover_the_table_once(count, sizes):
+    ids = add_patients(count)
+    pages = walk("id", 10)
+    assert [len(page) for page in pages] == sizes
+    assert sum(pages, []) == ids
+
+
+def test_pages_follow_a_composite_order_with_ties():
+    add_patients(25)
+    pages = walk("name", 4)
+    assert [len(page) for page in pages] == [4] * 6 + [1]
+    assert sum(pages, []) == name_order()
+
+
+def test_previous_pages_mirror_the_next_ones():
+    add_patients(25)
+    for order_by in ("id", "name"):
+        forward = walk(order_by, 4)
+        last = Patient.page(limit=4, order_by=order_by, after_id=forward[-2][-1])
+        assert [patient.id for patient in last] == forward[-1]
+        previous = Patient.page(limit=4, order_by=order_by, before_id=forward[-1][0])
+        assert [patient.id for patient in previous] == forward[-2]
+        assert Patient.page(limit=4, order_by=order_by, before_id=forward[0][0]) == []
+
+
+def test_the_page_after_the_last_row_is_empty():
+    ids = add_patients(10)
+    assert Patient.page(after_id=ids[-1], limit=10) == []
+    assert Patient.page(after_id=name_order()[-1], limit=10, order_by="name") == []
+    assert keyset_page("patients", ("id",), after_id=ids[-1]) == []
+
+
+def test_inserts_between_pages_do_not_shift_them():
+    add_patients(12)
+    first = [patient.id for patient in Patient.page(limit=6, order_by="name")]
+    # Both sort before the anchor, so OFFSET paging would show a row of the first page again
+    before = Patient.create_many([("Aaron", "Adams", 30, "Male"), ("Aaron", "Aardvark", 30, "Male")])
+    after = Patient.create_many([("Zed", "Zane", 30, "Male")])
+    rest = sum(walk("name", 4, after_id=first[-1]), [])
+    order = name_order()
+    assert rest == order[order.index(first[-1]) + 1:]
+    assert not set(rest) & set(first + before)
+    assert rest[-1] == after[0]
+
+
+def test_deleting_the_anchor_row_keeps_id_paging_going():
+    ids = add_patients(10)
+    first = Patient.page(limit=5)
+    first[-1].delete()
+    assert [patient.id for patient in Patient.page(after_id=first[-1].id, limit=5)] == ids[5:]
+
+
+def test_paging_arguments_are_checked():
+    with pytest.raises(ValueError, match="either after_id or before_id"):
+        Patient.page(after_id=1, before_id=2)
+    with pytest.raises(ValueError, match="order_by"):
+        Patient.page(order_by="age")
+
+
+@pytest.mark.parametrize("count, arraysize, sizes", [(7, 3, [3, 3, 1]), (6, 3, [3, 3]), (0, 3, []), (7, None, [7])])
+def test_iter_chunks_yields_full_chunks_then_the_rest(count, arraysize, sizes):
+    add_patients(count)
+    chunks = list(iter_chunks("SELECT id FROM patients ORDER BY id", (), arraysize))
+    assert [len(chunk) for chunk in chunks] == sizes
+    assert [row[0] for chunk in chunks for row in chunk] == list(range(1, count + 1))
+
+
+def test_iter_chunks_binds_parameters_and_can_stop_early(patient, doctor):
+    MedicalRecord.create_many([(patient.id, doctor.id, f"2024-01-{day:02}", "Flu", "Rest") for day in range(1, 11)])
+    chunks = iter_chunks("SELECT id FROM medical_records WHERE record_date >= ?", ("2024-01-05",), 2)
+    assert len(next(chunks)) == 2
+    chunks.close()
+    assert [len(chunk) for chunk in iter_chunks("SELECT id FROM medical_records", (), 4)] == [4, 4, 2]
+    assert len(list(MedicalRecord.iter_all(arraysize=3))) == 10
@@ -0,0 +1,107 @@
+# lib/tests/test_pool.py
+import sqlite3
+import threading
+
+import pytest
+
+from models.pool import ConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), profile="durable")
+    yield pool
+    pool.close_all()
+
+
+def in_thread(func):
+    """Run func on a new thread, wait for the thread to end and return func's result"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def is_closed(connection):
+    try:
+        connection.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+
+def test_each_thread_gets_its_own_connection(pool):
+    connection = pool.connection()
+    assert pool.connection() is connection
+    assert pool.cursor() is pool.cursor()
+    barrier = threading.Barrier(2)
+
+    def other():
+        # Keep this thread alive until the main thread has counted it
+        connection = pool.connection()
+        barrier.wait()
+        barrier.wait()
+        return connection
+
+    thread_result = []
+    thread = threading.Thread(target=lambda: thread_result.append(other()))
+    thread.start()
+    barrier.wait()
+    assert pool.size == 2
+    barrier.wait()
+    thread.join()
+    assert thread_result[0] is not connection
+
+
+def test_connection_is_closed_when_its_thread_ends(pool):
+    pool.connection()
+    connection = in_thread(pool.connection)
+    assert is_closed(connection)
+    assert pool.size == 1
+
+
+def test_short_lived_threads_do_not_accumulate_connections(pool):
+    for _ in range(200):
+        in_thread(lambda: pool.cursor().execute("SELECT 1").fetchone())
+    assert pool.size == 0
+
+
+def test_close_releases_the_calling_threads_connection(pool):
+    connection = pool.connection()
+    pool.close()
+    assert is_closed(connection)
+    assert pool.size == 0
+    assert pool.connection() is not connection
+    assert pool.size == 1
+
+
+def test_configure_closes_every_connection(pool, tmp_path):
+    connection = pool.connection()
+    pool.configure(str(tmp_path / "other.db"), profile="throughput")
+    assert is_closed(connection)
+    assert pool.size == 0
+    assert pool.active_settings()["database"].endswith("other.db")
+    assert pool.active_settings()["synchronous"] == 1
+
+
+def test_profile_is_applied_to_new_connections(pool):
+    settings = pool.active_settings()
+    assert settings["journal_mode"] == "wal"
+    assert settings["busy_timeout"] == 5000
+
+
+def test_failing_on_open_closes_the_connection(pool):
+    opened = []
+
+    def on_open(connection):
+        opened.append(connection)
+        raise RuntimeError("schema step failed")
+
+    pool.on_open = on_open
+    with pytest.raises(RuntimeError):
+        pool.connection()
+    assert is_closed(opened[0])
+    assert pool.size == 0
+    pool.on_open = None
+    assert not is_closed(pool.connection())
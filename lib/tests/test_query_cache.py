@@ -0,0 +1,123 @@
+# lib/tests/test_query_cache.py
+import pytest
+
+from models import CONN, QUERY_CACHE, configure_query_cache, transaction, update_fields
+from models.patient import Patient
+from models.doctor import Doctor
+from models.appointment import Appointment
+from models.medical_record import MedicalRecord
+from models.scheduling import SchedulingConflict
+
+
+@pytest.fixture(autouse=True)
+def cache():
+    configure_query_cache(enabled=True, ttl=60)
+    return QUERY_CACHE
+
+
+def ids(instances):
+    return [instance.id for instance in instances]
+
+
+def test_repeated_lookup_is_served_from_the_cache(cache, patient):
+    hits = cache.hits
+    assert Patient.find_by_id(patient.id) is Patient.find_by_id(patient.id)
+    assert cache.hits == hits + 1
+
+
+def test_cached_lists_are_copies(patient, doctor):
+    MedicalRecord.create(patient.id, doctor.id, "2024-01-01", "Flu", "Rest")
+    MedicalRecord.find_by_patient_id(patient.id).append("not a record")
+    assert len(MedicalRecord.find_by_patient_id(patient.id)) == 1
+
+
+def test_create_evicts_the_owners_lists(patient, doctor):
+    assert Appointment.find_by_patient_id(patient.id) == []
+    assert Appointment.find_by_doctor_id(doctor.id) == []
+    appointment = Appointment.create("2024-01-01 10:00", patient.id, doctor.id)
+    assert ids(Appointment.find_by_patient_id(patient.id)) == [appointment.id]
+    assert ids(Appointment.find_by_doctor_id(doctor.id)) == [appointment.id]
+
+
+def test_moving_a_row_evicts_the_old_and_new_owner(patient, doctor):
+    other = Patient.create("John", "Roe", 50, "Male")
+    record = MedicalRecord.create(patient.id, doctor.id, "2024-01-01", "Flu", "Rest")
+    assert ids(MedicalRecord.find_by_patient_id(patient.id)) == [record.id]
+    assert MedicalRecord.find_by_patient_id(other.id) == []
+    record.patient_id = other.id
+    record.update()
+    assert MedicalRecord.find_by_patient_id(patient.id) == []
+    assert ids(MedicalRecord.find_by_patient_id(other.id)) == [record.id]
+
+
+def test_delete_evicts_the_row(patient, doctor):
+    appointment = Appointment.create("2024-01-01 10:00", patient.id, doctor.id)
+    assert Appointment.find_by_id(appointment.id) is not None
+    appointment.delete()
+    assert Appointment.find_by_id(appointment.id) is None
+    assert Appointment.find_by_doctor_id(doctor.id) == []
+
+
+def test_writes_from_elsewhere_are_stale_until_expiry(cache, patient):
+    assert Patient.find_by_id(patient.id).age == 40
+    CONN.execute("UPDATE patients SET age = 41 WHERE id = ?", (patient.id,))
+    CONN.commit()
+    assert Patient.find_by_id(patient.id).age == 40
+    cache.clear()
+    assert Patient.find_by_id(patient.id).age == 41
+
+
+def test_rolled_back_write_leaves_no_cached_result(patient, doctor):
+    with pytest.raises(RuntimeError):
+        with transaction():
+            MedicalRecord.create(patient.id, doctor.id, "2024-01-01", "Flu", "Rest")
+            assert len(MedicalRecord.find_by_patient_id(patient.id)) == 1
+            raise RuntimeError("abort")
+    assert MedicalRecord.find_by_patient_id(patient.id) == []
+
+
+def test_rejected_update_is_not_visible_through_the_cache(patient):
+    cached = Patient.find_by_id(patient.id)
+    with pytest.raises(ValueError):
+        update_fields(cached, {"first_name": "Hacked", "age": -5})
+    assert cached.first_name == "Jane" and cached.age == 40
+    assert Patient.find_by_id(patient.id).to_dict() == {
+        "id": patient.id, "first_name": "Jane", "last_name": "Doe", "age": 40, "gender": "Female",
+    }
+
+
+def test_conflicting_update_is_not_visible_through_the_cache(patient, doctor):
+    Appointment.create("2024-01-01 10:00", patient.id, doctor.id)
+    moved = Appointment.create("2024-01-01 11:00", patient.id, doctor.id)
+    cached = Appointment.find_by_id(moved.id)
+    with pytest.raises(SchedulingConflict):
+        update_fields(cached, {"appointment_date": "2024-01-01 10:15"})
+    assert Appointment.find_by_id(moved.id).appointment_date == "2024-01-01 11:00"
+
+
+def test_accepted_update_reaches_the_shared_instance(patient):
+    cached = Patient.find_by_id(patient.id)
+    changed = update_fields(cached, {"age": 41})
+    assert changed is not cached
+    assert cached.age == 41
+    assert Patient.find_by_id(patient.id).age == 41
+
+
+def test_update_inside_a_transaction_waits_for_the_commit(patient):
+    cached = Patient.find_by_id(patient.id)
+    with pytest.raises(RuntimeError):
+        with transaction():
+            update_fields(cached, {"age": 41})
+            assert cached.age == 40
+            raise RuntimeError("abort")
+    assert cached.age == 40
+    with transaction():
+        update_fields(cached, {"age": 42})
+    assert Patient.find_by_id(patient.id).age == 42
+
+
+def test_doctor_relations_are_reloaded_after_a_write(patient, doctor):
+    cached = Doctor.find_by_id(doctor.id)
+    assert cached.appointments == []
+    Appointment.create("2024-01-01 10:00", patient.id, doctor.id)
+    assert len(cached.appointments) == 1
@@ -0,0 +1,101 @@
+# lib/tests/test_search.py
+import pytest
+
+from models import CURSOR, create_search_index, update_fields
+from models.patient import Patient
+from models.medical_record import MedicalRecord
+
+
+@pytest.fixture
+def add(patient, doctor):
+    """Create a record for the default patient and doctor from its diagnosis and treatment"""
+    def add(diagnosis, treatment, patient_id=patient.id):
+        return MedicalRecord.create(patient_id, doctor.id, "2024-01-05", diagnosis, treatment)
+    return add
+
+
+def found(query, **kwargs):
+    return [result.record.id for result in MedicalRecord.search(query, **kwargs)]
+
+
+def index_is_consistent():
+    # With rank 1, FTS5 also compares the index against the medical_records rows
+    CURSOR.execute("INSERT INTO medical_records_fts (medical_records_fts, rank) VALUES ('integrity-check', 1)")
+    return True
+
+
+def test_inserted_rows_are_searchable_with_highlights(add):
+    record = add("Fractured wrist", "Cast for six weeks")
+    [result] = MedicalRecord.search("wrist")
+    assert (result.record.id, result.diagnosis, result.treatment) == (record.id, "Fractured [wrist]", "Cast for six weeks")
+    # Stems and prefixes
+    assert found("fractures") == [record.id]
+    assert found("we*") == [record.id]
+    assert index_is_consistent()
+
+
+def test_every_word_must_match(add):
+    both = add("Influenza", "Rest and fluids")
+    add("Influenza", "Antivirals")
+    assert found("influenza fluids") == [both.id]
+
+
+def test_updates_replace_the_indexed_text(add):
+    record = add("Influenza", "Rest")
+    update_fields(record, {"diagnosis": "Bronchitis"})
+    assert found("influenza") == []
+    assert found("bronchitis") == [record.id]
+    assert index_is_consistent()
+
+
+def test_deleted_rows_leave_the_index(add):
+    kept, gone = add("Influenza", "Rest"), add("Influenza", "Fluids")
+    gone.delete()
+    assert found("influenza") == [kept.id]
+    assert index_is_consistent()
+
+
+def test_diagnosis_matches_rank_above_treatment_matches(add):
+    in_treatment = add("Checkup", "Asthma inhaler")
+    in_diagnosis = add("Asthma", "Inhaler use")
+    twice = add("Asthma attack", "Asthma inhaler")
+    assert found("asthma") == [twice.id, in_diagnosis.id, in_treatment.id]
+
+
+def test_only_the_newest_matches_are_ranked(monkeypatch, add):
+    monkeypatch.setattr(MedicalRecord, "RANK_WINDOW", 3)
+    oldest = add("Asthma", "Asthma inhaler")
+    newer = [add("Checkup", f"Asthma review {i}") for i in range(4)]
+    assert sorted(found("asthma")) == [record.id for record in newer[1:]]
+    # A patient's matches are all ranked, whatever the window
+    assert found("asthma", patient_id=oldest.patient_id)[0] == oldest.id
+    assert len(found("asthma", patient_id=oldest.patient_id)) == 5
+
+
+def test_patient_filter_and_limit(add):
+    other = Patient.create("John", "Roe", 50, "Male")
+    mine = [add("Influenza", f"Rest {i}") for i in range(3)]
+    theirs = add("Influenza", "Rest", patient_id=other.id)
+    assert found("influenza", patient_id=other.id) == [theirs.id]
+    assert sorted(found("influenza", patient_id=mine[0].patient_id)) == [record.id for record in mine]
+    assert len(found("influenza", limit=2)) == 2
+
+
+@pytest.mark.parametrize("query", ['flu OR "', "NOT", "flu) AND (", "-flu"])
+def test_query_syntax_is_matched_literally(add, query):
+    add("Influenza", "Rest")
+    assert found(query) == []
+
+
+def test_blank_queries_find_nothing(add):
+    add("Influenza", "Rest")
+    assert found("   ") == []
+    assert found("*") == []
+
+
+def test_a_new_index_is_filled_from_existing_rows(add):
+    record = add("Influenza", "Rest")
+    CURSOR.execute("DROP TABLE medical_records_fts")
+    create_search_index()
+    assert found("influenza") == [record.id]
+    assert index_is_consistent()
@@ -0,0 +1,103 @@
+# lib/tests/test_server.py
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from models import configure_query_cache
+from models.patient import Patient
+from models.appointment import Appointment
+from models.medical_record import MedicalRecord
+from server import MAX_LIMIT, make_server
+
+
+@pytest.fixture
+def server():
+    """Serve the models on a free port for the test; yields the base URL"""
+    httpd = make_server(port=0, workers=2, quiet=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+def request(url, method="GET", body=None):
+    """Return (status, decoded JSON body) for a request"""
+    data = json.dumps(body).encode() if body is not None else None
+    try:
+        with urlopen(Request(url, data, method=method, headers={"Content-Type": "application/json"})) as response:
+            return response.status, json.loads(response.read() or b"null")
+    except HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+@pytest.fixture(params=[False, True], ids=["uncached", "cached"])
+def cache(request):
+    configure_query_cache(enabled=request.param, ttl=60)
+
+
+def test_rejected_put_leaves_the_row_unchanged(server, cache, patient):
+    url = f"{server}/patients/{patient.id}"
+    assert request(url)[1]["first_name"] == "Jane"
+    status, _ = request(url, "PUT", {"first_name": "Hacked", "age": -5})
+    assert status == 400
+    assert request(url) == (200, patient.to_dict())
+
+
+def test_conflicting_put_leaves_the_appointment_unchanged(server, cache, patient, doctor):
+    request(f"{server}/appointments", "POST", {"appointment_date": "2024-01-01 10:00", "patient_id": patient.id, "doctor_id": doctor.id})
+    status, moved = request(f"{server}/appointments", "POST", {"appointment_date": "2024-01-01 11:00", "patient_id": patient.id, "doctor_id": doctor.id})
+    assert status == 201
+    url = f"{server}/appointments/{moved['id']}"
+    assert request(url, "PUT", {"appointment_date": "2024-01-01 10:15"})[0] == 409
+    assert request(url)[1]["appointment_date"] == "2024-01-01 11:00"
+
+
+def test_put_updates_the_row(server, cache, patient):
+    url = f"{server}/patients/{patient.id}"
+    request(url)
+    status, updated = request(url, "PUT", {"age": 41})
+    assert (status, updated["age"]) == (200, 41)
+    assert request(url)[1]["age"] == 41
+
+
+@pytest.mark.parametrize("path", ["/patients?limit={}", "/patients/search?q=Doe&limit={}", "/medical_records/search?q=flu&limit={}"])
+def test_non_positive_limits_are_rejected(server, path):
+    for limit in (0, -1):
+        status, body = request(server + path.format(limit))
+        assert status == 400
+        assert "limit" in body["error"]
+
+
+def test_large_limits_are_capped(server, patient, doctor):
+    Patient.create_many([(f"First{i}", "Doe", 30, "Female") for i in range(MAX_LIMIT + 5)])
+    status, page = request(f"{server}/patients?limit={MAX_LIMIT * 10}")
+    assert (status, len(page)) == (200, MAX_LIMIT)
+    MedicalRecord.create_many([(patient.id, doctor.id, "2024-01-01", "Flu", "Rest")] * (MAX_LIMIT + 5))
+    status, found = request(f"{server}/medical_records/search?q=flu&limit={MAX_LIMIT * 10}")
+    assert (status, len(found)) == (200, MAX_LIMIT)
+
+
+def test_missing_limit_uses_the_default(server):
+    Patient.create_many([(f"First{i}", "Doe", 30, "Female") for i in range(25)])
+    assert len(request(f"{server}/patients?after_id=0")[1]) == 20
+    assert len(request(f"{server}/patients/search?q=Doe")[1]) == 10
+
+
+@pytest.mark.parametrize("path", ["/patients?patient_id={}", "/doctors?doctor_id={}", "/patients?start=2024-01-01&end=2024-02-01&doctor_id={}"])
+def test_unsupported_filters_are_rejected(server, patient, doctor, path):
+    status, body = request(server + path.format(patient.id))
+    assert status == 400
+    assert "Unsupported filter" in body["error"]
+
+
+def test_supported_filters_still_apply(server, patient, doctor):
+    Appointment.create("2024-01-01 09:00", patient.id, doctor.id)
+    other = Patient.create("John", "Roe", 50, "Male")
+    status, found = request(f"{server}/appointments?patient_id={other.id}")
+    assert (status, found) == (200, [])
+    assert len(request(f"{server}/appointments?doctor_id={doctor.id}")[1]) == 1
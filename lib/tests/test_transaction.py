@@ -0,0 +1,139 @@
+# lib/tests/test_transaction.py
+import sqlite3
+
+import pytest
+
+from models import on_commit, transaction
+from models.patient import Patient
+from models.doctor import Doctor
+from models.appointment import Appointment
+from models.scheduling import SchedulingConflict
+
+
+def committed(database, table):
+    """Count the rows of table visible to another connection, i.e. committed"""
+    with sqlite3.connect(database) as other:
+        return other.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_commit_publishes_all_changes_at_once(database, patient, doctor):
+    with transaction():
+        Appointment.create("2024-01-01 10:00", patient.id, doctor.id)
+        Patient.create("John", "Roe", 50, "Male")
+        assert committed(database, "appointments") == 0
+        assert committed(database, "patients") == 1
+    assert committed(database, "appointments") == 1
+    assert committed(database, "patients") == 2
+
+
+def test_exception_rolls_back_and_propagates(database, patient, doctor):
+    with pytest.raises(RuntimeError):
+        with transaction():
+            Appointment.create("2024-01-01 10:00", patient.id, doctor.id)
+            Doctor.create("Dr. Lisa Cuddy", "Endocrinology")
+            raise RuntimeError("abort")
+    assert committed(database, "appointments") == 0
+    assert committed(database, "doctors") == 1
+    assert Appointment.get_all() == []
+
+
+def test_failed_savepoint_keeps_outer_work(database, patient, doctor):
+    with transaction():
+        Appointment.create("2024-01-01 10:00", patient.id, doctor.id)
+        with pytest.raises(ValueError):
+            with transaction():
+                Patient.create("John", "Roe", 50, "Male")
+                Appointment.create("2024-01-02 10:00", patient.id, doctor.id)
+                raise ValueError("inner failure")
+        Doctor.create("Dr. Lisa Cuddy", "Endocrinology")
+    assert committed(database, "appointments") == 1
+    assert committed(database, "patients") == 1
+    assert committed(database, "doctors") == 2
+
+
+def test_savepoint_failure_inside_failed_outer_discards_everything(database, patient, doctor):
+    with pytest.raises(RuntimeError):
+        with transaction():
+            Appointment.create("2024-01-01 10:00", patient.id, doctor.id)
+            with transaction():
+                Appointment.create("2024-01-02 10:00", patient.id, doctor.id)
+            raise RuntimeError("outer failure")
+    assert committed(database, "appointments") == 0
+
+
+def test_flush_writes_added_and_deleted_instances(database, patient, doctor):
+    kept = Appointment.create("2024-01-01 10:00", patient.id, doctor.id)
+    dropped = Appointment.create("2024-01-01 11:00", patient.id, doctor.id)
+    with transaction() as unit:
+        new = Appointment("2024-01-02 10:00", patient.id, doctor.id)
+        unit.add(new)
+        kept.notes = "Bring test results"
+        unit.add(kept)
+        unit.delete(dropped)
+        # Nothing is written until the block exits
+        assert new.id is None
+    assert new.id is not None
+    rows = {row.id: row for row in Appointment.get_all(lightweight=True)}
+    assert set(rows) == {kept.id, new.id}
+    assert rows[kept.id].notes == "Bring test results"
+
+
+def test_deleting_a_queued_new_instance_skips_it(patient, doctor):
+    with transaction() as unit:
+        appointment = Appointment("2024-01-02 10:00", patient.id, doctor.id)
+        unit.add(appointment)
+        unit.delete(appointment)
+    assert appointment.id is None
+    assert Appointment.get_all() == []
+
+
+def test_failed_flush_rolls_back_and_forgets_ids(database, patient, doctor):
+    first = Appointment("2024-01-02 10:00", patient.id, doctor.id)
+    overlapping = Appointment("2024-01-02 10:15", patient.id, doctor.id)
+    with pytest.raises(SchedulingConflict):
+        with transaction() as unit:
+            unit.add(first)
+            unit.add(overlapping)
+    assert first.id is None and overlapping.id is None
+    assert committed(database, "appointments") == 0
+
+
+def test_on_commit_runs_in_order_after_the_outermost_commit():
+    calls = []
+    with transaction():
+        on_commit(calls.append, 1)
+        with transaction():
+            on_commit(calls.append, 2)
+        on_commit(calls.append, 3)
+        assert calls == []
+    assert calls == [1, 2, 3]
+
+
+def test_on_commit_callbacks_are_dropped_on_rollback():
+    calls = []
+    with pytest.raises(RuntimeError):
+        with transaction():
+            on_commit(calls.append, "rolled back")
+            raise RuntimeError("abort")
+    with transaction():
+        on_commit(calls.append, "committed")
+    assert calls == ["committed"]
+
+
+def test_on_commit_outside_a_transaction_queues_nothing():
+    calls = []
+    on_commit(calls.append, "ignored")
+    with transaction():
+        pass
+    assert calls == []
+
+
+def test_on_commit_callbacks_of_a_failed_savepoint_are_dropped():
+    calls = []
+    with transaction():
+        on_commit(calls.append, "outer")
+        with pytest.raises(ValueError):
+            with transaction():
+                on_commit(calls.append, "inner")
+                raise ValueError("inner failure")
+    assert calls == ["outer"]
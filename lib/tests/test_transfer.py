@@ -0,0 +1,164 @@
+# lib/tests/test_transfer.py
+import csv
+import gzip
+import json
+import os
+
+import pytest
+
+from models import CURSOR, configure_database, transaction
+from models.patient import Patient
+from models.doctor import Doctor
+from models.appointment import Appointment
+from models.transfer import InputError, export_table, import_table
+
+PATIENTS = 100
+
+
+class Interrupted(Exception):
+    pass
+
+
+def stop_after(count):
+    """A progress callback interrupting the transfer once count rows are done"""
+    def progress(stats):
+        if stats.rows >= count:
+            raise Interrupted
+    return progress
+
+
+def exported_ids(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", newline="") as file:
+        if ".csv" in path:
+            return [int(row["id"]) for row in csv.DictReader(file)]
+        return [json.loads(line)["id"] for line in file]
+
+
+def count(table):
+    return CURSOR.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+@pytest.fixture
+def patients():
+    Patient.create_many([(f"First{i}", f"Last{i}", 1 + i % 90, "Female") for i in range(PATIENTS)])
+
+
+@pytest.mark.parametrize("name", ["patients.csv", "patients.csv.gz", "patients.jsonl", "patients.jsonl.gz"])
+def test_export_resumes_from_its_checkpoint(tmp_path, patients, name):
+    path = str(tmp_path / name)
+    with pytest.raises(Interrupted):
+        export_table("patients", path, chunk_size=10, progress=stop_after(30))
+    with open(f"{path}.checkpoint") as file:
+        checkpoint = json.load(file)
+    assert (checkpoint["rows"], checkpoint["last_id"]) == (30, 30)
+    # Bytes written after the last checkpoint are cut off again
+    with open(path, "ab") as file:
+        file.write(b"half a row")
+    stats = export_table("patients", path, chunk_size=10, resume=True)
+    assert (stats.rows, stats.skipped) == (PATIENTS - 30, 30)
+    assert not os.path.exists(f"{path}.checkpoint")
+    assert exported_ids(path) == list(range(1, PATIENTS + 1))
+
+
+def test_export_without_resume_starts_over(tmp_path, patients):
+    path = str(tmp_path / "patients.csv")
+    with pytest.raises(Interrupted):
+        export_table("patients", path, chunk_size=10, progress=stop_after(30))
+    stats = export_table("patients", path, chunk_size=10)
+    assert (stats.rows, stats.skipped) == (PATIENTS, 0)
+    assert exported_ids(path) == list(range(1, PATIENTS + 1))
+
+
+def test_export_resume_with_other_settings_is_refused(tmp_path, patients):
+    path = str(tmp_path / "patients.csv")
+    with pytest.raises(Interrupted):
+        export_table("patients", path, chunk_size=10, progress=stop_after(10))
+    with pytest.raises(ValueError, match="other settings"):
+        export_table("patients", path, format="jsonl", resume=True)
+    with pytest.raises(ValueError, match="other settings"):
+        export_table("patients", path, resume=True, since="2024-01-01")
+
+
+def test_export_resume_refuses_a_truncated_file(tmp_path, patients):
+    path = str(tmp_path / "patients.csv")
+    with pytest.raises(Interrupted):
+        export_table("patients", path, chunk_size=10, progress=stop_after(20))
+    with open(path, "r+b") as file:
+        file.truncate(10)
+    with pytest.raises(ValueError, match="shorter than its checkpoint"):
+        export_table("patients", path, resume=True)
+
+
+def test_import_resumes_after_the_committed_rows(tmp_path, patients):
+    path = str(tmp_path / "patients.csv.gz")
+    export_table("patients", path)
+    configure_database(str(tmp_path / "second.db"))
+    with pytest.raises(Interrupted):
+        import_table("patients", path, chunk_size=15, progress=stop_after(45))
+    assert count("patients") == 45
+    assert CURSOR.execute("SELECT rows FROM transfer_checkpoints").fetchone()[0] == 45
+    stats = import_table("patients", path, chunk_size=15, resume=True)
+    assert (stats.rows, stats.skipped) == (PATIENTS - 45, 45)
+    assert CURSOR.execute("SELECT COUNT(*), COUNT(DISTINCT first_name) FROM patients").fetchone() == (PATIENTS, PATIENTS)
+    assert count("transfer_checkpoints") == 0
+
+
+def test_rejected_import_chunk_keeps_earlier_chunks_and_checkpoint(tmp_path):
+    path = str(tmp_path / "patients.jsonl")
+    with open(path, "w") as file:
+        for age in (30, 31, 32, -1, 34):
+            file.write(json.dumps({"first_name": "Jane", "last_name": "Doe", "age": age, "gender": "Female"}) + "\n")
+    with pytest.raises(InputError):
+        import_table("patients", path, chunk_size=2)
+    assert count("patients") == 2
+    assert CURSOR.execute("SELECT rows FROM transfer_checkpoints").fetchone()[0] == 2
+
+
+def test_round_trip_keeps_ids_across_gaps(tmp_path, doctor):
+    patients = [Patient.create(f"First{i}", "Doe", 30 + i, "Female") for i in range(5)]
+    other = Doctor.create("Dr. Lisa Cuddy", "Endocrinology")
+    for gone in patients[1:3]:
+        gone.delete()
+    for hour, (patient, booked) in enumerate([(patients[3], doctor), (patients[4], other), (patients[0], other)]):
+        Appointment.create(f"2024-01-01 {9 + hour:02}:00", patient.id, booked.id)
+    Appointment.find_by_id(1).delete()
+    expected = {
+        table: CURSOR.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+        for table in ("patients", "doctors", "appointments")
+    }
+    for table in expected:
+        export_table(table, str(tmp_path / f"{table}.jsonl"))
+
+    configure_database(str(tmp_path / "second.db"))
+    # A row already in the target must not shift the imported ids
+    Patient.create("Someone", "Else", 50, "Male").delete()
+    for table in expected:
+        import_table(table, str(tmp_path / f"{table}.jsonl"), chunk_size=2)
+    for table, rows in expected.items():
+        assert CURSOR.execute(f"SELECT * FROM {table} ORDER BY id").fetchall() == rows
+    owners = CURSOR.execute(
+        "SELECT patients.first_name, doctors.name FROM appointments"
+        " JOIN patients ON patients.id = patient_id JOIN doctors ON doctors.id = doctor_id ORDER BY appointments.id"
+    ).fetchall()
+    assert owners == [("First4", "Dr. Lisa Cuddy"), ("First0", "Dr. Lisa Cuddy")]
+
+
+def test_import_rejects_ids_already_taken(tmp_path, patients):
+    path = str(tmp_path / "patients.jsonl")
+    export_table("patients", path)
+    with pytest.raises(InputError, match="line 1: chunk starting here was rejected: UNIQUE"):
+        import_table("patients", path, chunk_size=10)
+    assert count("patients") == PATIENTS
+
+
+def test_import_inside_a_transaction_commits_with_it(tmp_path, patients):
+    path = str(tmp_path / "patients.jsonl")
+    export_table("patients", path)
+    configure_database(str(tmp_path / "second.db"))
+    with pytest.raises(RuntimeError):
+        with transaction():
+            import_table("patients", path, chunk_size=30)
+            raise RuntimeError("abort")
+    assert count("patients") == 0
+    assert count("transfer_checkpoints") == 0